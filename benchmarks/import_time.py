@@ -0,0 +1,118 @@
+"""
+Import-time benchmark for the dashboard modules.
+
+Runs `python -X importtime -c "import <module>"` in a fresh interpreter for each module
+and reports the cumulative import time, plus the slowest packages it pulled in.
+
+Usage (from the repo root):
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 5 --json bench_import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SRC_DIR = os.path.join(REPO_ROOT, "src")
+
+# The first group is what the dashboard imports at startup, the second group is what
+# only loads when a chart or the map is drawn.
+DEFAULT_MODULES = [
+    "data_aggregations",
+    "panels",
+    "maps",
+    "streamlit",
+    "plotly.express",
+    "folium",
+    "streamlit_folium",
+]
+
+
+# === PARSE -X importtime OUTPUT ===
+# Each line looks like: "import time:   self [us] | cumulative | imported package"
+def parse_importtime(stderr: str) -> list:
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+            rows.append({"module": name, "self_us": int(self_us), "cumulative_us": int(cumulative_us)})
+        except ValueError:
+            continue
+    return rows
+
+
+def measure_module(module: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=REPO_ROOT,
+        env=env,
+    )
+    if result.returncode != 0:
+        return {"module": module, "error": result.stderr.strip().splitlines()[-1] if result.stderr else "failed"}
+
+    rows = parse_importtime(result.stderr)
+    target = [row for row in rows if row["module"] == module]
+    total_us = target[-1]["cumulative_us"] if target else sum(row["self_us"] for row in rows)
+
+    # only top-level packages, so numpy shows up once instead of once per submodule
+    top_level = [row for row in rows if "." not in row["module"] and row["module"] != module]
+    slowest = sorted(top_level, key=lambda row: row["cumulative_us"], reverse=True)[:5]
+
+    return {"module": module, "cumulative_ms": total_us / 1000, "slowest": slowest}
+
+
+# === RUN BENCHMARK ===
+def run_benchmark(modules: list, runs: int) -> list:
+    results = []
+    for module in modules:
+        samples = [measure_module(module) for _ in range(runs)]
+        errors = [s for s in samples if "error" in s]
+        if errors:
+            results.append(errors[0])
+            continue
+
+        times = [s["cumulative_ms"] for s in samples]
+        results.append({
+            "module": module,
+            "median_ms": round(statistics.median(times), 1),
+            "min_ms": round(min(times), 1),
+            "max_ms": round(max(times), 1),
+            "slowest": samples[-1]["slowest"],
+        })
+    return results
+
+
+def print_report(results: list) -> None:
+    print(f"{'module':<20} {'median ms':>10} {'min ms':>10} {'max ms':>10}  slowest dependencies")
+    for res in results:
+        if "error" in res:
+            print(f"{res['module']:<20} {'ERROR':>10}  {res['error']}")
+            continue
+        deps = ", ".join(f"{d['module']} {d['cumulative_us'] / 1000:.0f}ms" for d in res["slowest"][:3])
+        print(f"{res['module']:<20} {res['median_ms']:>10} {res['min_ms']:>10} {res['max_ms']:>10}  {deps}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import time of the dashboard modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="modules to measure")
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreter runs per module")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.modules, args.runs)
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+        print(f"\nSaved results to {args.json_path}")
@@ -0,0 +1,257 @@
+"""
+Concurrent session load test for the Streamlit dashboard.
+
+Every simulated operator is one Streamlit AppTest session running dashboard/app.py in this
+process, the same way the Streamlit server runs one script thread per browser tab.
+Sessions share st.cache_resource exactly like real sessions on one host, and no network or
+browser is needed. Each session replays a scripted set of widget interactions (day selects,
+map filters, view-mode toggles, sidebar filters) and every interaction is timed.
+
+Reported: latency percentiles per interaction, CPU use of the process while the sessions run,
+and how much RSS grows per extra session.
+
+Usage (from the repo root):
+    python benchmarks/load_test.py --sessions 4 --iterations 3
+    python benchmarks/load_test.py --sessions 8 --json bench_load_before.json
+    python benchmarks/load_test.py --sessions 8 --compare bench_load_before.json
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+APP_PATH = os.path.join(REPO_ROOT, "dashboard", "app.py")
+
+DAYS = ["Friday", "Monday", "Saturday", "Sunday", "Thursday", "Tuesday", "Wednesday"]
+ZONES = ["Arafat", "Mina", "Muzdalifah", "Other", "Sa’i", "Tawaf"]
+
+
+# === PROCESS STATS ===
+def rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        # without psutil only the peak RSS is available (kilobytes on Linux)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    position = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[position]
+
+
+# === SCRIPTED INTERACTIONS ===
+# Each step changes one widget and reruns the script, like an operator clicking in the browser.
+# Widgets without a key are looked up by their label.
+def by_label(widgets, label: str):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    raise KeyError(f"No widget labelled {label!r}")
+
+
+def interactions(rng: random.Random) -> list:
+    return [
+        ("map_day", lambda at: at.selectbox(key="map_day_filter").set_value(rng.choice(DAYS))),
+        ("map_activity", lambda at: at.selectbox(key="activity_filter_map").select_index(
+            rng.randrange(len(at.selectbox(key="activity_filter_map").options)))),
+        ("map_color_mode", lambda at: by_label(at.radio, "Color Markers By:").set_value(
+            rng.choice(["Crowd Density", "Activity Type"]))),
+        ("incident_day", lambda at: at.selectbox(key="incident_day_filter").set_value(rng.choice(DAYS))),
+        ("incident_view_mode", lambda at: by_label(at.radio, "Choose View Mode").set_value(
+            rng.choice(["Summary View", "Detailed View"]))),
+        ("heatmap_day", lambda at: at.selectbox(key="heatmap_day_filter").set_value(rng.choice(DAYS))),
+        ("nationality_chart", lambda at: by_label(at.radio, "Choose View:").set_value(
+            rng.choice(["Pie Chart", "Bar Chart"]))),
+        ("transport_day", lambda at: at.selectbox(key="transport_day_filter").set_value(rng.choice(DAYS))),
+        ("timeline_day", lambda at: at.selectbox(key="incident_time_series_day").set_value(rng.choice(DAYS))),
+        ("zone_filter", lambda at: at.multiselect(key="cross_filter_Zone").set_value(rng.sample(ZONES, 2))),
+        ("clear_zone_filter", lambda at: at.multiselect(key="cross_filter_Zone").set_value([])),
+    ]
+
+
+# === ONE SESSION ===
+class Session:
+    def __init__(self, session_id: int, timeout: float, seed: int):
+        self.session_id = session_id
+        self.timeout = timeout
+        self.rng = random.Random(seed + session_id)
+        self.at = None
+        self.latencies = {}
+        self.errors = {}
+
+    def _record(self, name: str, seconds: float, error: str = None) -> None:
+        self.latencies.setdefault(name, []).append(seconds)
+        if error:
+            self.errors.setdefault(name, []).append(error)
+
+    def _app_errors(self) -> str:
+        # st.error boxes are expected for a few panels (e.g. missing optional libraries),
+        # only uncaught exceptions count as failures
+        exceptions = [e.value for e in self.at.exception]
+        return exceptions[0] if exceptions else None
+
+    def start(self) -> None:
+        from streamlit.testing.v1 import AppTest
+
+        start = time.perf_counter()
+        self.at = AppTest.from_file(APP_PATH, default_timeout=self.timeout)
+        self.at.run()
+        self._record("initial_load", time.perf_counter() - start, self._app_errors())
+
+    def run_script(self, iterations: int) -> None:
+        steps = interactions(self.rng)
+        for _ in range(iterations):
+            for name, change in steps:
+                start = time.perf_counter()
+                try:
+                    change(self.at)
+                    self.at.run()
+                    error = self._app_errors()
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                self._record(name, time.perf_counter() - start, error)
+
+
+# === RUN THE LOAD TEST ===
+def run_load_test(sessions: int, iterations: int, timeout: float = 300, seed: int = 0) -> dict:
+    os.chdir(REPO_ROOT)  # the app uses repo-relative paths for data and caches
+
+    # a warm-up session fills st.cache_resource, so the numbers below show the per-operator cost
+    rss_before_warmup = rss_mb()
+    warmup = Session(-1, timeout, seed)
+    warmup_start = time.perf_counter()
+    warmup.start()
+    warmup_seconds = time.perf_counter() - warmup_start
+    rss_baseline = rss_mb()
+
+    pool = [Session(i, timeout, seed) for i in range(sessions)]
+
+    def worker(session: Session) -> None:
+        session.start()
+        session.run_script(iterations)
+
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(s,), name=f"session-{s.session_id}") for s in pool]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+    cpu = cpu_seconds() - cpu_start
+    rss_after = rss_mb()  # sessions are still alive here, so their state is counted
+
+    interaction_names = ["initial_load"] + [name for name, _ in interactions(random.Random())]
+    per_interaction = []
+    for name in interaction_names:
+        samples = [x for s in pool for x in s.latencies.get(name, [])]
+        errors = [e for s in pool for e in s.errors.get(name, [])]
+        if not samples:
+            continue
+        per_interaction.append({
+            "interaction": name,
+            "count": len(samples),
+            "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+            "p90_ms": round(percentile(samples, 0.90) * 1000, 1),
+            "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1),
+            "mean_ms": round(statistics.mean(samples) * 1000, 1),
+            "errors": len(errors),
+            "first_error": errors[0] if errors else None,
+        })
+
+    all_samples = [x for s in pool for values in s.latencies.values() for x in values]
+    return {
+        "sessions": sessions,
+        "iterations": iterations,
+        "cpu_count": os.cpu_count(),
+        "warmup_seconds": round(warmup_seconds, 2),
+        "wall_seconds": round(wall, 2),
+        "cpu_seconds": round(cpu, 2),
+        "cpu_utilisation": round(cpu / wall, 2) if wall else 0.0,
+        "interactions_per_second": round(len(all_samples) / wall, 2) if wall else 0.0,
+        "rss_before_warmup_mb": round(rss_before_warmup, 1),
+        "rss_baseline_mb": round(rss_baseline, 1),
+        "rss_after_mb": round(rss_after, 1),
+        "rss_per_session_mb": round((rss_after - rss_baseline) / sessions, 2) if sessions else 0.0,
+        "overall": {
+            "p50_ms": round(percentile(all_samples, 0.50) * 1000, 1),
+            "p90_ms": round(percentile(all_samples, 0.90) * 1000, 1),
+            "p99_ms": round(percentile(all_samples, 0.99) * 1000, 1),
+        },
+        "per_interaction": per_interaction,
+    }
+
+
+def print_report(results: dict, baseline: dict = None) -> None:
+    before = {row["interaction"]: row for row in (baseline or {}).get("per_interaction", [])}
+
+    print(f"{results['sessions']} sessions x {results['iterations']} iterations "
+          f"on {results['cpu_count']} CPU(s), warm-up {results['warmup_seconds']}s")
+    header = f"{'interaction':<20} {'count':>6} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'errors':>7}"
+    if baseline:
+        header += f" {'p50 before':>11} {'change':>8}"
+    print(header)
+    for row in results["per_interaction"]:
+        line = (f"{row['interaction']:<20} {row['count']:>6} {row['p50_ms']:>9} {row['p90_ms']:>9} "
+                f"{row['p99_ms']:>9} {row['max_ms']:>9} {row['errors']:>7}")
+        old = before.get(row["interaction"])
+        if old and old["p50_ms"]:
+            change = (row["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+            line += f" {old['p50_ms']:>11} {change:>+7.0f}%"
+        print(line)
+
+    overall = results["overall"]
+    print(f"\noverall p50/p90/p99: {overall['p50_ms']} / {overall['p90_ms']} / {overall['p99_ms']} ms, "
+          f"{results['interactions_per_second']} interactions/s")
+    print(f"CPU: {results['cpu_seconds']}s over {results['wall_seconds']}s wall "
+          f"({results['cpu_utilisation']:.0%} of one core)")
+    print(f"RSS: {results['rss_before_warmup_mb']} MB before warm-up, {results['rss_baseline_mb']} MB after, "
+          f"{results['rss_after_mb']} MB with all sessions ({results['rss_per_session_mb']} MB per session)")
+
+    failing = [row for row in results["per_interaction"] if row["errors"]]
+    for row in failing:
+        print(f"  {row['interaction']}: {row['errors']} error(s), first: {row['first_error']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate concurrent dashboard sessions and time their interactions.")
+    parser.add_argument("--sessions", type=int, default=4, help="concurrent simulated operators")
+    parser.add_argument("--iterations", type=int, default=2, help="times each session replays the interaction script")
+    parser.add_argument("--timeout", type=float, default=300, help="seconds allowed for one script run")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random widget choices")
+    parser.add_argument("--json", dest="json_path", help="also write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier run to compare p50 latencies against")
+    args = parser.parse_args()
+
+    # streamlit prints a warning per session when it is not started with `streamlit run`
+    from streamlit import logger as streamlit_logger
+    streamlit_logger.set_log_level("error")
+
+    results = run_load_test(args.sessions, args.iterations, args.timeout, args.seed)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"python": sys.version.split()[0], **results}, f, indent=2)
+        print(f"\nSaved results to {args.json_path}")
@@ -1,21 +1,383 @@
 import sys
 import os
+import copy
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import folium
-from streamlit_folium import folium_static
-from branca.element import Template, MacroElement
-from folium.plugins import HeatMap
 
+# NOTE: plotly, folium and streamlit_folium are not imported here on purpose.
+# They are loaded by panels.py / maps.py the first time a chart or map is drawn,
+# so the title, sidebar and metrics show up before the heavy libraries finish importing.
 
 
 # Add the src directory to the Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
-from data_aggregations import load_and_clean_data
+from datasets import load_registry, get_dataset_entry, load_dataset, compare_datasets, load_driver_stats, added_rows
+from filter_engine import build_filter_index
+from shared_data import load_shared_data
+from out_of_core import memory_budget_mb, estimate_row_bytes, exceeds_budget, load_chunked_store, rows_within_budget
+from maps import build_incident_map
+from payloads import PayloadReport, compact_figure, figure_payload_bytes, map_payload_bytes
+from risk_scoring import compute_risk_scores
+from anomaly_detection import detect_anomalies
+from geofence import GeofenceMonitor, monitor_geofences, load_geofences
+from time_rollups import build_time_rollups
+from demographics import build_demographic_store
+from queue_analytics import compute_queue_stats
+from zone_flows import build_zone_flows, BUCKET_OPTIONS
+from driver_analysis import compute_driver_stats, NUMERIC_DRIVERS
+from forecasting import build_hourly_series, load_forecast_model, train_forecast_model
+from utils import dataset_version
+from panels import (
+    fatigue_stress_data, fatigue_stress_figure,
+    incident_density_data, incident_density_figure,
+    movement_heatmap_data, movement_heatmap_figure,
+    nationality_data, nationality_figure,
+    transport_wait_data, transport_wait_figure,
+    safety_satisfaction_data, safety_satisfaction_figure,
+    incident_timeline_data, incident_timeline_figure,
+    experience_data, experience_figure,
+    health_condition_data, health_condition_figure,
+    forecast_figure, season_comparison_figure, time_rollup_figure,
+    queue_figure, QUEUE_METRIC_LABELS,
+    zone_flow_sankey_figure, zone_flow_animation_figure,
+    driver_importance_figure, driver_rates_figure, correlation_figure, driver_target_label,
+    HOUR_LABELS
+)
+
+FORECAST_MODEL_DIR = "models/forecast"
+# every loader below is keyed by (dataset, data version); old versions drop out of memory after a few reloads
+CACHED_VERSIONS = 4
+
 
 # === Load data using my data_aggregation functions ===
-df = load_and_clean_data("data/hajj_umrah_crowd_management_dataset.csv")
+# Every named dataset (see data/datasets.json) has its own cached, versioned copy of the
+# cleaned data, so switching datasets in the sidebar does not reload the others.
+# Set HAJJSENSE_SHARED_DATA=1 when running several dashboard workers on one host,
+# so they all attach to one shared Arrow copy instead of each cleaning the CSV.
+# With HAJJSENSE_MEMORY_BUDGET_MB set and a CSV (or a folder of exports) too big for it, the cleaned
+# rows go to a chunked Arrow file (see out_of_core.py) and only the most recent days that fit are loaded.
+# The risk scores, queue statistics and driver analysis read every chunk instead (see load_full_data).
+# data_version comes from the dataset watcher (see below); a new version means new files landed in data/.
+@st.cache_resource(show_spinner="Checking the data size...", max_entries=CACHED_VERSIONS)
+def load_chunked_data(dataset_name: str, data_version: str):
+    """
+    The ChunkedDataset when a memory budget is set and the data does not fit in it, otherwise None.
+    """
+    budget_mb = memory_budget_mb()
+    csv_path = get_dataset_entry(dataset_name)["path"]
+    if budget_mb is None:
+        return None
+    # one size estimate for both the budget check and the chunk size
+    estimate = estimate_row_bytes(csv_path)
+    if not exceeds_budget(csv_path, budget_mb, estimate):
+        return None
+    return load_chunked_store(csv_path, budget_mb, row_bytes=estimate[1])
+
+
+@st.cache_resource(show_spinner="Loading crowd data...", max_entries=CACHED_VERSIONS)
+def load_data(dataset_name: str, data_version: str) -> pd.DataFrame:
+    csv_path = get_dataset_entry(dataset_name)["path"]
+    # a CSV or folder of exports over the memory budget is read from the chunked store
+    chunked = load_chunked_data(dataset_name, data_version)
+    if chunked is not None:
+        # the panel caches (filter index, rollups, ...) are built from this frame too, so it only gets part of the budget
+        df = chunked.load_latest_days(rows_within_budget(memory_budget_mb(), chunked.row_bytes, share=0.25))
+        df.attrs["validation_report"] = chunked.attrs["validation_report"]
+        df.attrs["out_of_core"] = {"total_rows": len(chunked), "loaded_rows": len(df)}
+        return df
+    # folders of exports always go through the versioned cache, which cleans one file at a time
+    if os.environ.get("HAJJSENSE_SHARED_DATA") == "1" and not os.path.isdir(csv_path):
+        return load_shared_data(csv_path)
+    return load_dataset(dataset_name)
+
+
+# The aggregations that can read a chunked dataset one chunk at a time get every row, even when
+# load_data only holds the latest days
+def load_full_data(dataset_name: str, data_version: str):
+    chunked = load_chunked_data(dataset_name, data_version)
+    return chunked if chunked is not None else load_data(dataset_name, data_version)
+
+
+# The running states below (risk sums, queue stats, anomaly detector, geofence monitor) can take more
+# rows on top. When the watcher loads a new version of a folder of exports, the previous version's
+# state is copied and only fed the rows of the new files (the old version keeps serving its own copy).
+# A changed or removed file, a single CSV, or new rows that are not later than the replayed stream
+# mean a full rebuild.
+def carry_forward(previous, data, build, extend):
+    """
+    extend(copy of previous, added rows) when previous was built from an older version of the same
+    files, otherwise build(data). extend returns None when the rows can not just be added on top.
+    """
+    state = None
+    added = added_rows(getattr(previous, "data_parts", None), data) if previous is not None else None
+    if added is not None:
+        state = extend(copy.deepcopy(previous), added)
+    if state is None:
+        state = build(data)
+    # which files the state was built from, for the next version
+    state.data_parts = data.attrs.get("parts")
+    return state
+
+
+# Risk scores are kept as running sums per zone and hour, so they are computed once per data load
+# (arguments starting with _ are not part of the cache key)
+@st.cache_resource(show_spinner="Scoring crowd risk...", max_entries=CACHED_VERSIONS)
+def load_risk_scores(dataset_name: str, data_version: str, _previous=None):
+    return carry_forward(_previous, load_full_data(dataset_name, data_version), compute_risk_scores,
+                         lambda state, rows: state.update(rows))
+
+
+# Forecast models are trained offline (python src/forecasting.py train ...) and loaded once here.
+# If no model has been trained yet, or the saved one was trained on an older version of the data
+# (or of the hourly series), the seasonal baseline is fitted on the fly instead.
+@st.cache_resource(show_spinner="Loading forecast model...", max_entries=CACHED_VERSIONS)
+def load_forecaster(dataset_name: str, data_version: str):
+    data = load_data(dataset_name, data_version)
+    # the same id the train command records (the watcher's version is None when hot reload is off)
+    current_version = dataset_version(get_dataset_entry(dataset_name)["path"])
+    try:
+        model = load_forecast_model(os.path.join(FORECAST_MODEL_DIR, dataset_name))
+    except FileNotFoundError:
+        model = None
+    if model is None or not model.is_current(current_version):
+        saved = model
+        model = train_forecast_model(data, use_boosting=False, data_version=current_version)
+        if saved is not None:
+            model.metadata["outdated_model"] = saved.version
+    return model, build_hourly_series(data)
+
+
+# Bitmaps for every category value are built once per dataset, so the sidebar filters below
+# only AND/OR small bit arrays instead of rescanning the frame on every change
+@st.cache_resource(show_spinner="Indexing filters...", max_entries=CACHED_VERSIONS)
+def load_filter_index(dataset_name: str, data_version: str):
+    return build_filter_index(load_data(dataset_name, data_version))
+
+
+# 5/15/60 minute rollups per zone and incident type; any other window size is summed from these
+@st.cache_resource(show_spinner="Building time window rollups...", max_entries=CACHED_VERSIONS)
+def load_time_rollups(dataset_name: str, data_version: str):
+    return build_time_rollups(load_data(dataset_name, data_version))
+
+
+# Nationality x Age_Group x Experience counts and rating sums, built once per dataset.
+# The demographic panels below only sum over this small cube instead of grouping the frame again.
+@st.cache_resource(show_spinner="Summarising demographics...", max_entries=CACHED_VERSIONS)
+def load_demographic_store(dataset_name: str, data_version: str):
+    return build_demographic_store(load_data(dataset_name, data_version))
+
+
+# Arrivals, waits and wait histograms per 15 minutes, zone and transport mode
+@st.cache_resource(show_spinner="Computing transport queue statistics...", max_entries=CACHED_VERSIONS)
+def load_queue_stats(dataset_name: str, data_version: str, _previous=None):
+    return carry_forward(_previous, load_full_data(dataset_name, data_version), compute_queue_stats,
+                         lambda state, rows: state.update(rows))
+
+
+# Zone occupancy per 15 minutes and activity as a sparse matrix; each day's flows are cached inside it
+@st.cache_resource(show_spinner="Counting zone occupancy for crowd flows...", max_entries=CACHED_VERSIONS)
+def load_zone_flows(dataset_name: str, data_version: str):
+    return build_zone_flows(load_data(dataset_name, data_version))
+
+
+# Counts, sums and sums of products per zone and hour; stored with the dataset's aggregates,
+# so it is computed once per dataset version and every panel interaction only adds up small arrays
+@st.cache_resource(show_spinner="Analysing what drives incidents and stress...", max_entries=CACHED_VERSIONS)
+def load_driver_analysis(dataset_name: str, data_version: str):
+    chunked = load_chunked_data(dataset_name, data_version)
+    if chunked is not None:
+        return compute_driver_stats(chunked)
+    if os.environ.get("HAJJSENSE_SHARED_DATA") == "1":
+        return compute_driver_stats(load_data(dataset_name, data_version))
+    return load_driver_stats(dataset_name)
+
+
+# The anomaly detector replays the data once as a stream and keeps its recent alerts
+@st.cache_resource(show_spinner="Checking for unusual crowd patterns...", max_entries=CACHED_VERSIONS)
+def load_anomaly_detector(dataset_name: str, data_version: str, _previous=None):
+    return carry_forward(_previous, load_data(dataset_name, data_version), detect_anomalies,
+                         lambda detector, rows: detect_anomalies(rows, detector) if detector.can_continue(rows["Timestamp"]) else None)
+
+
+# Replays the positions through the geofence monitor (zone polygons and capacities in config/geofences.json).
+# Set HAJJSENSE_GEOFENCE_LOG to also append the alerts to a JSON lines file.
+@st.cache_resource(show_spinner="Checking geofences...", max_entries=CACHED_VERSIONS)
+def load_geofence_monitor(dataset_name: str, data_version: str, _previous=None):
+    def build(data):
+        monitor = GeofenceMonitor(load_geofences(), log_path=os.environ.get("HAJJSENSE_GEOFENCE_LOG"))
+        return monitor_geofences(data, monitor=monitor)
+
+    return carry_forward(_previous, load_data(dataset_name, data_version), build,
+                         lambda monitor, rows: monitor_geofences(rows, monitor=monitor) if monitor.can_continue(rows["Timestamp"]) else None)
+
+
+# === Hot Reload ===
+# One watcher thread per dashboard process checks the data files every couple of seconds.
+# When a file changes it loads the new version into every cache above while the old version
+# keeps serving, and only then publishes the new version id, so sessions switch over in one step.
+# Set HAJJSENSE_HOT_RELOAD=0 to turn it off (new data then needs a restart).
+HOT_RELOAD_SECONDS = 2
+
+
+# The running states continue from the previous version's (see carry_forward); the filter index, rollups,
+# demographics, zone flows and forecast are rebuilt from the new frame (the driver analysis is
+# already added up per file in the dataset cache).
+INCREMENTAL_LOADERS = (load_risk_scores, load_queue_stats, load_anomaly_detector, load_geofence_monitor)
+
+
+def warm_dataset(dataset_name: str, data_version: str, previous_version: str = None) -> None:
+    previous = {}
+    if previous_version is not None:
+        previous = {loader: loader(dataset_name, previous_version) for loader in INCREMENTAL_LOADERS}
+    for loader in (load_chunked_data, load_data, load_filter_index, load_demographic_store, load_forecaster,
+                   load_time_rollups, load_zone_flows, load_driver_analysis):
+        loader(dataset_name, data_version)
+    for loader in INCREMENTAL_LOADERS:
+        loader(dataset_name, data_version, _previous=previous.get(loader))
+
+
+@st.cache_resource(show_spinner=False)
+def load_dataset_watcher():
+    import logging
+    from hot_reload import DatasetWatcher, WATCHER_THREAD_NAME
+
+    # the loaders' spinners have no page to show on from the watcher thread, which streamlit logs every time
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+        lambda record: WATCHER_THREAD_NAME not in record.getMessage()
+    )
+    return DatasetWatcher(poll_seconds=HOT_RELOAD_SECONDS, on_change=warm_dataset).start()
+
+
+hot_reload = os.environ.get("HAJJSENSE_HOT_RELOAD", "1") != "0"
+dataset_watcher = load_dataset_watcher() if hot_reload else None
+
+
+# runs on its own every couple of seconds and reruns the page once a newer version is published
+@st.fragment(run_every=HOT_RELOAD_SECONDS)
+def rerun_on_new_data(dataset_name: str, shown_version: str) -> None:
+    if dataset_watcher.version(dataset_name) != shown_version:
+        st.rerun()
+
+
+# === Sidebar: Dataset and Date Range ===
+registry = load_registry()
+dataset_names = list(registry["datasets"])
+
+with st.sidebar:
+    st.header("Data")
+    dataset_name = st.selectbox(
+        "Dataset",
+        dataset_names,
+        index=dataset_names.index(registry["default"]),
+        format_func=lambda name: registry["datasets"][name]["label"],
+        key="dataset_select"
+    )
+
+data_version = dataset_watcher.version(dataset_name) if dataset_watcher else None
+
+# a session that was showing an older version gets a note once the new data is in
+if st.session_state.get("shown_data_version", {}).get(dataset_name) not in (None, data_version):
+    st.toast("New data loaded.")
+    st.session_state.pop("date_range_filter", None)  # so new days are not left outside the picked range
+st.session_state["shown_data_version"] = {**st.session_state.get("shown_data_version", {}), dataset_name: data_version}
+
+full_df = load_data(dataset_name, data_version)
+
+with st.sidebar:
+    first_day, last_day = full_df["Date"].min().date(), full_df["Date"].max().date()
+    date_range = st.date_input(
+        "Date Range",
+        value=(first_day, last_day),
+        min_value=first_day,
+        max_value=last_day,
+        key="date_range_filter"
+    )
+
+    out_of_core = full_df.attrs.get("out_of_core")
+    if out_of_core:
+        st.info(
+            f"Memory budget mode: showing the latest {out_of_core['loaded_rows']:,} of "
+            f"{out_of_core['total_rows']:,} rows ({full_df['Date'].nunique()} most recent days). "
+            "The risk ranking (without filters), transport queues and incident drivers still cover every row."
+        )
+
+    # the shared Arrow copy does not carry the validation report, so this only shows for the pickled cache
+    validation_report = full_df.attrs.get("validation_report")
+    if validation_report:
+        st.caption(
+            f"Data quality: {validation_report['valid_rows']:,} valid rows, "
+            f"{validation_report['quarantined_rows']:,} quarantined"
+        )
+
+    if dataset_watcher:
+        reload_error = dataset_watcher.errors.get(dataset_name)
+        if reload_error:
+            st.warning(f"New data could not be loaded, still showing the previous version. {reload_error}")
+        rerun_on_new_data(dataset_name, data_version)
+
+# === Payload Sizes ===
+# Every chart is compacted (smaller typed arrays, rounded coordinates) before it is sent to the
+# browser. Measuring the sizes means serializing each figure twice, so it is off unless the
+# sidebar toggle (or HAJJSENSE_PAYLOAD_REPORT=1) turns it on.
+payload_report = PayloadReport()
+
+with st.sidebar:
+    measure_payloads = st.toggle(
+        "Measure payload sizes",
+        value=os.environ.get("HAJJSENSE_PAYLOAD_REPORT") == "1",
+        key="payload_report_toggle"
+    )
+
+
+def show_chart(fig, panel: str, **kwargs) -> None:
+    before = len(fig.to_json()) if measure_payloads else 0
+    compact_figure(fig)
+    if measure_payloads:
+        after, gzipped = figure_payload_bytes(fig)
+        kind = fig.data[0].type if fig.data else "plotly"
+        payload_report.record(panel, kind, before, after, gzipped)
+    st.plotly_chart(fig, **kwargs)
+
+
+# === Sidebar: Cross Filters ===
+# These filters are shared by every panel below. Leaving a filter empty means "everything".
+CROSS_FILTERS = {
+    "Zone": "Zones",
+    "Activity_Type": "Activities",
+    "Incident_Type": "Incident Types",
+    "Nationality": "Nationalities",
+    "Pilgrim_Experience": "Pilgrim Experience",
+}
+filter_index = load_filter_index(dataset_name, data_version)
+
+with st.sidebar:
+    st.subheader("Filters")
+    selected_filters = {
+        column: st.multiselect(label, filter_index.options(column), key=f"cross_filter_{column}")
+        for column, label in CROSS_FILTERS.items()
+        if column in filter_index.categories
+    }
+
+# the date picker returns a single date while the user is still choosing the end of the range
+date_ranges = {}
+if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
+    date_ranges["Date"] = tuple(date_range)
+
+selection = filter_index.select(selected_filters, date_ranges)
+df = filter_index.apply(full_df, selection)
+
+if df.empty:
+    st.warning("No data matches the selected filters. Showing the whole dataset instead.")
+    df = full_df
+
+# the demographic panels read from the precomputed cube; with filters on it is re-summed for the selected rows only
+demographic_store = load_demographic_store(dataset_name, data_version)
+demographic_rows = None if df is full_df else filter_index.rows(selection)
+# the risk scores follow the filters too; only the unfiltered state is cached, a filtered one is
+# a single bincount pass over the selected rows
+risk_state = load_risk_scores(dataset_name, data_version) if df is full_df else compute_risk_scores(df)
+nationality_summary = demographic_store.breakdown(["Nationality"], demographic_rows)
+experience_summary = demographic_store.breakdown(["Pilgrim_Experience"], demographic_rows)
 
 # === Page Title ===
 st.title("🕋 HajjSense Interactive Map & Incident Monitor 🕋")
@@ -74,6 +436,49 @@ with st.sidebar:
     This graph helps to see the frequency of health
     conditions reported by pilgrims.
 
+    12. **Crowd Risk Ranking:**
+    This table ranks the zones by a risk score that combines
+    crowding, distance, speed, stress, heat and incidents.
+
+    13. **Crowd Density Forecast:**
+    This graph predicts the crowd level and incidents in
+    each zone for the next 1 to 3 hours.
+
+    14. **Anomaly Alerts:**
+    This list shows zones where movement speed dropped or
+    stress spiked compared with their usual pattern.
+
+    15. **Season Comparison:**
+    This graph compares different events and seasons
+    (pick them at the top of the sidebar).
+
+    16. **Time Window Rollups:**
+    This graph shows counts and averages in 5 to 120 minute
+    windows, with an optional rolling window.
+
+    17. **Transport Queues & Throughput:**
+    This graph shows arrivals per minute, estimated queue
+    lengths and long waits for each transport mode.
+
+    18. **Crowd Flows Between Zones:**
+    This graph shows how many people are estimated to move
+    between Tawaf, Sa’i, Mina, Muzdalifah and Arafat during a day.
+
+    19. **What Drives Incidents and Stress:**
+    This graph ranks temperature, noise, spacing, crowd level,
+    weather and AR use by how much they go with incidents or stress.
+
+    20. **Geofence Alerts:**
+    This list shows when a zone went over its capacity or
+    most reports from it said the crowd was dense.
+
+    21. **Payload Sizes:**
+    This table shows how much data each chart and the map
+    send to the browser (turn on "Measure payload sizes").
+
+    New files in `data/` are picked up while the dashboard runs;
+    the page refreshes on its own a few seconds later.
+
     
     ---
     *Data anonymized and partially simulated for demonstration purposes.*
@@ -85,7 +490,7 @@ with st.sidebar:
 col1, col2, col3 = st.columns(3)
 col1.metric("Total Incidents", f"{df['Incident_Type'].count()}")
 col2.metric("Avg Movement Speed", f"{df['Movement_Speed'].mean():.2f} m/s")
-col3.metric("Top Risk Area", df["Zone"].mode()[0] if "Zone" in df.columns else "Mina")
+col3.metric("Top Risk Area", risk_state.top_zone() or "Mina")
 
 st.divider()
 
@@ -113,97 +518,32 @@ with st.expander("View Interactive Map", expanded=False):
 
         color_mode = st.radio("Color Markers By:", ["Crowd Density", "Activity Type"], horizontal=True)
 
-        # Color logic
-        crowd_color_map = {"Low": "green", "Medium": "orange", "High": "red"}
-        activity_color_map = {
-            "Tawaf": "blue", "Prayer": "purple", "Resting": "gray",
-            "Sa’i": "cadetblue", "Transport": "lightgreen", "Other": "black"
-        }
-
-        def get_color(row):
-            try:
-                if color_mode == "Crowd Density":
-                    return crowd_color_map.get(row["Crowd_Density"], "gray")
-                else:
-                    return activity_color_map.get(row["Activity_Type"], "gray")
-            except KeyError:
-                return "gray"
-
         # === Create Map ===
-        m = folium.Map(location=[21.4225, 39.8262], zoom_start=13)
-        incident_layer = folium.FeatureGroup(name="Incidents")
-        heatmap_layer = folium.FeatureGroup(name="Heatmap")
-
-        # Zone markers based on the areas
-        zones = {
-            "Tawaf (Masjid al-Haram)": (21.4225, 39.8262),
-            "Sa’i": (21.4185, 39.8295),
-            "Mina": (21.4290, 39.8897),
-            "Arafat": (21.3541, 39.9832),
-            "Muzdalifah": (21.3865, 39.8930)
-        }
-
-        # Add zone markers to the map (start with blue)
-        for name, (lat, lon) in zones.items():
-            folium.Marker(
-                location=[lat, lon],
-                popup=name,
-                tooltip=name,
-                icon=folium.Icon(color="blue", icon="star")
-            ).add_to(incident_layer)
-
-        # Incident markers
-        # credit: https://stackoverflow.com/questions/62517929/python-folium-map-developement 
-        for _, row in map_df.iterrows():
-            try:
-                folium.CircleMarker(
-                    location=[row["Location_Lat"], row["Location_Long"]],
-                    color=get_color(row),
-                    fill=True,
-                    fill_opacity=0.6,
-                    popup=(
-                        f"<b>Incident:</b> {row.get('Incident_Type', 'N/A')}<br>"
-                        f"<b>Activity:</b> {row.get('Activity_Type', 'N/A')}<br>"
-                        f"<b>Crowd:</b> {row.get('Crowd_Density', 'N/A')}<br>"
-                        f"<b>Stress:</b> {row.get('Stress_Level', 'N/A')}<br>"
-                        f"<b>Fatigue:</b> {row.get('Fatigue_Level', 'N/A')}"
-                    ),
-                    tooltip=f"{row.get('Incident_Type', 'Incident')} | {row.get('Activity_Type', 'Activity')}"
-                ).add_to(incident_layer)
-            except Exception as e:
-                st.warning(f"Could not plot marker: {e}")
-
-        # Heatmap layer
-        try:
-            heat_data = map_df[["Location_Lat", "Location_Long"]].dropna().values.tolist()
-            HeatMap(
-                heat_data,
-                radius=25,
-                blur=20,
-                min_opacity=0.3,
-                gradient={
-                    0.2: 'blue',
-                    0.4: 'lime',
-                    0.6: 'yellow',
-                    0.8: 'orange',
-                    1.0: 'red'
-                }
-            ).add_to(heatmap_layer)
-        except Exception as e:
-            st.error(f"Failed to load heatmap data: {e}")
-
-        # Add layers
-        incident_layer.add_to(m)
-        heatmap_layer.add_to(m)
-        folium.LayerControl(collapsed=False).add_to(m)
-
-        # Show the map
+        # folium and streamlit_folium are only imported here, the first time the map is drawn
+        from streamlit_folium import folium_static
+        zone_risk = risk_state.zone_ranking().set_index("Zone")["Risk_Score"].to_dict()
+        alerts = load_anomaly_detector(dataset_name, data_version).alert_table()
+        day_alerts = alerts[alerts["Window_Start"].dt.day_name() == map_day] if not alerts.empty else None
+        m = build_incident_map(map_df, color_mode, zone_risk=zone_risk, anomalies=day_alerts)
+
+        # Show the map (the incident points are already a compact GeoJSON layer, see maps.py)
+        if measure_payloads:
+            html_bytes, gzipped = map_payload_bytes(m)
+            payload_report.record("View Interactive Map", "folium", html_bytes, html_bytes, gzipped)
         folium_static(m, height=600)
 
         # Map legend
         st.markdown("""
         ### Map Legend
 
+        #### Zone Stars (Risk Score)
+        - 🟢 Below 45
+        - 🟠 45 to 60
+        - 🔴 60 and above
+
+        #### Anomaly Alerts
+        - ❗ Dark red markers show zones with unusual speed drops or stress spikes on this day
+
         #### Incidents by Crowd Level
         - 🟢 Low Crowd
         - 🟠 Medium Crowd
@@ -215,7 +555,7 @@ with st.expander("View Interactive Map", expanded=False):
         - 🟨 High
         - 🔴 Very High
         """)
-    
+
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
     except Exception as e:
@@ -227,8 +567,163 @@ with st.expander("View Interactive Map", expanded=False):
 
 
 
+# === CROWD RISK RANKING ===
+with st.expander("Crowd Risk Ranking by Zone", expanded=False):
+    try:
+        st.subheader("Which Zones Are the Riskiest?")
+        st.caption(
+            "The risk score (0-100) combines crowd density, distance between people, movement speed, "
+            "stress, temperature and the share of readings that reported an incident in each zone."
+        )
+
+        hour_options = ["All Day"] + list(range(24))
+        risk_hour = st.selectbox(
+            "Select Hour",
+            hour_options,
+            format_func=lambda h: h if h == "All Day" else HOUR_LABELS[h],
+            key="risk_hour_filter"
+        )
+        ranking = risk_state.zone_ranking(None if risk_hour == "All Day" else risk_hour)
+
+        if ranking.empty:
+            st.warning("No risk data available for the selected hour.")
+        else:
+            st.dataframe(
+                ranking[["Rank", "Zone", "Risk_Score", "Incidents", "Incident_Rate", "Density_Risk", "Proximity_Risk",
+                         "Slowdown_Risk", "Stress_Risk", "Heat_Risk", "Incident_Risk"]],
+                hide_index=True,
+                column_config={"Risk_Score": st.column_config.ProgressColumn("Risk Score", min_value=0, max_value=100, format="%.1f")}
+            )
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error computing risk scores: {e}")
+
+
+
+
+
+
+
+# === ANOMALY ALERTS ===
+with st.expander("Anomaly Alerts", expanded=False):
+    try:
+        st.subheader("Unusual Movement Speed Drops and Stress Spikes")
+        st.caption(
+            "Each zone is compared with its usual pattern for the same hour of the day. "
+            "An alert is raised when the hourly average is far outside that pattern."
+        )
+
+        alerts = load_anomaly_detector(dataset_name, data_version).alert_table()
+
+        # === FILTERS ===
+        alert_types = st.multiselect(
+            "Alert Types",
+            sorted(alerts["Alert"].unique()),
+            default=sorted(alerts["Alert"].unique()),
+            key="alert_type_filter"
+        )
+        alert_zones = st.multiselect(
+            "Zones",
+            sorted(alerts["Zone"].unique()),
+            default=sorted(alerts["Zone"].unique()),
+            key="alert_zone_filter"
+        )
+        alerts = alerts[alerts["Alert"].isin(alert_types) & alerts["Zone"].isin(alert_zones)]
+
+        if alerts.empty:
+            st.success("No anomalies for the selected filters.")
+        else:
+            st.metric("Alerts", len(alerts))
+            st.dataframe(
+                alerts.sort_values("Window_Start", ascending=False)[
+                    ["Window_Start", "Zone", "Alert", "Value", "Expected", "Z_Score", "Events"]
+                ],
+                hide_index=True,
+                column_config={
+                    "Window_Start": st.column_config.DatetimeColumn("Time", format="MMM D, h A"),
+                    "Value": st.column_config.NumberColumn("Observed", format="%.2f"),
+                    "Expected": st.column_config.NumberColumn("Usual", format="%.2f"),
+                    "Z_Score": st.column_config.NumberColumn("Z-Score", format="%.1f"),
+                }
+            )
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error loading anomaly alerts: {e}")
+
+
+
+# === GEOFENCE ALERTS ===
+with st.expander("Geofence Alerts", expanded=False):
+    try:
+        st.subheader("Zone Occupancy and Density Alerts")
+        geofence_monitor = load_geofence_monitor(dataset_name, data_version)
+        st.caption(
+            f"Positions are matched to the zone polygons in config/geofences.json and counted over a sliding "
+            f"{geofence_monitor.window_minutes:.0f}-minute window. An alert is raised when a zone reaches "
+            f"{geofence_monitor.warning_fraction:.0%} of its capacity (warning) or its capacity (critical), "
+            f"or when most recent crowd reports in it say High."
+        )
+
+        geofence_alerts = geofence_monitor.alert_table()
+        col_a, col_b = st.columns(2)
+        geofence_kinds = col_a.multiselect(
+            "Alert Types",
+            sorted(geofence_alerts["Alert"].unique()),
+            default=sorted(geofence_alerts["Alert"].unique()),
+            key="geofence_alert_filter"
+        )
+        geofence_zones = col_b.multiselect(
+            "Zones",
+            geofence_monitor.names,
+            default=geofence_monitor.names,
+            key="geofence_zone_filter"
+        )
+        geofence_alerts = geofence_alerts[
+            geofence_alerts["Alert"].isin(geofence_kinds) & geofence_alerts["Zone"].isin(geofence_zones)
+        ]
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Geofence Alerts", len(geofence_alerts))
+        col2.metric("Positions Checked", f"{geofence_monitor.positions_seen:,}")
+        col3.metric("Outside Every Zone", f"{geofence_monitor.outside:,}")
+
+        if geofence_alerts.empty:
+            st.success("No geofence alerts for the selected filters.")
+        else:
+            st.dataframe(
+                geofence_alerts.sort_values("Time", ascending=False),
+                hide_index=True,
+                column_config={
+                    "Time": st.column_config.DatetimeColumn("Time", format="MMM D, h:mm A"),
+                    "Value": st.column_config.NumberColumn("Observed", format="%.2f"),
+                    "Threshold": st.column_config.NumberColumn("Threshold", format="%.2f"),
+                }
+            )
+
+        st.markdown("**Zone Status at the End of the Data**")
+        st.dataframe(geofence_monitor.status().round(2), hide_index=True)
+
+    except FileNotFoundError as e:
+        st.error(str(e))
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error in the geofence config: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error loading geofence alerts: {e}")
+
+
+
+
+
+
+
 # === FATIGUE & STRESS TRENDS ===
-# credit to: https://discuss.streamlit.io/t/expander-expanded-false-not-working/20786 
+# credit to: https://discuss.streamlit.io/t/expander-expanded-false-not-working/20786
 with st.expander("View Stress vs Fatigue", expanded=False):
     try:
         # Filter by day
@@ -237,44 +732,15 @@ with st.expander("View Stress vs Fatigue", expanded=False):
         df_filtered = df[df["DayOfWeek"] == day_selected]
 
         # Group & aggregate by hour
-        fatigue_stress_by_hour = df_filtered.groupby("Hour")[["Fatigue_Score", "Stress_Score"]].mean().reset_index()
+        fatigue_stress_by_hour = fatigue_stress_data(df_filtered)
 
         if fatigue_stress_by_hour.empty:
             st.warning(f"No data available for {day_selected}.")
         else:
-            # Melt the DataFrame for Plotly
-            melted = fatigue_stress_by_hour.melt(id_vars="Hour", var_name="Metric", value_name="Avg Score")
-
             # --- Visualization ---
             st.header(f"Fatigue & Stress by Hour on {day_selected}")
-            fig = px.line(
-                melted,
-                x="Hour",
-                y="Avg Score",
-                color="Metric",
-                markers=True,
-                title=f"Average Fatigue and Stress Scores by Hour ({day_selected})",
-                color_discrete_map={
-                    "Fatigue_Score": "orange",
-                    "Stress_Score": "red"
-                }
-            )
-
-            # allows for to see a range of hours
-            fig.update_layout(
-                xaxis=dict(
-                    tickmode='linear',
-                    tick0=0,
-                    dtick=1,
-                    tickvals=list(range(0, 24)),
-                    ticktext=[
-                        "12AM", "1AM", "2AM", "3AM", "4AM", "5AM", "6AM", "7AM", "8AM", "9AM", "10AM", "11AM",
-                        "12PM", "1PM", "2PM", "3PM", "4PM", "5PM", "6PM", "7PM", "8PM", "9PM", "10PM", "11PM"
-                    ]
-                )
-            )
-
-            st.plotly_chart(fig)
+            fig = fatigue_stress_figure(fatigue_stress_by_hour, day_selected)
+            show_chart(fig, "View Stress vs Fatigue")
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -295,7 +761,7 @@ with st.expander("Incident Frequency by Crowd Density", expanded=False):
     try:
         # === FILTERS ===
         incident_day = st.selectbox("Filter by Day", sorted(df["DayOfWeek"].dropna().unique()), key="incident_day_filter")
-        df_day_filtered = df[df["DayOfWeek"] == incident_day].copy()
+        df_day_filtered = df[df["DayOfWeek"] == incident_day]
 
         # Filter by Activity Type
         activity_options = sorted(df_day_filtered["Activity_Type"].dropna().unique())
@@ -307,64 +773,18 @@ with st.expander("Incident Frequency by Crowd Density", expanded=False):
         if df_day_filtered.empty:
             st.warning("No data available for the selected filters.")
         else:
-            # Add Hour column
-            df_day_filtered["Hour"] = df_day_filtered["Timestamp"].dt.hour
-
             # === VIEW TOGGLE ===
             view_mode = st.radio("Choose View Mode", ["Summary View", "Detailed View"], horizontal=True)
 
             # === TOGGLE FOR COUNT VS PERCENT ===
             show_pct = st.toggle("Show as Percentages")
-            y_col = "Count"
-            y_title = "Number of Incidents"
 
             # === AGGREGATE DATA ===
-            if view_mode == "Summary View":
-                incidents = df_day_filtered.groupby(["Incident_Type", "Crowd_Density"]).size().reset_index(name="Count")
-            else:
-                incidents = df_day_filtered.groupby(["Hour", "Incident_Type", "Crowd_Density"]).size().reset_index(name="Count")
-
-            # Sort crowd levels logically
-            incidents["Crowd_Density"] = pd.Categorical(incidents["Crowd_Density"], categories=["Low", "Medium", "High"], ordered=True)
-
-            # Sort incident types logically
-            custom_incident_order = ["Security Breach", "Theft", "Unruly Behavior", "Medical Emergency", "Lost Pilgrim"]
-            incidents["Incident_Type"] = pd.Categorical(incidents["Incident_Type"], categories=custom_incident_order, ordered=True)
-
-            # Convert to percentage if toggled
-            if show_pct:
-                if view_mode == "Summary View":
-                    total_by_type = incidents.groupby("Incident_Type")["Count"].transform("sum")
-                else:
-                    total_by_type = incidents.groupby(["Hour", "Incident_Type"])["Count"].transform("sum")
-                incidents["Percent"] = (incidents["Count"] / total_by_type) * 100
-                y_col = "Percent"
-                y_title = "Percent of Incidents"
-
-            # === HANDLE TOOLTIP COLUMNS DYNAMICALLY ===
-            hover_data_cols = ["Incident_Type", "Crowd_Density", y_col]
-            if view_mode == "Detailed View":
-                hover_data_cols.append("Hour")
+            incidents = incident_density_data(df_day_filtered, view_mode, show_pct)
 
             # === PLOT ===
-            fig2 = px.bar(
-                incidents,
-                x="Incident_Type",
-                y=y_col,
-                color="Crowd_Density",
-                animation_frame="Hour" if view_mode == "Detailed View" else None,
-                barmode="group",
-                title=f"Incident Frequency by Crowd Density ({incident_day}) - {view_mode}",
-                color_discrete_map={"Low": "green", "Medium": "orange", "High": "red"},
-                category_orders={
-                    "Incident_Type": custom_incident_order,
-                    "Crowd_Density": ["Low", "Medium", "High"]
-                },
-                hover_data=hover_data_cols
-            )
-
-            fig2.update_layout(xaxis_title="Incident Type", yaxis_title=y_title)
-            st.plotly_chart(fig2)
+            fig2 = incident_density_figure(incidents, view_mode, incident_day)
+            show_chart(fig2, "Incident Frequency by Crowd Density")
 
             # === DOWNLOAD BUTTON ===
             st.download_button(
@@ -381,75 +801,35 @@ with st.expander("Incident Frequency by Crowd Density", expanded=False):
     except Exception as e:
         st.error(f"Unexpected error generating incident chart: {e}")
 
-    
-    
-    
-    
-    
-    
-# === ANIMATED MOVEMENT SPEED HEATMAP ===    
+
+
+
+
+
+
+# === ANIMATED MOVEMENT SPEED HEATMAP ===
 with st.expander("Animated Movement Speed Heatmap by Hour", expanded=False):
     try:
         st.subheader("Movement Density Over Time")
 
         # === FILTERS ===
         heatmap_day = st.selectbox(
-            "Select Day for Heatmap", 
-            sorted(df["DayOfWeek"].dropna().unique()), 
+            "Select Day for Heatmap",
+            sorted(df["DayOfWeek"].dropna().unique()),
             key="heatmap_day_filter"
         )
-        df_day = df[df["DayOfWeek"] == heatmap_day].copy()
+        df_day = df[df["DayOfWeek"] == heatmap_day]
 
         if df_day.empty:
             st.warning(f"No movement data available for {heatmap_day}.")
         else:
             # Toggle: Simulated or Real Coordinates
             use_sim = st.toggle("Use Simulated Coordinates?", value=True, key="heatmap_use_sim_toggle")
-            lat_col = "Sim_Lat" if use_sim else "Real_Lat"
-            lon_col = "Sim_Lon" if use_sim else "Real_Lon"
 
-            # Assign lat/lon and handle missing values
-            if lat_col not in df_day.columns or lon_col not in df_day.columns:
-                st.error(f"Missing columns: {lat_col} or {lon_col}")
-            else:
-                df_day["Latitude"] = df_day[lat_col]
-                df_day["Longitude"] = df_day[lon_col]
-
-                # Create AM/PM time labels for sorting/animation
-                hour_labels = {i: f"{i%12 or 12}{'AM' if i < 12 else 'PM'}" for i in range(24)}
-
-                # Ensure 'Hour' column exists and is numeric
-                if "Hour" not in df_day.columns:
-                    st.error("Missing 'Hour' column in dataset.")
-                else:
-                    df_day = df_day.dropna(subset=["Hour", "Latitude", "Longitude", "Movement_Speed"])
-                    df_day["Hour"] = df_day["Hour"].astype(int)
-                    df_day = df_day.sort_values("Hour")
-                    df_day["Time_Label"] = df_day["Hour"].map(hour_labels)
-
-                    # === Animated Heatmap ===
-                    fig_heatmap = px.density_mapbox(
-                        df_day,
-                        lat="Latitude",
-                        lon="Longitude",
-                        z="Movement_Speed",   # Color intensity by speed
-                        radius=25,            # Bigger = more smoothing
-                        animation_frame="Time_Label",  # Animate across hours
-                        center={"lat": 21.4225, "lon": 39.8262},
-                        zoom=13,
-                        height=600,
-                        mapbox_style="carto-positron",
-                        color_continuous_scale="Turbo",
-                        range_color=[0, 2],  # Adjust depending on speed range
-                        title="Crowd Movement Speed Density by Hour"
-                    )
-
-                    fig_heatmap.update_layout(
-                        coloraxis_colorbar=dict(title="Speed (m/s)"),
-                        margin=dict(l=0, r=0, t=40, b=0)
-                    )
-
-                    st.plotly_chart(fig_heatmap)
+            # === Animated Heatmap ===
+            df_heat = movement_heatmap_data(df_day, use_sim)
+            fig_heatmap = movement_heatmap_figure(df_heat)
+            show_chart(fig_heatmap, "Animated Movement Speed Heatmap by Hour")
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -473,53 +853,19 @@ with st.expander("Nationality Diversity", expanded=False):
             st.error("The 'Nationality' column is missing from the dataset.")
             st.stop()
 
-        # Count nationality occurrences
-        nationality_counts = df["Nationality"].dropna().value_counts().reset_index()
-        nationality_counts.columns = ["Nationality", "Count"]
+        # Count nationality occurrences (smaller ones are grouped into "Other")
+        top_nationalities = nationality_data(nationality_summary, top_n=10)
 
-        if nationality_counts.empty:
+        if top_nationalities.empty:
             st.warning("No nationality data available to display.")
             st.stop()
 
-        # If too many, group smaller ones into "Other" to make it easier to read
-        top_n = 10
-        if len(nationality_counts) > top_n:
-            top_nationalities = nationality_counts[:top_n]
-            other_count = nationality_counts[top_n:]["Count"].sum()
-            top_nationalities = pd.concat(
-                [top_nationalities, pd.DataFrame([{"Nationality": "Other", "Count": other_count}])]
-            )
-        else:
-            top_nationalities = nationality_counts
-
         # Choose chart type
         chart_type = st.radio("Choose View:", ["Pie Chart", "Bar Chart"], horizontal=True)
 
         # Plot
-        if chart_type == "Pie Chart":
-            fig_nat = px.pie(
-                top_nationalities,
-                names="Nationality",
-                values="Count",
-                title="Nationality Distribution",
-                color_discrete_sequence=px.colors.qualitative.Safe
-            )
-        else:  # Bar chart
-            fig_nat = px.bar(
-                top_nationalities,
-                x="Nationality",
-                y="Count",
-                title="Nationality Distribution",
-                text="Count",
-                color="Nationality",
-                color_discrete_sequence=px.colors.qualitative.Safe
-            )
-            fig_nat.update_layout(
-                xaxis_title="Nationality",
-                yaxis_title="Number of Participants"
-            )
-
-        st.plotly_chart(fig_nat, use_container_width=True)
+        fig_nat = nationality_figure(top_nationalities, chart_type)
+        show_chart(fig_nat, "Nationality Diversity", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -549,7 +895,7 @@ with st.expander("Transport Waiting Time by Zone", expanded=False):
             sorted(df["DayOfWeek"].dropna().unique()),
             key="transport_day_filter"
         )
-        df_transport = df[df["DayOfWeek"] == transport_day].copy()
+        df_transport = df[df["DayOfWeek"] == transport_day]
 
         # Ensure necessary columns exist
         required_columns = {"Transport_Mode", "Waiting_Time_for_Transport", "Zone"}
@@ -557,51 +903,20 @@ with st.expander("Transport Waiting Time by Zone", expanded=False):
             st.error(f"Missing one or more required columns: {required_columns}")
             st.stop()
 
-        # Filter out missing or invalid transport entries
-        df_transport = df_transport.dropna(subset=list(required_columns))
         if df_transport.empty:
             st.warning(f"No transport data available for {transport_day}.")
             st.stop()
 
-        # Exclude "Walking" transport mode because it is not part of waiting
-        df_transport = df_transport[df_transport["Transport_Mode"] != "Walking"]
-
-        if df_transport.empty:
-            st.warning(f"No non-walking transport data for {transport_day}.")
-            st.stop()
-
-        # Group by Zone and Transport Mode
-        transport_wait = df_transport.groupby(
-            ["Zone", "Transport_Mode"]
-        )["Waiting_Time_for_Transport"].mean().reset_index()
+        # Group by Zone and Transport Mode ("Walking" is excluded because it is not part of waiting)
+        transport_wait = transport_wait_data(df_transport)
 
         if transport_wait.empty:
-            st.warning("No data available after grouping by Zone and Transport Mode.")
+            st.warning(f"No non-walking transport data for {transport_day}.")
             st.stop()
 
         # === PLOT ===
-        fig_transport = px.bar(
-            transport_wait,
-            x="Zone",
-            y="Waiting_Time_for_Transport",
-            color="Transport_Mode",
-            barmode="group",
-            text_auto=".2s",
-            title=f"Average Waiting Time by Zone and Transport Mode ({transport_day})",
-            color_discrete_sequence=px.colors.qualitative.Pastel
-        )
-
-        fig_transport.update_layout(
-            xaxis_title="Zone",
-            yaxis_title="Average Waiting Time (minutes)",
-            legend_title="Transport Mode",
-            height=600,
-            plot_bgcolor="#0e1117",  # match your dark theme
-            paper_bgcolor="#0e1117",
-            font_color="white"
-        )
-
-        st.plotly_chart(fig_transport, use_container_width=True)
+        fig_transport = transport_wait_figure(transport_wait, transport_day)
+        show_chart(fig_transport, "Transport Waiting Time by Zone", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -628,48 +943,17 @@ with st.expander("Satisfaction vs Perceived Safety", expanded=False):
             st.error(f"Missing one or more required columns: {required_columns}")
             st.stop()
 
-        # Drop missing or invalid ratings
-        df_safety = df.dropna(subset=list(required_columns)).copy()
-
-        if df_safety.empty:
-            st.warning("No data available after filtering for satisfaction and safety ratings.")
-            st.stop()
-
-        # Group by Nationality and average the scores
-        safety_summary = df_safety.groupby("Nationality")[["Satisfaction_Rating", "Perceived_Safety_Rating"]].mean().reset_index()
-
-        # Add count of participants per nationality
-        safety_summary["Count"] = df_safety["Nationality"].value_counts().reindex(safety_summary["Nationality"]).fillna(0).astype(int).values
-
-        # Filter: Only show nationalities with enough participants (optional)
+        # Group by Nationality, average the scores and only keep nationalities with enough participants
         min_threshold = 5
-        safety_summary = safety_summary[safety_summary["Count"] >= min_threshold]
+        safety_summary = safety_satisfaction_data(nationality_summary, min_threshold)
 
         if safety_summary.empty:
             st.warning(f"No nationalities with at least {min_threshold} participants.")
             st.stop()
 
         # === PLOT ===
-        fig_safety = px.scatter(
-            safety_summary,
-            x="Satisfaction_Rating",
-            y="Perceived_Safety_Rating",
-            size="Count",
-            color="Satisfaction_Rating",
-            hover_name="Nationality",
-            color_continuous_scale="Viridis",
-            title="Satisfaction vs Perceived Safety by Nationality",
-            size_max=30
-        )
-
-        fig_safety.update_layout(
-            xaxis_title="Average Satisfaction Rating",
-            yaxis_title="Average Perceived Safety Rating",
-            height=600,
-            coloraxis_colorbar=dict(title="Satisfaction Score")
-        )
-
-        st.plotly_chart(fig_safety, use_container_width=True)
+        fig_safety = safety_satisfaction_figure(safety_summary)
+        show_chart(fig_safety, "Satisfaction vs Perceived Safety", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -698,70 +982,26 @@ with st.expander("Incident Frequency Over Time", expanded=False):
             sorted(df["DayOfWeek"].dropna().unique()),
             key="incident_time_series_day"
         )
-        df_time_filtered = df[df["DayOfWeek"] == time_series_day].copy()
+        df_time_filtered = df[df["DayOfWeek"] == time_series_day]
 
         # Ensure required columns exist
-        required_columns = {"Timestamp", "Incident_Type"}
+        required_columns = {"Hour", "Incident_Type"}
         if not required_columns.issubset(df_time_filtered.columns):
             st.error(f"Missing one or more required columns: {required_columns}")
             st.stop()
 
-        # Prepare data
-        df_time_filtered["Hour"] = pd.to_datetime(df_time_filtered["Timestamp"], errors='coerce').dt.hour
-        df_time_filtered.dropna(subset=["Hour"], inplace=True)
-        df_time_filtered["Hour"] = df_time_filtered["Hour"].astype(int)
-
         if df_time_filtered.empty:
             st.warning(f"No incident data found for {time_series_day}.")
             st.stop()
 
-        incidents_time = df_time_filtered.groupby(["Hour", "Incident_Type"]).size().reset_index(name="Count")
+        incidents_time = incident_timeline_data(df_time_filtered)
         if incidents_time.empty:
             st.warning("No incident trends available for the selected day.")
             st.stop()
 
-        # Optional custom sort for incident types
-        custom_incident_order = ["Security Breach", "Theft", "Unruly Behavior", "Medical Emergency", "Lost Pilgrim"]
-        incidents_time["Incident_Type"] = pd.Categorical(
-            incidents_time["Incident_Type"],
-            categories=custom_incident_order,
-            ordered=True
-        )
-
         # === PLOT ===
-        fig_time = px.line(
-            incidents_time,
-            x="Hour",
-            y="Count",
-            color="Incident_Type",
-            markers=True,
-            title=f"Incident Frequency Throughout the Day ({time_series_day})",
-            color_discrete_map={
-                "Security Breach": "red",
-                "Theft": "orange",
-                "Unruly Behavior": "purple",
-                "Medical Emergency": "green",
-                "Lost Pilgrim": "blue"
-            },
-            labels={"Count": "Number of Incidents", "Hour": "Hour of Day"}
-        )
-
-        fig_time.update_layout(
-            xaxis=dict(
-                tickmode="linear",
-                tick0=0,
-                dtick=1,
-                tickvals=list(range(0, 24)),
-                ticktext=[
-                    "12AM", "1AM", "2AM", "3AM", "4AM", "5AM", "6AM", "7AM", "8AM", "9AM", "10AM", "11AM",
-                    "12PM", "1PM", "2PM", "3PM", "4PM", "5PM", "6PM", "7PM", "8PM", "9PM", "10PM", "11PM"
-                ]
-            ),
-            yaxis_title="Number of Incidents",
-            height=600
-        )
-
-        st.plotly_chart(fig_time, use_container_width=True)
+        fig_time = incident_timeline_figure(incidents_time, time_series_day)
+        show_chart(fig_time, "Incident Frequency Over Time", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -786,41 +1026,21 @@ with st.expander("Stress Level by Pilgrim Experience", expanded=False):
             st.error(f"Missing one or more required columns: {required_columns}")
             st.stop()
 
-        df_stress = df.dropna(subset=["Pilgrim_Experience", "Stress_Score"]).copy()
-
-        if df_stress.empty:
-            st.warning("No data available to compare stress levels between pilgrim types.")
-            st.stop()
-
-        # Use Pilgrim_Experience directly
-        df_stress["Experience"] = df_stress["Pilgrim_Experience"]
-
         # Group and calculate average stress score
-        stress_summary = df_stress.groupby("Experience")["Stress_Score"].mean().reset_index()
+        stress_summary = experience_data(experience_summary, "Stress_Score")
 
         if stress_summary.empty:
-            st.warning("Not enough data to compute average stress scores.")
+            st.warning("No data available to compare stress levels between pilgrim types.")
             st.stop()
 
         # === PLOT ===
-        fig_stress = px.bar(
+        fig_stress = experience_figure(
             stress_summary,
-            x="Experience",
-            y="Stress_Score",
-            color="Experience",
-            text_auto=".2f",
+            "Stress_Score",
             title="Average Stress Level: First-Time vs Experienced Pilgrims",
-            color_discrete_map={"First-Time": "blue", "Experienced": "green"}
-        )
-
-        fig_stress.update_layout(
-            xaxis_title="Pilgrim Type",
-            yaxis_title="Average Stress Score",
-            height=500,
-            showlegend=False
+            y_title="Average Stress Score"
         )
-
-        st.plotly_chart(fig_stress, use_container_width=True)
+        show_chart(fig_stress, "Stress Level by Pilgrim Experience", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -846,41 +1066,21 @@ with st.expander("Movement Speed by Pilgrim Experience", expanded=False):
             st.error(f"Missing one or more required columns: {required_columns}")
             st.stop()
 
-        df_move = df.dropna(subset=["Pilgrim_Experience", "Movement_Speed"]).copy()
-
-        if df_move.empty:
-            st.warning("No data available to compare movement speed between pilgrim types.")
-            st.stop()
-
-        # Use Pilgrim_Experience directly
-        df_move["Experience"] = df_move["Pilgrim_Experience"]
-
         # Group and calculate average Movement Speed
-        speed_summary = df_move.groupby("Experience")["Movement_Speed"].mean().reset_index()
+        speed_summary = experience_data(experience_summary, "Movement_Speed")
 
         if speed_summary.empty:
-            st.warning("Not enough data to compute average movement speeds.")
+            st.warning("No data available to compare movement speed between pilgrim types.")
             st.stop()
 
         # === PLOT ===
-        fig_move = px.bar(
+        fig_move = experience_figure(
             speed_summary,
-            x="Experience",
-            y="Movement_Speed",
-            color="Experience",
-            text_auto=".2f",
+            "Movement_Speed",
             title="Average Movement Speed: First-Time vs Experienced Pilgrims",
-            color_discrete_map={"First-Time": "blue", "Experienced": "green"}
-        )
-
-        fig_move.update_layout(
-            xaxis_title="Pilgrim Type",
-            yaxis_title="Average Speed (m/s)",
-            height=500,
-            showlegend=False
+            y_title="Average Speed (m/s)"
         )
-
-        st.plotly_chart(fig_move, use_container_width=True)
+        show_chart(fig_move, "Movement Speed by Pilgrim Experience", use_container_width=True)
 
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
@@ -904,70 +1104,397 @@ with st.expander("Health Condition Frequency", expanded=False):
             st.error("Missing 'Health_Condition' column in the dataset.")
             st.stop()
 
-        # Drop missing
-        df_health = df.dropna(subset=["Health_Condition"]).copy()
+        # Group and count ("Normal" rows are removed because they are not incidents)
+        health_counts = health_condition_data(df)
 
-        if df_health.empty:
-            st.warning("No health condition data available.")
+        if health_counts.empty:
+            st.warning("No valid health condition incidents found.")
             st.stop()
 
-        # Remove "Normal" rows because they are not incidents
-        df_health = df_health[df_health["Health_Condition"] != "Normal"]
+        # Plot
+        fig_health = health_condition_figure(health_counts)
+        show_chart(fig_health, "Health Condition Frequency", use_container_width=True)
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error while processing health incidents: {e}")
+    except Exception as e:
+        st.error(f"An unexpected error occurred while generating the chart: {e}")
+
 
-        if df_health.empty:
-            st.warning("All health condition data is marked 'Normal'; no incidents to display.")
+
+
+
+
+
+# === CROWD FORECAST ===
+with st.expander("Crowd Density Forecast (Next 1-3 Hours)", expanded=False):
+    try:
+        st.subheader("Forecast Crowd Level and Incidents by Zone")
+
+        forecaster, hourly_series = load_forecaster(dataset_name, data_version)
+        if forecaster.metadata.get("boosted"):
+            st.caption(f"Gradient boosting model version {forecaster.version}")
+        elif forecaster.metadata.get("outdated_model"):
+            st.warning(f"The saved model {forecaster.metadata['outdated_model']} was trained on an older version of "
+                       "this data (or of the forecast code), so the seasonal baseline is used instead. Retrain it with "
+                       f"`python src/forecasting.py train <csv> --model-dir {FORECAST_MODEL_DIR}/{dataset_name}`.")
+        else:
+            st.caption("Seasonal baseline (same zone, weekday and hour). Train a boosted model with "
+                       f"`python src/forecasting.py train <csv> --model-dir {FORECAST_MODEL_DIR}/{dataset_name}`.")
+
+        # === FILTERS ===
+        last_hour = hourly_series["Bucket"].max()
+        forecast_date = st.date_input(
+            "Forecast From Date",
+            value=last_hour.date(),
+            min_value=hourly_series["Bucket"].min().date(),
+            max_value=last_hour.date(),
+            key="forecast_date"
+        )
+        forecast_hour = st.selectbox(
+            "Forecast From Hour",
+            list(range(24)),
+            index=last_hour.hour,
+            format_func=lambda h: HOUR_LABELS[h],
+            key="forecast_hour"
+        )
+        forecast_at = pd.Timestamp(forecast_date) + pd.Timedelta(hours=forecast_hour)
+
+        forecast = forecaster.predict(hourly_series, at=forecast_at)
+
+        # === PLOT ===
+        metric = st.radio("Forecast Metric", ["Crowd Level", "Incidents"], horizontal=True, key="forecast_metric")
+        if metric == "Crowd Level":
+            fig_forecast = forecast_figure(
+                forecast, "Predicted_Crowd_Level",
+                title=f"Predicted Crowd Level (1 = Low, 3 = High) after {forecast_at:%b %d, %I%p}",
+                y_title="Predicted Crowd Level"
+            )
+        else:
+            fig_forecast = forecast_figure(
+                forecast, "Predicted_Incidents",
+                title=f"Predicted Incidents per Hour after {forecast_at:%b %d, %I%p}",
+                y_title="Predicted Incidents"
+            )
+        show_chart(fig_forecast, "Crowd Density Forecast (Next 1-3 Hours)", use_container_width=True)
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error while forecasting: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error generating the forecast: {e}")
+
+
+
+
+
+
+
+# === SEASON COMPARISON ===
+with st.expander("Season Comparison", expanded=False):
+    try:
+        st.subheader("Compare Events and Seasons")
+        st.caption("Computed from each dataset's stored aggregates, so the raw rows are not scanned again.")
+
+        compare_names = st.multiselect(
+            "Datasets to Compare",
+            dataset_names,
+            default=dataset_names,
+            format_func=lambda name: registry["datasets"][name]["label"],
+            key="compare_datasets"
+        )
+
+        if not compare_names:
+            st.warning("Select at least one dataset to compare.")
             st.stop()
 
-        # Group and count
-        health_counts = df_health["Health_Condition"].value_counts().reset_index()
-        health_counts.columns = ["Health Condition", "Count"]
+        st.dataframe(compare_datasets(compare_names, "summary"), hide_index=True)
 
-        if health_counts.empty:
-            st.warning("No valid health condition incidents found.")
+        compare_metric = st.selectbox(
+            "Metric by Hour",
+            ["Records", "Avg_Movement_Speed", "Avg_Stress_Score", "Avg_Fatigue_Score", "Emergency_Rate"],
+            key="compare_metric"
+        )
+        hourly = compare_datasets(compare_names, "hourly_profile")
+        fig_compare = season_comparison_figure(hourly, compare_metric)
+        show_chart(fig_compare, "Season Comparison", use_container_width=True)
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error while comparing datasets: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error comparing datasets: {e}")
+
+
+
+
+
+
+
+# === TIME WINDOW ROLLUPS ===
+with st.expander("Time Window Rollups", expanded=False):
+    try:
+        st.subheader("Crowd Activity by Time Window")
+        st.caption(
+            "Read from pre-aggregated 5/15/60 minute rollups. The date range, zone and incident type "
+            "filters apply here; the other sidebar filters do not."
+        )
+        rollups = load_time_rollups(dataset_name, data_version)
+
+        rollup_day = st.selectbox(
+            "Select Date",
+            sorted(df["Date"].dt.date.unique()),
+            key="rollup_day"
+        )
+        col_a, col_b = st.columns(2)
+        window_minutes = col_a.selectbox("Window Size (minutes)", [5, 15, 30, 60, 120], index=1, key="rollup_window")
+        rolling_options = ["None"] + [m for m in [30, 60, 120, 180] if m % window_minutes == 0 and m > window_minutes]
+        rolling_choice = col_b.selectbox("Rolling Window (minutes)", rolling_options, key="rollup_rolling")
+
+        rollup_metric = st.selectbox(
+            "Metric",
+            ["Events"] + [f"Avg_{m}" for m in rollups.metrics],
+            format_func=lambda c: c.replace("Avg_", "Average ").replace("_", " "),
+            key="rollup_metric"
+        )
+        split_by = st.radio("Split By", ["None", "Zone", "Incident_Type"], horizontal=True, key="rollup_split")
+        by = [] if split_by == "None" else [split_by]
+
+        query = dict(
+            zones=selected_filters.get("Zone"),
+            incident_types=selected_filters.get("Incident_Type"),
+            start=pd.Timestamp(rollup_day),
+            end=pd.Timestamp(rollup_day) + pd.Timedelta(days=1),
+            by=by,
+        )
+        if rolling_choice == "None":
+            rollup_series = rollups.series(window_minutes, **query)
+            title = f"{window_minutes}-Minute Windows ({rollup_day})"
+        else:
+            rollup_series = rollups.rolling(window_minutes, rolling_choice, **query)
+            title = f"Rolling {rolling_choice} Minutes, Every {window_minutes} Minutes ({rollup_day})"
+
+        if rollup_series.empty:
+            st.warning("No data for the selected date and filters.")
             st.stop()
 
-        custom_color_map = {
-            "Fainting": "#E63946",      # Muted Red
-            "Heatstroke": "#F4A261",    # Soft Orange
-            "Injured": "#A44CC9",       # Calm Purple
-            "Dehydration": "#457B9D"    # Muted Blue
-        }
+        fig_rollup = time_rollup_figure(rollup_series, rollup_metric, by[0] if by else None, title)
+        show_chart(fig_rollup, "Time Window Rollups", use_container_width=True)
 
-        # Plot
-        fig_health = px.bar(
-            health_counts,
-            x="Health Condition",
-            y="Count",
-            color="Health Condition",
-            text_auto=True,
-            color_discrete_map=custom_color_map,
-            title="Health Condition Incident Counts"
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error while building time windows: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error generating time window chart: {e}")
+
+
+
+
+
+
+
+# === TRANSPORT QUEUES & THROUGHPUT ===
+with st.expander("Transport Queues & Throughput", expanded=False):
+    try:
+        st.subheader("Arrivals and Queues by Transport Mode")
+        st.caption(
+            "Queue lengths use Little's law (people waiting = arrivals per minute x average wait). "
+            "Percentiles are accurate to 2 minutes. The date range and zone filters apply here."
+        )
+        queue_stats = load_queue_stats(dataset_name, data_version)
+
+        queue_day = st.selectbox("Select Date", sorted(df["Date"].dt.date.unique()), key="queue_day")
+        mode_options = sorted(queue_stats.index.get_level_values("Transport_Mode").unique())
+        queue_modes = st.multiselect(
+            "Transport Modes",
+            mode_options,
+            default=[m for m in mode_options if m != "Walking"],
+            key="queue_modes"
         )
+        col_a, col_b = st.columns(2)
+        queue_metric = col_a.selectbox(
+            "Metric",
+            list(QUEUE_METRIC_LABELS),
+            format_func=QUEUE_METRIC_LABELS.get,
+            key="queue_metric"
+        )
+        rolling_hour = col_b.checkbox("Rolling hour instead of 15-minute windows", key="queue_rolling")
 
-        fig_health.update_layout(
-            xaxis_title="Health Condition",
-            yaxis_title="Number of Cases",
-            height=500,
-            showlegend=False,
-            plot_bgcolor="#0e1117",   # Dark background
-            paper_bgcolor="#0e1117",
-            font_color="white",
-            title_font_size=24
+        query = dict(
+            zones=selected_filters.get("Zone"),
+            modes=queue_modes,
+            start=pd.Timestamp(queue_day),
+            end=pd.Timestamp(queue_day) + pd.Timedelta(days=1),
         )
+        if rolling_hour:
+            window_table = queue_stats.rolling_stats(by=["Transport_Mode"], **query)
+        else:
+            window_table = queue_stats.window_stats(by=["Transport_Mode"], **query)
+
+        if window_table.empty:
+            st.warning("No transport data for the selected date and filters.")
+            st.stop()
+
+        fig_queue = queue_figure(window_table, queue_metric, f"{QUEUE_METRIC_LABELS[queue_metric]} ({queue_day})")
+        show_chart(fig_queue, "Transport Queues & Throughput", use_container_width=True)
 
-        fig_health.update_traces(
-            textfont_size=14,
-            textposition="outside"
+        st.markdown("**Zone and Mode Summary for the Day**")
+        summary_columns = [
+            "Zone", "Transport_Mode", "Arrivals", "Arrival_Rate_per_min", "Avg_Transport_Wait",
+            "P90_Transport_Wait", "Est_Queue_Length", "Est_Security_Queue"
+        ]
+        st.dataframe(queue_stats.mode_summary(**query)[summary_columns].round(2), hide_index=True)
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error while computing queue statistics: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error generating queue chart: {e}")
+
+
+
+# === CROWD FLOWS BETWEEN ZONES ===
+with st.expander("Crowd Flows Between Zones", expanded=False):
+    try:
+        st.subheader("Estimated Crowd Flows Between Zones")
+        st.caption(
+            "There are no individual tracks in the data, so flows are estimated from how each zone's "
+            "head count changes from one time bucket to the next. The date range filter applies here."
         )
+        zone_flows = load_zone_flows(dataset_name, data_version)
 
-        st.plotly_chart(fig_health, use_container_width=True)
+        col_a, col_b = st.columns(2)
+        flow_day = col_a.selectbox("Select Date", sorted(df["Date"].dt.date.unique()), key="flow_day")
+        flow_bucket = col_b.selectbox(
+            "Bucket Size (minutes)", BUCKET_OPTIONS, index=BUCKET_OPTIONS.index(60), key="flow_bucket"
+        )
+        flow_activities = st.multiselect(
+            "Activities (empty = all)", zone_flows.activities, default=[], key="flow_activities"
+        )
+        flow_hours = st.slider("Hours for the Sankey diagram", 0, 24, (0, 24), key="flow_hours")
+
+        day_flows = zone_flows.day(flow_day, flow_bucket, flow_activities)
+        day_start = pd.Timestamp(flow_day)
+        edges = day_flows.edges(
+            start=day_start + pd.Timedelta(hours=flow_hours[0]),
+            end=day_start + pd.Timedelta(hours=flow_hours[1]),
+        )
+
+        if edges.empty:
+            st.warning("No movement between zones for the selected date and hours.")
+        else:
+            fig_sankey = zone_flow_sankey_figure(
+                edges, zone_flows.zones, f"Zone to Zone Flows ({flow_day}, {flow_hours[0]}:00-{flow_hours[1]}:00)"
+            )
+            show_chart(fig_sankey, "Crowd Flows Between Zones", use_container_width=True)
 
+            fig_lines = zone_flow_animation_figure(
+                day_flows.timeline(), day_flows.occupancy_frame(), zone_flows.positions,
+                f"Flows Through the Day, {flow_bucket}-Minute Buckets (press Play)"
+            )
+            show_chart(fig_lines, "Crowd Flows Between Zones", use_container_width=True)
+
+            st.markdown("**Flow Matrix (people, rows = from, columns = to)**")
+            st.dataframe(day_flows.matrix(
+                start=day_start + pd.Timedelta(hours=flow_hours[0]),
+                end=day_start + pd.Timedelta(hours=flow_hours[1]),
+            ).round(1))
+
+    except ImportError as e:
+        st.error(str(e))
     except KeyError as e:
         st.error(f"Missing expected column: {e}")
     except ValueError as e:
-        st.error(f"Value error while processing health incidents: {e}")
+        st.error(f"Value error while computing zone flows: {e}")
     except Exception as e:
-        st.error(f"An unexpected error occurred while generating the chart: {e}")
+        st.error(f"Unexpected error generating zone flow charts: {e}")
+
+
+
+# === WHAT DRIVES INCIDENTS AND STRESS ===
+with st.expander("What Drives Incidents and Stress", expanded=False):
+    try:
+        st.subheader("Incident and Stress Drivers")
+        st.caption(
+            "Built once per dataset version from running sums per zone and hour, so changing the "
+            "options below does not rescan the data. Uses the whole dataset (the sidebar filters do not apply). "
+            "Importance comes from a linear model, so it shows association, not cause."
+        )
+        driver_stats = load_driver_analysis(dataset_name, data_version)
+
+        col_a, col_b = st.columns(2)
+        driver_target = col_a.selectbox(
+            "Outcome", driver_stats.targets, format_func=driver_target_label, key="driver_target"
+        )
+        driver_zones = col_b.multiselect("Zones (empty = all)", driver_stats.zones, default=[], key="driver_zones")
+        driver_hours = st.slider("Hours of Day", 0, 23, (0, 23), key="driver_hours")
+        hours = list(range(driver_hours[0], driver_hours[1] + 1))
+
+        if driver_stats.rows(driver_zones, hours) < 30:
+            st.warning("Not enough rows for the selected zones and hours.")
+        else:
+            target_label = driver_target_label(driver_target)
+            importance = driver_stats.importance(driver_target, driver_zones, hours)
+            fig_importance = driver_importance_figure(importance, f"What Goes With {target_label}")
+            show_chart(fig_importance, "What Drives Incidents and Stress", use_container_width=True)
+            st.caption(f"The drivers together explain {importance.attrs['r_squared']:.1%} of the variation.")
+
+            rates = driver_stats.conditional_rates(driver_target, driver_zones, hours)
+            fig_rates = driver_rates_figure(rates, driver_target, f"{target_label} by Driver Level")
+            show_chart(fig_rates, "What Drives Incidents and Stress", use_container_width=True)
+
+            corr = driver_stats.correlation(driver_zones, hours, columns=NUMERIC_DRIVERS + [driver_target])
+            fig_corr = correlation_figure(corr, "Correlation Matrix")
+            show_chart(fig_corr, "What Drives Incidents and Stress", use_container_width=True)
+
+            by_hour = driver_stats.correlation_by(driver_target, by="Hour").loc[hours]
+            fig_hourly = correlation_figure(by_hour, f"Correlation With {target_label} by Hour of Day")
+            show_chart(fig_hourly, "What Drives Incidents and Stress", use_container_width=True)
+
+    except KeyError as e:
+        st.error(f"Missing expected column: {e}")
+    except ValueError as e:
+        st.error(f"Value error in the driver analysis: {e}")
+    except Exception as e:
+        st.error(f"Unexpected error generating driver charts: {e}")
+
+
+
+
+
+
+
+# === PAYLOAD SIZE REPORT ===
+with st.expander("Payload Sizes", expanded=False):
+    try:
+        st.caption(
+            "Size of each chart and map sent to the browser in this run: as built, after compacting "
+            "(smaller number types, coordinates rounded to about 1 m) and gzip-compressed, which is "
+            "what goes over the websocket when compression is on (.streamlit/config.toml). "
+            "Only panels that were drawn are listed."
+        )
+        if not measure_payloads:
+            st.info('Turn on "Measure payload sizes" in the sidebar to fill this table.')
+        else:
+            payload_table = payload_report.table()
+            if payload_table.empty:
+                st.warning("No charts were drawn in this run.")
+            else:
+                total = payload_table[["Original_KB", "Compact_KB", "Gzip_KB"]].sum()
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Original", f"{total['Original_KB']:,.0f} KB")
+                col2.metric("Compact", f"{total['Compact_KB']:,.0f} KB")
+                col3.metric("Gzip", f"{total['Gzip_KB']:,.0f} KB")
+                st.dataframe(payload_table.round(1), use_container_width=True, hide_index=True)
+
+    except Exception as e:
+        st.error(f"Unexpected error building the payload report: {e}")
 
 
 
@@ -0,0 +1,173 @@
+import math
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# === DETECTOR SETTINGS ===
+WINDOW_MINUTES = 60      # events are averaged per zone over windows of this length
+EWMA_ALPHA = 0.2         # how fast the "usual" pattern adapts (higher = forgets faster)
+Z_THRESHOLD = 2.5        # how many standard deviations away counts as unusual
+WARMUP_WINDOWS = 5       # windows needed for a zone/hour before it can raise alerts
+MAX_ALERTS = 500         # only the most recent alerts are kept in memory
+
+# metric -> direction that is bad (-1 = a drop is bad, +1 = a spike is bad)
+WATCHED_METRICS = {
+    "Movement_Speed": -1,
+    "Stress_Score": 1,
+}
+ALERT_NAMES = {
+    "Movement_Speed": "Movement speed drop",
+    "Stress_Score": "Stress spike",
+}
+# alert table columns and their types
+ALERT_COLUMNS = {
+    "Zone": "object", "Window_Start": "datetime64[ns]", "Hour": "int64", "Alert": "object", "Metric": "object",
+    "Value": "float64", "Expected": "float64", "Z_Score": "float64", "Events": "int64",
+}
+
+
+# === STREAMING ANOMALY DETECTOR ===
+class StreamingAnomalyDetector:
+    """
+    Flags zones whose movement speed drops or stress spikes compared with their usual
+    pattern for that hour of the day.
+
+    Events are added one by one with update(). Each zone keeps running sums for its current
+    window; when a window closes, its averages are compared with an EWMA mean/variance for the
+    same zone and hour of day (the seasonal baseline). Every step is O(1) per event.
+    """
+
+    def __init__(self, window_minutes: int = WINDOW_MINUTES, alpha: float = EWMA_ALPHA,
+                 z_threshold: float = Z_THRESHOLD, warmup: int = WARMUP_WINDOWS, max_alerts: int = MAX_ALERTS):
+        self.window_ns = int(window_minutes * 60 * 1e9)
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.alerts = deque(maxlen=max_alerts)
+
+        # zone -> [window_start_ns, events, {metric: [sum, count]}]
+        self.open_windows = {}
+        # (zone, hour, metric) -> [windows_seen, ewma_mean, ewma_var]
+        self.baselines = {}
+        self.last_window = None       # start (ns) of the latest window any event fell in
+
+    def update(self, zone: str, timestamp, values: dict) -> list:
+        """
+        Adds one event. Returns the alerts raised by any window that closed because of it.
+        timestamp can be a pandas Timestamp, datetime64 or int nanoseconds.
+        """
+        ts_ns = timestamp if isinstance(timestamp, (int, np.integer)) else pd.Timestamp(timestamp).value
+        window_start = ts_ns - ts_ns % self.window_ns
+
+        if self.last_window is None or window_start > self.last_window:
+            self.last_window = window_start
+
+        raised = []
+        window = self.open_windows.get(zone)
+        if window is not None and window[0] != window_start:
+            raised = self._close_window(zone, window)
+            window = None
+        if window is None:
+            window = [window_start, 0, {metric: [0.0, 0] for metric in WATCHED_METRICS}]
+            self.open_windows[zone] = window
+
+        window[1] += 1
+        for metric in WATCHED_METRICS:
+            value = values.get(metric)
+            if value is not None and not math.isnan(value):
+                totals = window[2][metric]
+                totals[0] += value
+                totals[1] += 1
+        return raised
+
+    def can_continue(self, timestamps) -> bool:
+        """
+        True when every timestamp falls in a later window than the events added so far, so feeding
+        them on top gives the same state as replaying all the events from scratch.
+        """
+        first = pd.Series(timestamps).min()
+        if self.last_window is None or pd.isna(first):
+            return True
+        first_ns = pd.Timestamp(first).value
+        return first_ns - first_ns % self.window_ns > self.last_window
+
+    def flush(self) -> list:
+        """
+        Closes every open window (e.g. at the end of a batch) and returns the alerts raised.
+        """
+        raised = []
+        for zone, window in list(self.open_windows.items()):
+            raised.extend(self._close_window(zone, window))
+        self.open_windows.clear()
+        return raised
+
+    def _close_window(self, zone: str, window: list) -> list:
+        window_start, count, totals = window
+        hour = (window_start // 3_600_000_000_000) % 24
+        raised = []
+        for metric, direction in WATCHED_METRICS.items():
+            metric_sum, metric_count = totals[metric]
+            if metric_count == 0:
+                continue
+            value = metric_sum / metric_count
+            key = (zone, hour, metric)
+            state = self.baselines.get(key)
+
+            if state is None:
+                self.baselines[key] = [1, value, 0.0]
+                continue
+
+            seen, mean, var = state
+            if seen >= self.warmup and var > 0:
+                z_score = (value - mean) / math.sqrt(var)
+                if z_score * direction >= self.z_threshold:
+                    alert = {
+                        "Zone": zone,
+                        "Window_Start": pd.Timestamp(window_start),
+                        "Hour": hour,
+                        "Alert": ALERT_NAMES[metric],
+                        "Metric": metric,
+                        "Value": value,
+                        "Expected": mean,
+                        "Z_Score": z_score,
+                        "Events": count,
+                    }
+                    self.alerts.append(alert)
+                    raised.append(alert)
+
+            # exponentially weighted mean and variance (West's incremental form)
+            diff = value - mean
+            increment = self.alpha * diff
+            state[0] = seen + 1
+            state[1] = mean + increment
+            state[2] = (1 - self.alpha) * (var + diff * increment)
+
+        return raised
+
+    def alert_table(self) -> pd.DataFrame:
+        # typed columns, so an empty table still works with .dt and number formatting
+        return pd.DataFrame(list(self.alerts), columns=list(ALERT_COLUMNS)).astype(ALERT_COLUMNS)
+
+
+# === DETECT ANOMALIES IN A FRAME ===
+# This function replays a cleaned frame through the detector in time order, like a live stream.
+def detect_anomalies(df: pd.DataFrame, detector: StreamingAnomalyDetector = None) -> StreamingAnomalyDetector:
+    required_columns = {"Zone", "Timestamp"} | set(WATCHED_METRICS)
+    if not required_columns.issubset(df.columns):
+        raise KeyError(f"Missing one or more required columns: {required_columns}")
+
+    if detector is None:
+        detector = StreamingAnomalyDetector()
+
+    events = df.dropna(subset=["Zone", "Timestamp"]).sort_values("Timestamp", kind="stable")
+    zones = events["Zone"].to_numpy()
+    timestamps = events["Timestamp"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    metric_arrays = {metric: events[metric].to_numpy(dtype=float) for metric in WATCHED_METRICS}
+
+    for i in range(len(events)):
+        detector.update(zones[i], int(timestamps[i]), {metric: arr[i] for metric, arr in metric_arrays.items()})
+    detector.flush()
+
+    return detector
@@ -1,10 +1,19 @@
 import pandas as pd
 import numpy as np
 
-import pandas as pd
-import numpy as np
+from validation import validate_frame, write_validation_outputs
+from simulation import simulate_zones
+
 
-def load_and_clean_data(csv_path: str) -> pd.DataFrame:
+def load_and_clean_data(csv_path: str, validate: bool = True, quarantine_dir: str = None,
+                        row_offset: int = 0) -> pd.DataFrame:
+    """
+    Loads the CSV, validates it and adds the derived columns used by the dashboard.
+    Rows that fail validation are written to a quarantine file instead of being dropped silently,
+    and the validation summary is kept in df.attrs["validation_report"].
+    row_offset is added to the row numbers the simulated zones are drawn from, so every file
+    of a multi-file dataset gets its own draws.
+    """
     try:
         df = pd.read_csv(csv_path)
     except FileNotFoundError:
@@ -13,17 +22,46 @@ def load_and_clean_data(csv_path: str) -> pd.DataFrame:
         raise ValueError("The CSV file is empty.")
     except pd.errors.ParserError:
         raise ValueError("Error parsing the CSV file.")
-    
+
+    df = prepare_frame(df)
+
+    # === VALIDATION ===
+    # Bad timestamps, out-of-range values and unknown categories go to the quarantine file
+    if validate:
+        df, quarantine_df, report = validate_frame(df)
+        report = write_validation_outputs(csv_path, quarantine_df, report, quarantine_dir)
+    else:
+        df = df.dropna(subset=["Timestamp"])
+        report = None
+
+    df = add_derived_columns(df, row_ids=df.index.to_numpy() + row_offset)
+    df.attrs["validation_report"] = report
+    return df
+
+
+# === CLEANING STEPS ===
+# These work on any slice of the raw rows, so the out-of-core mode (out_of_core.py)
+# can run them one chunk at a time.
+def prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
     try:
         # clean and preprocess the data
         df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors='coerce')
-        df.dropna(subset=["Timestamp"], inplace=True)
-        df["Hour"] = df["Timestamp"].dt.hour
-        df["DayOfWeek"] = df["Timestamp"].dt.day_name()
-        
+
         df["Crowd_Density"] = df["Crowd_Density"].str.title()
         df["Fatigue_Level"] = df["Fatigue_Level"].str.title()
         df["Stress_Level"] = df["Stress_Level"].str.title()
+    except KeyError as e:
+        raise KeyError(f"Missing expected column: {e}")
+    except AttributeError as e:
+        raise ValueError(f"Expected text values in the level columns: {e}")
+    return df
+
+
+def add_derived_columns(df: pd.DataFrame, row_ids: np.ndarray = None, workers: int = None) -> pd.DataFrame:
+    try:
+        df["Date"] = df["Timestamp"].dt.normalize()
+        df["Hour"] = df["Timestamp"].dt.hour
+        df["DayOfWeek"] = df["Timestamp"].dt.day_name()
 
         df["AR_Navigation_Success"] = df["AR_Navigation_Success"].map({"Yes": 1, "No": 0})
         
@@ -33,47 +71,19 @@ def load_and_clean_data(csv_path: str) -> pd.DataFrame:
         df["Stress_Score"] = df["Stress_Level"].map(level_map)
     except KeyError as e:
         raise KeyError(f"Missing expected column: {e}")
-    except Exception as e:
-        raise RuntimeError(f"Unexpected error during preprocessing: {e}")
 
     # === SIMULATED ZONE DISTRIBUTION ===
+    # The zone of each row is simulated because the original coordinates do not line up with the zones.
+    # Weights are in config/simulation.json and the positions are drawn inside the zone polygons (geofences.json).
+    # Each row's random draws depend only on its row number in the source file (df.index), so chunked or
+    # parallel ingest gives exactly the same zones.
     try:
-        np.random.seed(42)
-
-        # Define zones and weights
-        zone_centers = {
-            "Tawaf": (21.4225, 39.8262),
-            "Sa’i": (21.4215, 39.8280),
-            "Mina": (21.4300, 39.8900),
-            "Arafat": (21.3550, 39.9850),
-            "Muzdalifah": (21.3850, 39.8920),
-            "Other": (21.4190, 39.8200)
-        }
-
-        # Define weights for each zone to simulate a realistic distribution
-        # These weights are arbitrary and should be adjusted based on real-world data because the original data
-        # set does not provide a clear distribution of zones.
-        zone_weights = {
-            "Tawaf": 0.25,
-            "Sa’i": 0.20,
-            "Mina": 0.30,
-            "Arafat": 0.10,
-            "Muzdalifah": 0.10,
-            "Other": 0.05
-        }
-
-        # Sample zones based on weights
-        zone_choices = np.random.choice(
-            list(zone_centers.keys()),
-            size=len(df),
-            p=list(zone_weights.values())
-        )
-        df["Zone"] = zone_choices
-
-        # Apply random lat/lon around each zone's center (this is a simulation because the orginal data of the area did not align with the zones)
-        jitter = lambda c: np.random.uniform(-0.0015, 0.0015)  # ≈150m variation
-        df["Sim_Lat"] = df["Zone"].apply(lambda z: zone_centers[z][0] + jitter(0))
-        df["Sim_Lon"] = df["Zone"].apply(lambda z: zone_centers[z][1] + jitter(0))
+        if row_ids is None:
+            row_ids = df.index.to_numpy() if pd.api.types.is_integer_dtype(df.index) else np.arange(len(df))
+        simulated = simulate_zones(row_ids, workers=workers)
+        df["Zone"] = simulated["Zone"].to_numpy()
+        df["Sim_Lat"] = simulated["Sim_Lat"].to_numpy()
+        df["Sim_Lon"] = simulated["Sim_Lon"].to_numpy()
 
         df["Location_Lat"] = df["Sim_Lat"]
         df["Location_Long"] = df["Sim_Lon"]
@@ -82,7 +92,7 @@ def load_and_clean_data(csv_path: str) -> pd.DataFrame:
         df["Real_Lat"] = df["Sim_Lat"]
         df["Real_Lon"] = df["Sim_Lon"]
 
-    except Exception as e:
+    except (KeyError, ValueError) as e:
         raise RuntimeError(f"Error during simulated zone distribution: {e}")
 
     return df
@@ -97,7 +107,11 @@ def load_and_clean_data(csv_path: str) -> pd.DataFrame:
 
 # === AGGREGATE DATA FOR DASHBOARD ===
 # This function aggregates the data for various metrics to be displayed on the dashboard.
+# When the data is an on-disk chunked dataset (see out_of_core.py) it switches to chunked execution.
 def aggregate_metrics(df: pd.DataFrame) -> dict:
+    if hasattr(df, "iter_chunks"):
+        return aggregate_metrics_chunked(df)
+
     aggregations = {}
 
     # 1. Most common fatigue and stress levels by hour (for trends)
@@ -114,9 +128,10 @@ def aggregate_metrics(df: pd.DataFrame) -> dict:
     # 3. Satisfaction vs perceived safety by nationality
     aggregations['safety_vs_satisfaction'] = df.groupby("Nationality")[["Satisfaction_Rating", "Perceived_Safety_Rating"]].mean().reset_index()
 
-    # 4. Movement speed by location (for heatmap)
+    # 4. Movement speed by location (for heatmap), per grid cell
+    grid = df[["Location_Lat", "Location_Long"]].round(LOCATION_GRID_DECIMALS)
     aggregations['movement_speed_by_location'] = (
-        df.groupby(["Location_Lat", "Location_Long"])["Movement_Speed"]
+        df.groupby([grid["Location_Lat"], grid["Location_Long"]])["Movement_Speed"]
         .mean()
         .reset_index()
     )
@@ -143,11 +158,16 @@ def aggregate_movement_speed_for_heatmap(df: pd.DataFrame, use_simulated=True) -
     if lat_col not in df.columns or lon_col not in df.columns:
         raise KeyError(f"Missing expected column: {lat_col} or {lon_col}")
 
-    df = df.copy()
-    df["lat_rounded"] = df[lat_col].round(4)
-    df["lon_rounded"] = df[lon_col].round(4)
+    def add_grid(chunk):
+        chunk = chunk.copy()
+        chunk["lat_rounded"] = chunk[lat_col].round(4)
+        chunk["lon_rounded"] = chunk[lon_col].round(4)
+        return chunk
 
-    heatmap_df = df.groupby(["lat_rounded", "lon_rounded"])["Movement_Speed"].mean().reset_index()
+    heatmap_df = grouped_stats(
+        df, ["lat_rounded", "lon_rounded"], means=["Movement_Speed"],
+        columns=[lat_col, lon_col, "Movement_Speed"], prepare=add_grid
+    )
     heatmap_df.rename(columns={
         "lat_rounded": "Latitude",
         "lon_rounded": "Longitude",
@@ -156,3 +176,105 @@ def aggregate_movement_speed_for_heatmap(df: pd.DataFrame, use_simulated=True) -
 
     return heatmap_df
 
+
+
+# === CHUNKED (OUT-OF-CORE) AGGREGATION ===
+# Means are kept as sums and counts per chunk and only divided at the end,
+# so the result matches the in-memory groupby while only one chunk is loaded at a time.
+def grouped_stats(data, keys: list, means: list = (), sums: list = (), size_name: str = None,
+                  columns: list = None, prepare=None, key_decimals: dict = None) -> pd.DataFrame:
+    """
+    Per-group means, sums and row counts for a DataFrame or a chunked dataset.
+    columns limits what is read from disk; prepare(chunk) can add derived key columns;
+    key_decimals rounds float key columns (e.g. coordinates) so they group into grid cells.
+    """
+    chunks = data.iter_chunks(columns=columns) if hasattr(data, "iter_chunks") else [data]
+    # a generator, so every chunk's partial is folded into the running totals and dropped
+    partials = (partial_stats(prepare(chunk) if prepare is not None else chunk, keys, means, sums, size_name, key_decimals)
+                for chunk in chunks)
+    return combine_partial_stats(partials, keys, means, sums, size_name)
+
+
+def partial_stats(chunk: pd.DataFrame, keys: list, means: list = (), sums: list = (), size_name: str = None,
+                  key_decimals: dict = None) -> pd.DataFrame:
+    """
+    Sums and counts per group for one chunk (or one file of a dataset); add several of them up
+    with combine_partial_stats. Partials are kept as plain columns (no MultiIndex).
+    """
+    if key_decimals:
+        chunk = chunk.assign(**{col: chunk[col].round(decimals) for col, decimals in key_decimals.items()})
+    grouped = chunk.groupby(list(keys), sort=False)
+    parts = {}
+    if size_name:
+        parts[size_name] = grouped.size()
+    for col in means:
+        parts[f"{col}__sum"] = grouped[col].sum()
+        parts[f"{col}__count"] = grouped[col].count()
+    for col in sums:
+        parts[col] = grouped[col].sum()
+    return pd.DataFrame(parts).reset_index()
+
+
+def combine_partial_stats(partials, keys: list, means: list = (), sums: list = (), size_name: str = None) -> pd.DataFrame:
+    """
+    Adds up partials (a list or a generator) one at a time, so only the running totals and the
+    newest partial are in memory: the peak depends on the number of groups, not of rows.
+    """
+    keys, means, sums = list(keys), list(means), list(sums)
+    combined = None
+    for partial in partials:
+        stacked = partial.set_index(keys) if combined is None else pd.concat([combined, partial.set_index(keys)])
+        combined = stacked.groupby(level=keys, sort=False).sum()
+        del stacked, partial
+    if combined is None:
+        return pd.DataFrame(columns=keys + ([size_name] if size_name else []) + means + sums)
+    combined = combined.sort_index()
+
+    result = pd.DataFrame(index=combined.index)
+    if size_name:
+        result[size_name] = combined[size_name]
+    for col in means:
+        result[col] = combined[f"{col}__sum"] / combined[f"{col}__count"].replace(0, np.nan)
+    for col in sums:
+        result[col] = combined[col]
+    return result.reset_index()
+
+
+# Movement speed by location is averaged per grid cell of about 110 m, not per raw coordinate (which
+# would be one group per row). Validation keeps coordinates inside MAKKAH_BOUNDS, so there are at most
+# 400 x 400 cells however many rows the dataset has.
+LOCATION_GRID_DECIMALS = 3
+
+# What aggregate_metrics computes, as group keys + averaged columns + counted rows, so the same
+# numbers can be built from chunks or from the stored partials of each file of a dataset
+METRIC_STATS = {
+    "fatigue_stress_by_hour": dict(keys=["Hour"], means=["Fatigue_Score", "Stress_Score"]),
+    "incidents_by_type_and_density": dict(keys=["Incident_Type", "Crowd_Density"], size_name="Count"),
+    "safety_vs_satisfaction": dict(keys=["Nationality"], means=["Satisfaction_Rating", "Perceived_Safety_Rating"]),
+    "movement_speed_by_location": dict(
+        keys=["Location_Lat", "Location_Long"], means=["Movement_Speed"],
+        key_decimals={"Location_Lat": LOCATION_GRID_DECIMALS, "Location_Long": LOCATION_GRID_DECIMALS}),
+    "wait_time_by_transport": dict(keys=["Transport_Mode"], means=["Waiting_Time_for_Transport"]),
+}
+
+
+def metric_partials(df: pd.DataFrame) -> dict:
+    return {name: partial_stats(df, **spec) for name, spec in METRIC_STATS.items()}
+
+
+def combine_metric_partials(partials: list) -> dict:
+    """
+    The aggregate_metrics tables from the metric_partials of several chunks or files.
+    """
+    combined = {}
+    for name, spec in METRIC_STATS.items():
+        spec = {key: value for key, value in spec.items() if key != "key_decimals"}
+        combined[name] = combine_partial_stats((p[name] for p in partials), **spec)
+    return combined
+
+
+def aggregate_metrics_chunked(data) -> dict:
+    return {
+        name: grouped_stats(data, columns=spec["keys"] + spec.get("means", []), **spec)
+        for name, spec in METRIC_STATS.items()
+    }
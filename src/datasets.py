@@ -0,0 +1,341 @@
+import hashlib
+import json
+import os
+import shutil
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from data_aggregations import load_and_clean_data, partial_stats, combine_partial_stats, metric_partials, combine_metric_partials
+from driver_analysis import (DriverStats, compute_driver_stats, check_driver_columns, driver_value_counts,
+                             merge_value_counts, driver_layout)
+from utils import dataset_version, data_files
+
+
+DEFAULT_REGISTRY = "data/datasets.json"
+DEFAULT_CACHE_DIR = ".cache/datasets"
+
+
+# === DATASET REGISTRY ===
+# Named datasets (Hajj 2024, Umrah Ramadan, ...) are listed in data/datasets.json:
+#   {"default": "<name>", "datasets": [{"name": ..., "label": ..., "path": ..., "season": ...}, ...]}
+def load_registry(registry_path: str = DEFAULT_REGISTRY) -> dict:
+    try:
+        with open(registry_path, encoding="utf-8") as f:
+            registry = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Dataset registry not found: {registry_path}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error parsing the dataset registry: {e}")
+
+    datasets = {}
+    for entry in registry.get("datasets", []):
+        if "name" not in entry or "path" not in entry:
+            raise ValueError(f"Every dataset needs a 'name' and a 'path': {entry}")
+        datasets[entry["name"]] = {"label": entry["name"], **entry}
+
+    if not datasets:
+        raise ValueError(f"No datasets listed in {registry_path}")
+
+    default = registry.get("default", next(iter(datasets)))
+    if default not in datasets:
+        raise ValueError(f"Default dataset '{default}' is not in the registry")
+
+    return {"default": default, "datasets": datasets}
+
+
+def get_dataset_entry(name: str, registry_path: str = DEFAULT_REGISTRY) -> dict:
+    datasets = load_registry(registry_path)["datasets"]
+    if name not in datasets:
+        raise KeyError(f"Unknown dataset: {name}")
+    return datasets[name]
+
+
+# === PRECOMPUTED AGGREGATES ===
+# These are built once per dataset version and stored next to the cleaned data,
+# so comparisons between seasons never have to rescan the raw rows.
+# Every file of a dataset keeps its own sums and counts (see part_aggregates), and the dataset's
+# aggregates are those added up, so a new export only costs the aggregates of the new file.
+SUMMARY_MEANS = {
+    "Movement_Speed": "Avg_Movement_Speed",
+    "Stress_Score": "Avg_Stress_Score",
+    "Fatigue_Score": "Avg_Fatigue_Score",
+    "Waiting_Time_for_Transport": "Avg_Transport_Wait",
+    "Satisfaction_Rating": "Avg_Satisfaction",
+    "Perceived_Safety_Rating": "Avg_Perceived_Safety",
+}
+SUMMARY_LEVELS = {"summary": "_all", "daily_summary": "Date", "hourly_profile": "Hour", "zone_summary": "Zone"}
+
+
+def summary_stats(key: str) -> dict:
+    return dict(keys=[key], means=list(SUMMARY_MEANS), sums=["Is_Emergency"], size_name="Records")
+
+
+def summary_columns(stats: pd.DataFrame) -> pd.DataFrame:
+    summary = stats.rename(columns={**SUMMARY_MEANS, "Is_Emergency": "Emergency_Events"})
+    summary["Emergency_Rate"] = summary["Emergency_Events"] / summary["Records"]
+    return summary
+
+
+def part_aggregates(df: pd.DataFrame) -> dict:
+    """
+    The additive pieces of the aggregates for one file: sums and counts per group, the date
+    range and the driver value counts (for the bin edges and levels of the driver analysis).
+    """
+    data = df.assign(Is_Emergency=(df["Emergency_Event"] == "Yes").astype(int), _all=0)
+    partials = metric_partials(df)
+    for level, key in SUMMARY_LEVELS.items():
+        partials[level] = partial_stats(data, **summary_stats(key))
+    return {
+        "partials": partials,
+        "date_range": (df["Date"].min(), df["Date"].max()),
+        "driver_counts": driver_value_counts(df),
+    }
+
+
+def combine_part_aggregates(parts: list, driver_stats: list) -> dict:
+    """
+    Adds up the part_aggregates of every file, and merges their DriverStats (which must share a layout).
+    """
+    aggregates = combine_metric_partials([p["partials"] for p in parts])
+    for level, key in SUMMARY_LEVELS.items():
+        stats = combine_partial_stats([p["partials"][level] for p in parts], **summary_stats(key))
+        aggregates[level] = summary_columns(stats.drop(columns="_all") if key == "_all" else stats)
+    starts, ends = zip(*(p["date_range"] for p in parts))
+    aggregates["date_range"] = (min(starts), max(ends))
+
+    merged = driver_stats[0]
+    for stats in driver_stats[1:]:
+        merged = merged.merge(stats)
+    aggregates["driver_stats"] = merged
+    return aggregates
+
+
+def build_dataset_aggregates(df: pd.DataFrame) -> dict:
+    check_driver_columns(df)
+    part = part_aggregates(df)
+    layout = driver_layout(part["driver_counts"])
+    return combine_part_aggregates([part], [DriverStats.with_layout(*layout).update(df)])
+
+
+# === VERSIONED CACHE PER DATASET ===
+# .cache/datasets/<name>/<version>/cleaned.pkl + aggregates.pkl
+# The version comes from the CSV's size and modification time (plus utils.CACHE_FORMAT), so editing the file
+# or upgrading the cleaning code rebuilds the cache.
+# A dataset path can also be a folder of CSV exports; each file is cleaned once and kept in
+# .cache/datasets/<name>/parts/, so when a new export lands only that file is read and validated.
+PARTS_DIR = "parts"
+
+
+def dataset_cache_dir(name: str, version: str, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, name, version)
+
+
+def part_row_offset(csv_path: str, dataset_path: str) -> int:
+    """
+    Where this file's rows start in the simulated-zone draws. A single-file dataset starts at 0;
+    in a folder every file gets its own range from its name, so adding or editing one export
+    does not change the zones of the others.
+    """
+    if not os.path.isdir(dataset_path):
+        return 0
+    # 31 bits of the name's checksum times 2**31 rows per file still fits in an int64 row number
+    return (zlib.crc32(os.path.basename(csv_path).encode("utf-8")) & 0x7FFFFFFF) << 31
+
+
+def part_cache_stem(name: str, csv_path: str, row_offset: int, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    return os.path.join(cache_dir, name, PARTS_DIR, f"{dataset_version(csv_path)}_{row_offset:x}")
+
+
+def write_pickle(obj, path: str) -> None:
+    # write to a temp file and rename, so a half-written pickle is never read
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pd.to_pickle(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_dataset_part(name: str, csv_path: str, row_offset: int, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    The cleaned rows of one file of a dataset, from the parts cache when the file has not changed.
+    """
+    part_path = part_cache_stem(name, csv_path, row_offset, cache_dir) + ".pkl"
+    if os.path.exists(part_path):
+        return pd.read_pickle(part_path)
+
+    df = load_and_clean_data(csv_path, row_offset=row_offset)
+    write_pickle(df, part_path)
+    return df
+
+
+def load_part_aggregates(stem: str, part: pd.DataFrame) -> dict:
+    path = f"{stem}.aggregates.pkl"
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    check_driver_columns(part)
+    aggregates = part_aggregates(part)
+    write_pickle(aggregates, path)
+    return aggregates
+
+
+def driver_layout_key(layout: tuple) -> str:
+    bin_edges, levels = layout
+    text = repr(({col: [float(e) for e in edges] for col, edges in bin_edges.items()}, levels))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def load_part_driver_stats(stem: str, part: pd.DataFrame, layout: tuple) -> DriverStats:
+    """
+    The driver statistics of one file with the dataset's bin edges and levels. They are kept per
+    layout, so they are only rebuilt when a new file moves the quartile edges or adds a level.
+    """
+    path = f"{stem}.drivers_{driver_layout_key(layout)}.pkl"
+    if os.path.exists(path):
+        return pd.read_pickle(path)
+    stats = DriverStats.with_layout(*layout).update(part)
+    write_pickle(stats, path)
+    return stats
+
+
+def combine_validation_reports(reports: list) -> dict:
+    reports = [r for r in reports if r]
+    if not reports:
+        return None
+    if len(reports) == 1:
+        return reports[0]
+    combined = {key: sum(r.get(key, 0) for r in reports) for key in ("total_rows", "valid_rows", "quarantined_rows")}
+    combined["files"] = len(reports)
+    return combined
+
+
+def build_dataset_cache(name: str, registry_path: str = DEFAULT_REGISTRY, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    entry = get_dataset_entry(name, registry_path)
+    version = dataset_version(entry["path"])
+    version_dir = dataset_cache_dir(name, version, cache_dir)
+    if os.path.exists(os.path.join(version_dir, "aggregates.pkl")):
+        return version_dir
+
+    files = data_files(entry["path"])
+    if not files:
+        raise FileNotFoundError(f"No CSV files found in {entry['path']}")
+    if not os.path.isdir(entry["path"]):
+        df = load_and_clean_data(entry["path"])
+        aggregates = build_dataset_aggregates(df)
+        keep_parts = set()
+    else:
+        stems, parts, part_stats = [], [], []
+        for path in files:
+            row_offset = part_row_offset(path, entry["path"])
+            stems.append(part_cache_stem(name, path, row_offset, cache_dir))
+            parts.append(load_dataset_part(name, path, row_offset, cache_dir))
+            part_stats.append(load_part_aggregates(stems[-1], parts[-1]))
+        layout = driver_layout(merge_value_counts([p["driver_counts"] for p in part_stats]))
+        driver_stats = [load_part_driver_stats(stem, part, layout) for stem, part in zip(stems, parts)]
+        aggregates = combine_part_aggregates(part_stats, driver_stats)
+        # each file keeps its cleaned rows, its aggregates and its driver stats for the current layout
+        layout_key = driver_layout_key(layout)
+        keep_parts = {os.path.basename(stem) + suffix for stem in stems
+                      for suffix in (".pkl", ".aggregates.pkl", f".drivers_{layout_key}.pkl")}
+
+        df = pd.concat(parts, ignore_index=True)
+        df.attrs["validation_report"] = combine_validation_reports([p.attrs.get("validation_report") for p in parts])
+        # which rows came from which file, so the next version can tell the rows of new exports apart (see added_rows)
+        ends = np.cumsum([len(p) for p in parts])
+        df.attrs["parts"] = {os.path.basename(stem): (int(end - len(part)), int(end))
+                             for stem, part, end in zip(stems, parts, ends)}
+
+    # build in a temp folder and rename, so a half-built cache is never picked up
+    tmp_dir = f"{version_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    df.to_pickle(os.path.join(tmp_dir, "cleaned.pkl"))
+    pd.to_pickle(aggregates, os.path.join(tmp_dir, "aggregates.pkl"))
+    try:
+        os.replace(tmp_dir, version_dir)
+    except OSError:
+        # another process finished the same version first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    # drop the older versions of this dataset, and the parts of files that changed or are gone
+    dataset_dir = os.path.join(cache_dir, name)
+    for old_version in os.listdir(dataset_dir):
+        if old_version not in (version, PARTS_DIR) and not old_version.endswith(".tmp"):
+            shutil.rmtree(os.path.join(dataset_dir, old_version), ignore_errors=True)
+    parts_dir = os.path.join(dataset_dir, PARTS_DIR)
+    if os.path.isdir(parts_dir):
+        for part in os.listdir(parts_dir):
+            if part not in keep_parts and not part.endswith(".tmp"):
+                try:
+                    os.remove(os.path.join(parts_dir, part))
+                except OSError:
+                    pass
+
+    return version_dir
+
+
+def load_dataset(name: str, registry_path: str = DEFAULT_REGISTRY, cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    version_dir = build_dataset_cache(name, registry_path, cache_dir)
+    return pd.read_pickle(os.path.join(version_dir, "cleaned.pkl"))
+
+
+def added_rows(parts: dict, df: pd.DataFrame):
+    """
+    The rows of df from files that are not in parts (the df.attrs["parts"] of an older version of the
+    same folder dataset), so running state built from that version only needs these on top.
+    None when that does not work and everything has to be rebuilt: a file was changed or removed,
+    or either version is not a folder of exports (single CSV, shared or chunked copy).
+    """
+    current = getattr(df, "attrs", {}).get("parts")
+    if not parts or not current or not set(parts) <= set(current):
+        return None
+    ranges = [np.arange(start, end) for stem, (start, end) in current.items() if stem not in parts]
+    return df.iloc[np.concatenate(ranges)] if ranges else df.iloc[:0]
+
+
+def load_dataset_aggregates(name: str, registry_path: str = DEFAULT_REGISTRY, cache_dir: str = DEFAULT_CACHE_DIR) -> dict:
+    version_dir = build_dataset_cache(name, registry_path, cache_dir)
+    return pd.read_pickle(os.path.join(version_dir, "aggregates.pkl"))
+
+
+def load_driver_stats(name: str, registry_path: str = DEFAULT_REGISTRY, cache_dir: str = DEFAULT_CACHE_DIR):
+    aggregates = load_dataset_aggregates(name, registry_path, cache_dir)
+    if "driver_stats" in aggregates:
+        return aggregates["driver_stats"]
+    # caches built before the driver analysis existed do not have it yet
+    return compute_driver_stats(load_dataset(name, registry_path, cache_dir))
+
+
+# === DATE RANGE FILTER ===
+def filter_date_range(df: pd.DataFrame, start=None, end=None) -> pd.DataFrame:
+    """
+    Keeps the rows between start and end (both inclusive, compared by calendar day).
+    """
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["Date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["Date"] <= pd.Timestamp(end)
+    return df[mask]
+
+
+# === COMPARE SEASONS ===
+# This function only reads the stored aggregates of each dataset.
+def compare_datasets(names: list, level: str = "summary", registry_path: str = DEFAULT_REGISTRY,
+                     cache_dir: str = DEFAULT_CACHE_DIR) -> pd.DataFrame:
+    """
+    level is one of "summary", "hourly_profile", "zone_summary" or "daily_summary".
+    Returns the chosen aggregate for every dataset, stacked with a Dataset column.
+    """
+    if level not in {"summary", "hourly_profile", "zone_summary", "daily_summary"}:
+        raise ValueError(f"Unknown comparison level: {level}")
+
+    datasets = load_registry(registry_path)["datasets"]
+    frames = []
+    for name in names:
+        aggregates = load_dataset_aggregates(name, registry_path, cache_dir)
+        frames.append(aggregates[level].assign(Dataset=datasets[name]["label"]))
+
+    if not frames:
+        return pd.DataFrame()
+    combined = pd.concat(frames, ignore_index=True)
+    return combined[["Dataset"] + [c for c in combined.columns if c != "Dataset"]]
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+# === DEMOGRAPHIC CUBE SETTINGS ===
+# Every row falls into one Nationality x Age_Group x Pilgrim_Experience cell.
+# Counts and measure sums are kept per cell, so any breakdown over these columns is a sum over the cube.
+DEMOGRAPHIC_DIMENSIONS = ["Nationality", "Age_Group", "Pilgrim_Experience"]
+DEMOGRAPHIC_MEASURES = [
+    "Satisfaction_Rating",
+    "Perceived_Safety_Rating",
+    "Stress_Score",
+    "Movement_Speed",
+]
+
+
+# === DEMOGRAPHIC STORE ===
+class DemographicStore:
+    """
+    Dictionary-encoded demographic columns plus a precomputed cube of counts and sums.
+    The cube for the whole dataset is built once; a filtered cube only needs one bincount
+    over the selected rows' cell codes.
+    """
+
+    def __init__(self, df: pd.DataFrame, dimensions: list = None, measures: list = None):
+        self.dimensions = [d for d in (dimensions or DEMOGRAPHIC_DIMENSIONS) if d in df.columns]
+        self.measures = [m for m in (measures or DEMOGRAPHIC_MEASURES) if m in df.columns]
+        if not self.dimensions:
+            raise KeyError(f"Missing expected column(s): {DEMOGRAPHIC_DIMENSIONS}")
+
+        # one small integer code per row and dimension; missing values get their own "Unknown" entry
+        self.categories = {}
+        cell = np.zeros(len(df), dtype=np.int64)
+        for dim in self.dimensions:
+            codes, uniques = pd.factorize(df[dim].fillna("Unknown"), sort=True)
+            self.categories[dim] = list(uniques)
+            cell = cell * len(uniques) + codes
+        self.shape = tuple(len(self.categories[d]) for d in self.dimensions)
+        self.cell = cell
+        self.n_cells = int(np.prod(self.shape))
+
+        self.values = {}
+        self.valid = {}
+        for m in self.measures:
+            column = pd.to_numeric(df[m], errors="coerce").to_numpy(dtype=float)
+            self.valid[m] = ~np.isnan(column)
+            self.values[m] = np.where(self.valid[m], column, 0.0)
+
+        self.full_cube = self.cube()
+
+    def cube(self, rows: np.ndarray = None) -> dict:
+        """
+        Returns {"Count": counts, "<measure>_Sum": sums, "<measure>_Count": counts} shaped like the cube.
+        rows are row positions (e.g. from BitmapIndex.rows); None means every row.
+        """
+        if rows is None and hasattr(self, "full_cube"):
+            return self.full_cube
+
+        cell = self.cell if rows is None else self.cell[rows]
+        cube = {"Count": np.bincount(cell, minlength=self.n_cells).reshape(self.shape)}
+        for m in self.measures:
+            values = self.values[m] if rows is None else self.values[m][rows]
+            valid = self.valid[m] if rows is None else self.valid[m][rows]
+            cube[f"{m}_Sum"] = np.bincount(cell, weights=values, minlength=self.n_cells).reshape(self.shape)
+            cube[f"{m}_Count"] = np.bincount(cell, weights=valid, minlength=self.n_cells).reshape(self.shape)
+        return cube
+
+    def breakdown(self, by: list, rows: np.ndarray = None) -> pd.DataFrame:
+        """
+        Count and Avg_<measure> for every combination of the `by` columns that has data.
+        """
+        missing = [b for b in by if b not in self.dimensions]
+        if missing:
+            raise KeyError(f"Not a demographic dimension: {missing}")
+
+        cube = self.cube(rows)
+        other_axes = tuple(i for i, d in enumerate(self.dimensions) if d not in by)
+        # sum out the other dimensions, then put the remaining axes in the order they were asked for
+        kept = [d for d in self.dimensions if d in by]
+        order = [kept.index(b) for b in by]
+        reduced = {name: np.transpose(arr.sum(axis=other_axes), order).ravel() for name, arr in cube.items()}
+
+        index = pd.MultiIndex.from_product([self.categories[b] for b in by], names=by)
+        summary = pd.DataFrame({"Count": reduced["Count"].astype(np.int64)}, index=index)
+        for m in self.measures:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                summary[f"Avg_{m}"] = reduced[f"{m}_Sum"] / reduced[f"{m}_Count"]
+        return summary[summary["Count"] > 0].reset_index()
+
+
+def build_demographic_store(df: pd.DataFrame) -> DemographicStore:
+    return DemographicStore(df)
+
+
+def demographic_summary(df: pd.DataFrame, by: list) -> pd.DataFrame:
+    """
+    One-off breakdown of a small frame (e.g. one day in the report export).
+    """
+    return DemographicStore(df).breakdown(by)
@@ -0,0 +1,326 @@
+import numpy as np
+import pandas as pd
+
+
+# === DRIVER SETTINGS ===
+# Possible drivers of incidents and stress. Numeric columns are used as they are and also cut into
+# quartile bins (for the conditional rates); categorical columns become one 0/1 column per level.
+NUMERIC_DRIVERS = ["Temperature", "Sound_Level_dB", "Distance_Between_People_m"]
+CATEGORICAL_DRIVERS = {
+    "Crowd_Density": ["Low", "Medium", "High"],
+    "Weather_Conditions": None,       # None = levels are taken from the data
+    "AR_System_Interaction": None,
+}
+INCIDENT_TYPE_COLUMN = "Incident_Type"
+N_BINS = 4
+RIDGE = 1e-3
+
+
+DRIVER_COLUMNS = [*NUMERIC_DRIVERS, *CATEGORICAL_DRIVERS, INCIDENT_TYPE_COLUMN]
+
+
+# === DRIVER LAYOUT (BIN EDGES + LEVELS) ===
+# Everything needed to pick the bin edges and category levels, kept as counts so it can be added
+# up over chunks or files: value counts for the numeric drivers, level counts for the rest.
+def driver_value_counts(df: pd.DataFrame) -> dict:
+    counts = {}
+    for col in NUMERIC_DRIVERS:
+        counts[col] = pd.to_numeric(df[col], errors="coerce").dropna().value_counts()
+    for col in [*CATEGORICAL_DRIVERS, INCIDENT_TYPE_COLUMN]:
+        counts[col] = df[col].dropna().astype(str).value_counts()
+    return counts
+
+
+def merge_value_counts(counts: list) -> dict:
+    counts = [c for c in counts if c]
+    if not counts:
+        return {}
+    return {col: pd.concat([c[col] for c in counts]).groupby(level=0).sum() for col in counts[0]}
+
+
+def quantiles_from_counts(counts: pd.Series, qs) -> np.ndarray:
+    """
+    Same as np.quantile (linear interpolation) over the values the counts stand for.
+    """
+    counts = counts.sort_index()
+    values = counts.index.to_numpy(dtype=float)
+    ends = np.cumsum(counts.to_numpy())          # rank of the last copy of each value, plus one
+    positions = np.asarray(qs) * (ends[-1] - 1)
+    lower = np.floor(positions)
+    below = values[np.searchsorted(ends, lower, side="right")]
+    above = values[np.searchsorted(ends, np.minimum(lower + 1, ends[-1] - 1), side="right")]
+    return below + (positions - lower) * (above - below)
+
+
+def driver_layout(counts: dict) -> tuple:
+    """
+    (bin_edges, levels) for DriverStats: quartile edges for the numeric drivers, sorted levels
+    for the categorical drivers (unless fixed) and for the incident types.
+    """
+    bin_edges, levels = {}, {}
+    for col in NUMERIC_DRIVERS:
+        values = counts[col]
+        bin_edges[col] = np.unique(quantiles_from_counts(values, np.linspace(0, 1, N_BINS + 1))) if len(values) else np.array([0.0])
+    for col, fixed in CATEGORICAL_DRIVERS.items():
+        levels[col] = list(fixed) if fixed is not None else sorted(counts[col].index)
+    levels[INCIDENT_TYPE_COLUMN] = sorted(counts[INCIDENT_TYPE_COLUMN].index)
+    return bin_edges, levels
+
+
+def check_driver_columns(df: pd.DataFrame) -> None:
+    missing = {"Zone", "Hour", "Emergency_Event", "Stress_Score", *DRIVER_COLUMNS} - set(df.columns)
+    if missing:
+        raise KeyError(f"Missing expected column(s) for driver analysis: {sorted(missing)}")
+
+
+# === RUNNING STATISTICS PER ZONE AND HOUR ===
+class DriverStats:
+    """
+    For every zone and hour of day: row count, column sums and the sum of products of every
+    pair of columns. Correlations, conditional rates and regression weights for any set of
+    zones and hours come from these sums alone, and two DriverStats (e.g. two chunks) can be
+    merged by adding them up.
+    """
+
+    def __init__(self, columns: list, features: dict, targets: list, bin_edges: dict, levels: dict):
+        self.columns = columns            # every tracked column, in order
+        self.features = features          # original driver -> its tracked columns
+        self.targets = targets
+        self.bin_edges = bin_edges
+        self.levels = levels
+        self.zones = []
+        p = len(columns)
+        self.n = np.zeros((0, 24))
+        self.sums = np.zeros((0, 24, p))
+        self.products = np.zeros((0, 24, p, p))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "DriverStats":
+        """
+        Sets up the tracked columns (bin edges and category levels come from this frame) and adds its rows.
+        """
+        check_driver_columns(df)
+        return cls.with_layout(*driver_layout(driver_value_counts(df))).update(df)
+
+    @classmethod
+    def with_layout(cls, bin_edges: dict, levels: dict) -> "DriverStats":
+        """
+        Empty statistics with the given bin edges and levels; every DriverStats built with the
+        same layout can be merged.
+        """
+        columns, features = [], {}
+        for col in NUMERIC_DRIVERS:
+            edges = bin_edges[col]
+            bins = [f"{col}={lo:g}-{hi:g}" for lo, hi in zip(edges[:-1], edges[1:])]
+            features[col] = [col] + bins
+            columns += [col] + bins
+        for col in CATEGORICAL_DRIVERS:
+            features[col] = [f"{col}={level}" for level in levels[col]]
+            columns += features[col]
+
+        targets = ["Emergency_Rate", "Stress_Score"] + [f"Incident={t}" for t in levels[INCIDENT_TYPE_COLUMN]]
+        columns += targets
+        return cls(columns, features, targets, bin_edges, levels)
+
+    # --- building ---
+    def _matrix(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        One row per data row, one column per tracked column (missing numbers become 0 and are
+        left out of the bins; they do not get a weight of their own).
+        """
+        parts = []
+        for col in NUMERIC_DRIVERS:
+            values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+            edges = self.bin_edges[col]
+            parts.append(np.nan_to_num(values)[:, None])
+            n_bins = len(edges) - 1
+            if n_bins:
+                bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, n_bins - 1)
+                onehot = np.zeros((len(values), n_bins))
+                valid = ~np.isnan(values)
+                onehot[np.flatnonzero(valid), bins[valid]] = 1.0
+                parts.append(onehot)
+        for col in CATEGORICAL_DRIVERS:
+            codes = pd.Categorical(df[col].astype(str), categories=self.levels[col]).codes
+            onehot = np.zeros((len(df), len(self.levels[col])))
+            known = codes >= 0
+            onehot[np.flatnonzero(known), codes[known]] = 1.0
+            parts.append(onehot)
+
+        parts.append((df["Emergency_Event"] == "Yes").to_numpy(dtype=float)[:, None])
+        parts.append(np.nan_to_num(pd.to_numeric(df["Stress_Score"], errors="coerce").to_numpy(dtype=float))[:, None])
+        codes = pd.Categorical(df[INCIDENT_TYPE_COLUMN].astype(str), categories=self.levels[INCIDENT_TYPE_COLUMN]).codes
+        onehot = np.zeros((len(df), len(self.levels[INCIDENT_TYPE_COLUMN])))
+        onehot[np.flatnonzero(codes >= 0), codes[codes >= 0]] = 1.0
+        parts.append(onehot)
+        return np.hstack(parts)
+
+    def _add_zones(self, zones: list) -> None:
+        new = [z for z in zones if z not in self.zones]
+        if not new:
+            return
+        p = len(self.columns)
+        self.zones = self.zones + new
+        self.n = np.concatenate([self.n, np.zeros((len(new), 24))])
+        self.sums = np.concatenate([self.sums, np.zeros((len(new), 24, p))])
+        self.products = np.concatenate([self.products, np.zeros((len(new), 24, p, p))])
+
+    def update(self, df: pd.DataFrame) -> "DriverStats":
+        """
+        Adds a batch of rows (e.g. one chunk) to the running sums.
+        """
+        df = df.dropna(subset=["Zone", "Hour"])
+        if df.empty:
+            return self
+        self._add_zones(sorted(df["Zone"].astype(str).unique()))
+
+        X = self._matrix(df)
+        zone_codes = pd.Categorical(df["Zone"].astype(str), categories=self.zones).codes.astype(np.int64)
+        group = zone_codes * 24 + df["Hour"].to_numpy(dtype=np.int64)
+
+        # sort once by group, then every group is one contiguous block and one matrix product
+        order = np.argsort(group, kind="stable")
+        group, X = group[order], X[order]
+        starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+        ends = np.r_[starts[1:], len(group)]
+        for start, end in zip(starts, ends):
+            zone, hour = divmod(int(group[start]), 24)
+            block = X[start:end]
+            self.n[zone, hour] += end - start
+            self.sums[zone, hour] += block.sum(axis=0)
+            self.products[zone, hour] += block.T @ block
+        return self
+
+    def merge(self, other: "DriverStats") -> "DriverStats":
+        if other.columns != self.columns:
+            raise ValueError("Can only merge driver statistics built with the same columns")
+        self._add_zones(other.zones)
+        positions = [self.zones.index(z) for z in other.zones]
+        self.n[positions] += other.n
+        self.sums[positions] += other.sums
+        self.products[positions] += other.products
+        return self
+
+    # --- queries ---
+    def _totals(self, zones=None, hours=None) -> tuple:
+        zone_mask = np.array([not zones or z in zones for z in self.zones], dtype=bool)
+        hour_mask = np.zeros(24, dtype=bool)
+        hour_mask[list(hours) if hours else slice(None)] = True
+        n = self.n[zone_mask][:, hour_mask].sum()
+        sums = self.sums[zone_mask][:, hour_mask].sum(axis=(0, 1))
+        products = self.products[zone_mask][:, hour_mask].sum(axis=(0, 1))
+        return n, sums, products
+
+    def _covariance(self, n: float, sums: np.ndarray, products: np.ndarray) -> np.ndarray:
+        mean = sums / n
+        return products / n - np.outer(mean, mean)
+
+    def rows(self, zones=None, hours=None) -> int:
+        return int(self._totals(zones, hours)[0])
+
+    def correlation(self, zones=None, hours=None, columns: list = None) -> pd.DataFrame:
+        """
+        Pearson correlation between the tracked columns over the selected zones and hours.
+        """
+        columns = columns or self.columns
+        idx = [self.columns.index(c) for c in columns]
+        n, sums, products = self._totals(zones, hours)
+        if n < 2:
+            return pd.DataFrame(np.nan, index=columns, columns=columns)
+        cov = self._covariance(n, sums, products)[np.ix_(idx, idx)]
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def correlation_by(self, target: str, by: str = "Zone", features: list = None) -> pd.DataFrame:
+        """
+        Correlation of each driver column with the target, one row per zone or per hour.
+        """
+        features = features or [c for c in self.columns if c not in self.targets and "=" not in c]
+        groups = self.zones if by == "Zone" else list(range(24))
+        rows = []
+        for group in groups:
+            selection = dict(zones=[group]) if by == "Zone" else dict(hours=[group])
+            corr = self.correlation(columns=features + [target], **selection)
+            rows.append(corr.loc[features, target].rename(group))
+        result = pd.DataFrame(rows)
+        result.index.name = by
+        return result
+
+    def conditional_rates(self, target: str, zones=None, hours=None) -> pd.DataFrame:
+        """
+        Average of the target for every driver level (bins for numeric drivers), e.g. the
+        emergency rate when it is Rainy. Lift compares it with the overall average.
+        """
+        n, sums, products = self._totals(zones, hours)
+        t = self.columns.index(target)
+        overall = sums[t] / n if n else np.nan
+        rows = []
+        for feature, columns in self.features.items():
+            for column in columns:
+                if "=" not in column:
+                    continue
+                c = self.columns.index(column)
+                count = sums[c]
+                # the indicator is 0/1, so the product sum is the target total inside that level
+                rate = products[c, t] / count if count else np.nan
+                rows.append({
+                    "Driver": feature,
+                    "Level": column.split("=", 1)[1],
+                    "Rows": int(round(count)),
+                    "Average": rate,
+                    "Lift": rate / overall if overall else np.nan,
+                })
+        return pd.DataFrame(rows)
+
+    def importance(self, target: str, zones=None, hours=None) -> pd.DataFrame:
+        """
+        Standardised linear (ridge) regression of the target on all drivers, solved from the
+        covariance matrix. A driver's score is its share of the summed absolute weights.
+        """
+        n, sums, products = self._totals(zones, hours)
+        # numeric drivers as numbers (not their bins) and every categorical level
+        drivers = list(NUMERIC_DRIVERS) + [c for f in CATEGORICAL_DRIVERS for c in self.features[f]]
+        if n < len(drivers) + 2:
+            raise ValueError(f"Not enough rows for the driver analysis ({int(n)} rows)")
+
+        cov = self._covariance(n, sums, products)
+        x = [self.columns.index(c) for c in drivers]
+        t = self.columns.index(target)
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = cov / np.outer(std, std)
+        corr = np.nan_to_num(corr)
+        xx = corr[np.ix_(x, x)] + RIDGE * np.eye(len(x))
+        xy = corr[x, t]
+        weights = np.linalg.solve(xx, xy)
+        r_squared = float(weights @ xy)
+
+        per_column = pd.Series(np.abs(weights), index=drivers)
+        scores = {feature: per_column.reindex(columns).sum() for feature, columns in self.features.items()}
+        total = sum(scores.values()) or 1.0
+        result = pd.DataFrame({
+            "Driver": list(scores),
+            "Importance_%": [100 * s / total for s in scores.values()],
+            "Correlation": [corr[self.columns.index(f), t] if f in NUMERIC_DRIVERS else np.nan for f in scores],
+        }).sort_values("Importance_%", ascending=False).reset_index(drop=True)
+        result.attrs["r_squared"] = r_squared
+        return result
+
+
+# === COMPUTE DRIVER STATS ===
+# Works on a DataFrame or a chunked dataset (out_of_core.py). For chunks, a first pass reads only the
+# driver columns to count their values, so the bin edges and levels cover every chunk (not just the
+# first one); the second pass adds the chunks to the sums.
+def compute_driver_stats(df: pd.DataFrame) -> DriverStats:
+    if hasattr(df, "iter_chunks"):
+        counts = merge_value_counts([driver_value_counts(chunk) for chunk in df.iter_chunks(columns=DRIVER_COLUMNS)])
+        if not counts:
+            raise ValueError("The dataset has no rows for the driver analysis.")
+        stats = DriverStats.with_layout(*driver_layout(counts))
+        for chunk in df.iter_chunks():
+            check_driver_columns(chunk)
+            stats.update(chunk)
+        return stats
+    return DriverStats.from_frame(df)
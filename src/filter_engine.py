@@ -0,0 +1,157 @@
+import numpy as np
+import pandas as pd
+
+
+# === SETTINGS ===
+# Columns with up to this many distinct values get all their bitmaps built up front.
+# Wider columns (Date, big nationality lists) build a bitmap the first time a value is asked for.
+MAX_PRECOMPUTED_CATEGORIES = 64
+# Range filters (dates, hours) are answered from the sorted category codes instead of OR-ing
+# hundreds of bitmaps; the last few results are kept because the date picker repeats them a lot.
+MAX_CACHED_SELECTIONS = 256
+EXTRA_INDEXED_COLUMNS = ["Date", "Hour"]
+
+
+def popcount(bitmap: np.ndarray) -> int:
+    # np.bitwise_count only exists in numpy 2.x
+    if hasattr(np, "bitwise_count"):
+        return int(np.bitwise_count(bitmap).sum())
+    return int(np.unpackbits(bitmap).sum())
+
+
+# === BITMAP INDEX ===
+class BitmapIndex:
+    """
+    One packed bitmap (1 bit per row) per value of every categorical column.
+    A filter combination is an OR of bitmaps inside a column and an AND across columns,
+    so changing a filter never rescans the rows.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list = None, max_precomputed: int = MAX_PRECOMPUTED_CATEGORIES):
+        if columns is None:
+            columns = [c for c in df.columns if df[c].dtype == object or pd.api.types.is_string_dtype(df[c])]
+            columns += [c for c in EXTRA_INDEXED_COLUMNS if c in df.columns and c not in columns]
+
+        self.n_rows = len(df)
+        self.codes = {}
+        self.categories = {}
+        self._lookup = {}
+        self._bitmaps = {}
+        self._cache = {}
+
+        for column in columns:
+            if column not in df.columns:
+                raise KeyError(f"Missing expected column: {column}")
+            # sort=True keeps the categories in order, so range filters become code ranges
+            codes, uniques = pd.factorize(df[column], sort=True)
+            self.codes[column] = codes.astype(np.int32)
+            self.categories[column] = pd.Index(uniques)
+            # a plain dict is much faster than Index.get_indexer for a handful of values
+            self._lookup[column] = {value: code for code, value in enumerate(self.categories[column])}
+            if len(uniques) <= max_precomputed:
+                for code in range(len(uniques)):
+                    self._bitmaps[(column, code)] = np.packbits(codes == code)
+
+        self._all = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    # --- single bitmaps ---
+    def all_rows(self) -> np.ndarray:
+        return self._all.copy()
+
+    def options(self, column: str) -> list:
+        if column not in self.categories:
+            raise KeyError(f"Column is not indexed: {column}")
+        return list(self.categories[column])
+
+    def _bitmap_for_code(self, column: str, code: int) -> np.ndarray:
+        key = (column, code)
+        if key not in self._bitmaps:
+            self._bitmaps[key] = np.packbits(self.codes[column] == code)
+        return self._bitmaps[key]
+
+    def _remember(self, key, bitmap: np.ndarray) -> np.ndarray:
+        if len(self._cache) >= MAX_CACHED_SELECTIONS:
+            self._cache.clear()
+        self._cache[key] = bitmap
+        return bitmap
+
+    def any_of(self, column: str, values) -> np.ndarray:
+        """
+        Rows where column is one of values. Unknown values simply match nothing.
+        """
+        if column not in self.categories:
+            raise KeyError(f"Column is not indexed: {column}")
+        lookup = self._lookup[column]
+        codes = tuple(sorted({lookup[v] for v in values if v in lookup}))
+
+        key = ("in", column, codes)
+        if key in self._cache:
+            return self._cache[key]
+        if not codes:
+            return self._none
+
+        bitmap = self._bitmap_for_code(column, codes[0]).copy()
+        for code in codes[1:]:
+            bitmap |= self._bitmap_for_code(column, code)
+        return self._remember(key, bitmap)
+
+    def between(self, column: str, start=None, end=None) -> np.ndarray:
+        """
+        Rows where start <= column <= end (either side can be left open).
+        """
+        if column not in self.categories:
+            raise KeyError(f"Column is not indexed: {column}")
+        categories = self.categories[column]
+        if isinstance(categories, pd.DatetimeIndex):
+            # the sidebar date picker hands over datetime.date objects
+            start = None if start is None else pd.Timestamp(start)
+            end = None if end is None else pd.Timestamp(end)
+        low = 0 if start is None else int(categories.searchsorted(start, side="left"))
+        high = len(categories) if end is None else int(categories.searchsorted(end, side="right"))
+
+        key = ("between", column, low, high)
+        if key in self._cache:
+            return self._cache[key]
+        if low == 0 and high == len(categories):
+            return self._all
+
+        codes = self.codes[column]
+        # missing values have code -1, so the >= low check drops them
+        return self._remember(key, np.packbits((codes >= low) & (codes < high)))
+
+    # --- combinations ---
+    def select(self, filters: dict = None, ranges: dict = None) -> np.ndarray:
+        """
+        filters: {column: list of allowed values}. An empty list or None means "no filter".
+        ranges: {column: (start, end)} for ordered columns such as Date or Hour.
+        Returns the packed selection bitmap.
+        """
+        selection = self.all_rows()
+        for column, values in (filters or {}).items():
+            if values is None or len(values) == 0:
+                continue
+            selection &= self.any_of(column, values)
+        for column, (start, end) in (ranges or {}).items():
+            selection &= self.between(column, start, end)
+        return selection
+
+    def count(self, bitmap: np.ndarray) -> int:
+        return popcount(bitmap)
+
+    def rows(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
+
+    def apply(self, df: pd.DataFrame, bitmap: np.ndarray) -> pd.DataFrame:
+        """
+        Returns the selected rows of df (the frame the index was built from).
+        """
+        if len(df) != self.n_rows:
+            raise ValueError("The bitmap index was built for a different frame")
+        if np.array_equal(bitmap, self._all):
+            return df
+        return df.take(self.rows(bitmap))
+
+
+def build_filter_index(df: pd.DataFrame, columns: list = None) -> BitmapIndex:
+    return BitmapIndex(df, columns)
@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_aggregations import load_and_clean_data
+from utils import dataset_version
+
+
+# === FORECAST SETTINGS ===
+HORIZONS = (1, 2, 3)                      # hours ahead
+TARGETS = ["Crowd_Level", "Incidents"]    # mean crowd level (1=Low ... 3=High) and incidents per hour
+FEATURES = ["Hour", "DayOfWeek_Num", "Horizon", "Lag_Crowd_Level", "Lag_Incidents", "Incidents_24h"]
+DENSITY_LEVELS = {"Low": 1, "Medium": 2, "High": 3}
+DEFAULT_MODEL_DIR = "models/forecast"
+
+
+# === HOURLY SERIES PER ZONE ===
+# This function turns the cleaned rows into one row per zone and clock hour.
+# Incidents are the readings with an Incident_Type (not every reading).
+# Hours with no rows get 0 incidents and an unknown (NaN) crowd level.
+# Bump SERIES_FORMAT when the series changes, so models trained on the old one are not used.
+SERIES_FORMAT = 2
+
+
+def build_hourly_series(df: pd.DataFrame) -> pd.DataFrame:
+    required_columns = {"Timestamp", "Zone", "Crowd_Density", "Incident_Type"}
+    if not required_columns.issubset(df.columns):
+        raise KeyError(f"Missing one or more required columns: {required_columns}")
+
+    data = pd.DataFrame({
+        "Zone": df["Zone"],
+        "Bucket": df["Timestamp"].dt.floor("h"),
+        "Level": df["Crowd_Density"].map(DENSITY_LEVELS),
+        "Has_Incident": df["Incident_Type"].notna().astype(int),
+    }).dropna(subset=["Zone", "Bucket"])
+
+    grouped = data.groupby(["Zone", "Bucket"]).agg(
+        Crowd_Level=("Level", "mean"),
+        Incidents=("Has_Incident", "sum"),
+    )
+
+    # fill in the missing hours so lags and rolling windows line up by clock time
+    all_hours = pd.date_range(data["Bucket"].min(), data["Bucket"].max(), freq="h")
+    full_index = pd.MultiIndex.from_product([sorted(data["Zone"].unique()), all_hours], names=["Zone", "Bucket"])
+    series = grouped.reindex(full_index)
+    series["Incidents"] = series["Incidents"].fillna(0)
+    series = series.reset_index()
+
+    series["Hour"] = series["Bucket"].dt.hour
+    series["DayOfWeek_Num"] = series["Bucket"].dt.dayofweek
+    series["Incidents_24h"] = (
+        series.groupby("Zone")["Incidents"].transform(lambda s: s.rolling(24, min_periods=1).sum())
+    )
+    return series
+
+
+# === SEASONAL BASELINE ===
+# The baseline predicts the average for the same zone, weekday and hour.
+# It is stored as a small (zones x 7 x 24) array, so predicting is a plain array lookup.
+def fit_seasonal_baseline(series: pd.DataFrame, zones: list) -> dict:
+    baseline = {}
+    for target in TARGETS:
+        table = series.groupby(["Zone", "DayOfWeek_Num", "Hour"])[target].mean()
+        by_hour = series.groupby(["Zone", "Hour"])[target].mean()
+        by_zone = series.groupby("Zone")[target].mean()
+
+        cube = np.full((len(zones), 7, 24), np.nan)
+        for i, zone in enumerate(zones):
+            for (dow, hour), value in table.get(zone, pd.Series(dtype=float)).items():
+                cube[i, dow, hour] = value
+            # fall back to the zone's hourly average, then to its overall average
+            for hour, value in by_hour.get(zone, pd.Series(dtype=float)).items():
+                cube[i, :, hour] = np.where(np.isnan(cube[i, :, hour]), value, cube[i, :, hour])
+            cube[i] = np.where(np.isnan(cube[i]), by_zone.get(zone, np.nan), cube[i])
+
+        baseline[target] = cube
+    return baseline
+
+
+# === GRADIENT BOOSTING PER ZONE ===
+def make_training_frame(zone_series: pd.DataFrame) -> pd.DataFrame:
+    """
+    Builds one training row per (hour, horizon): features of the target hour plus what was
+    known at forecast time (crowd level, incidents in the last hour and last 24 hours).
+    """
+    frames = []
+    for horizon in HORIZONS:
+        frame = pd.DataFrame({
+            "Hour": zone_series["Hour"].shift(-horizon),
+            "DayOfWeek_Num": zone_series["DayOfWeek_Num"].shift(-horizon),
+            "Horizon": horizon,
+            "Lag_Crowd_Level": zone_series["Crowd_Level"],
+            "Lag_Incidents": zone_series["Incidents"],
+            "Incidents_24h": zone_series["Incidents_24h"],
+            "Crowd_Level": zone_series["Crowd_Level"].shift(-horizon),
+            "Incidents": zone_series["Incidents"].shift(-horizon),
+        })
+        frames.append(frame.dropna(subset=["Hour"]))
+    return pd.concat(frames, ignore_index=True)
+
+
+def train_zone_models(zone: str, zone_series: pd.DataFrame) -> tuple:
+    # runs inside a worker process, one call per zone
+    from sklearn.ensemble import HistGradientBoostingRegressor
+
+    training = make_training_frame(zone_series)
+    models = {}
+    for target in TARGETS:
+        rows = training.dropna(subset=[target])
+        if len(rows) < 50:
+            continue
+        model = HistGradientBoostingRegressor(max_iter=150, learning_rate=0.1, max_leaf_nodes=15, random_state=42)
+        model.fit(rows[FEATURES].to_numpy(dtype=float), rows[target].to_numpy(dtype=float))
+        models[target] = model
+    return zone, models
+
+
+# === FORECAST MODEL ===
+class ForecastModel:
+    """
+    A trained forecaster: the seasonal baseline for every zone plus (optionally) one
+    gradient boosting model per zone and target.
+    """
+
+    def __init__(self, version: str, zones: list, baseline: dict, zone_models: dict, metadata: dict):
+        self.version = version
+        self.zones = zones
+        self.baseline = baseline
+        self.zone_models = zone_models
+        self.metadata = metadata
+
+    @property
+    def data_version(self) -> str:
+        # version id of the data file the model was trained on (empty for models saved before it was recorded)
+        return self.metadata.get("data_version", "")
+
+    def is_current(self, data_version: str) -> bool:
+        """
+        True when the model was trained on this version of the data with the current hourly series.
+        """
+        return self.data_version == data_version and self.metadata.get("series_format") == SERIES_FORMAT
+
+    def predict(self, series: pd.DataFrame, at: pd.Timestamp = None, horizons=HORIZONS) -> pd.DataFrame:
+        """
+        Predicts every zone for each horizon in one batch.
+        series is the output of build_hourly_series; `at` defaults to its latest hour.
+        """
+        if at is None:
+            at = series["Bucket"].max()
+        at = pd.Timestamp(at).floor("h")
+
+        current = series[series["Bucket"] == at].set_index("Zone")
+        target_times = [at + pd.Timedelta(hours=h) for h in horizons]
+
+        # one feature row per zone and horizon
+        zone_idx = np.repeat(np.arange(len(self.zones)), len(horizons))
+        horizon_arr = np.tile(np.array(horizons), len(self.zones))
+        hours = np.tile([t.hour for t in target_times], len(self.zones))
+        dows = np.tile([t.dayofweek for t in target_times], len(self.zones))
+
+        lag = current.reindex(self.zones)
+        features = np.column_stack([
+            hours,
+            dows,
+            horizon_arr,
+            np.repeat(lag["Crowd_Level"].to_numpy(dtype=float), len(horizons)),
+            np.repeat(lag["Incidents"].fillna(0).to_numpy(dtype=float), len(horizons)),
+            np.repeat(lag["Incidents_24h"].fillna(0).to_numpy(dtype=float), len(horizons)),
+        ])
+
+        result = pd.DataFrame({
+            "Zone": np.array(self.zones)[zone_idx],
+            "Horizon_Hours": horizon_arr,
+            "Target_Time": np.tile(target_times, len(self.zones)),
+        })
+        for target in TARGETS:
+            # baseline first, then overwrite with the zone's boosted model where we have one
+            predictions = self.baseline[target][zone_idx, dows, hours]
+            for i, zone in enumerate(self.zones):
+                model = self.zone_models.get(zone, {}).get(target)
+                if model is not None:
+                    rows = zone_idx == i
+                    predictions[rows] = model.predict(features[rows])
+            if target == "Crowd_Level":
+                predictions = np.clip(predictions, 1, 3)
+            else:
+                predictions = np.maximum(predictions, 0)
+            result[f"Predicted_{target}"] = predictions
+
+        return result
+
+
+# === TRAINING ===
+def train_forecast_model(df: pd.DataFrame, use_boosting: bool = True, n_jobs: int = None, data_version: str = "") -> ForecastModel:
+    series = build_hourly_series(df)
+    zones = sorted(series["Zone"].unique())
+    baseline = fit_seasonal_baseline(series, zones)
+
+    zone_models = {}
+    if use_boosting:
+        try:
+            import sklearn  # noqa: F401  (only checking it is installed)
+        except ImportError:
+            raise ImportError("scikit-learn is required for boosted forecasts: pip install scikit-learn")
+
+        # train every zone in its own process; zones are independent so this scales with cores
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            jobs = [pool.submit(train_zone_models, zone, series[series["Zone"] == zone]) for zone in zones]
+            for job in jobs:
+                zone, models = job.result()
+                zone_models[zone] = models
+
+    version = time.strftime("%Y%m%d-%H%M%S") + (f"-{data_version}" if data_version else "")
+    metadata = {
+        "version": version,
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "data_version": data_version,
+        "series_format": SERIES_FORMAT,
+        "zones": zones,
+        "horizons": list(HORIZONS),
+        "features": FEATURES,
+        "boosted": use_boosting,
+        "series_start": str(series["Bucket"].min()),
+        "series_end": str(series["Bucket"].max()),
+    }
+    return ForecastModel(version, zones, baseline, zone_models, metadata)
+
+
+# === SAVE / LOAD VERSIONED MODELS ===
+# Each model is saved in its own folder: models/forecast/<version>/model.pkl + metadata.json
+def save_forecast_model(model: ForecastModel, model_dir: str = DEFAULT_MODEL_DIR) -> str:
+    version_dir = os.path.join(model_dir, model.version)
+    os.makedirs(version_dir, exist_ok=True)
+
+    # save plain data instead of the ForecastModel object, so the file still loads
+    # no matter which script (CLI or dashboard) imported this module
+    state = {
+        "version": model.version,
+        "zones": model.zones,
+        "baseline": model.baseline,
+        "zone_models": model.zone_models,
+        "metadata": model.metadata,
+    }
+    with open(os.path.join(version_dir, "model.pkl"), "wb") as f:
+        pickle.dump(state, f)
+    with open(os.path.join(version_dir, "metadata.json"), "w") as f:
+        json.dump(model.metadata, f, indent=2)
+
+    return version_dir
+
+
+def list_forecast_versions(model_dir: str = DEFAULT_MODEL_DIR) -> list:
+    if not os.path.isdir(model_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(model_dir)
+        if os.path.exists(os.path.join(model_dir, name, "model.pkl"))
+    )
+
+
+def load_forecast_model(model_dir: str = DEFAULT_MODEL_DIR, version: str = None) -> ForecastModel:
+    versions = list_forecast_versions(model_dir)
+    if not versions:
+        raise FileNotFoundError(f"No trained forecast models found in {model_dir}")
+    if version is None:
+        version = versions[-1]  # versions start with a timestamp, so the last one is the newest
+    elif version not in versions:
+        raise FileNotFoundError(f"Forecast model version not found: {version}")
+
+    with open(os.path.join(model_dir, version, "model.pkl"), "rb") as f:
+        state = pickle.load(f)
+    return ForecastModel(**state)
+
+
+# === CLI ===
+# Train offline, e.g.:
+#   python src/forecasting.py train data/hajj_umrah_crowd_management_dataset.csv --jobs 4
+#   python src/forecasting.py predict data/hajj_umrah_crowd_management_dataset.csv
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Train and run the crowd forecasting models.")
+    parser.add_argument("command", choices=["train", "predict"])
+    parser.add_argument("csv_path")
+    parser.add_argument("--model-dir", default=DEFAULT_MODEL_DIR)
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes for training (default: all cores)")
+    parser.add_argument("--baseline-only", action="store_true", help="skip gradient boosting")
+    parser.add_argument("--version", help="model version to use for predict (default: newest)")
+    args = parser.parse_args(argv)
+
+    df = load_and_clean_data(args.csv_path)
+
+    if args.command == "train":
+        start = time.perf_counter()
+        model = train_forecast_model(
+            df,
+            use_boosting=not args.baseline_only,
+            n_jobs=args.jobs,
+            data_version=dataset_version(args.csv_path)
+        )
+        path = save_forecast_model(model, args.model_dir)
+        print(f"Trained forecast model {model.version} in {time.perf_counter() - start:.1f}s -> {path}")
+        return 0
+
+    model = load_forecast_model(args.model_dir, args.version)
+    if not model.is_current(dataset_version(args.csv_path)):
+        print(f"Warning: model {model.version} was trained on a different version of {args.csv_path} "
+              "(or an older hourly series); "
+              "run the train command again to refresh it.")
+    series = build_hourly_series(df)
+    start = time.perf_counter()
+    forecast = model.predict(series)
+    print(forecast.to_string(index=False))
+    print(f"\nPredicted {len(model.zones)} zones in {(time.perf_counter() - start) * 1000:.1f} ms (model {model.version})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
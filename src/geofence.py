@@ -0,0 +1,443 @@
+import json
+import math
+import os
+import queue
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+
+# === GEOFENCE SETTINGS ===
+# Zone polygons and alert thresholds live in config/geofences.json (see that file for the fields).
+DEFAULT_GEOFENCE_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "geofences.json")
+GRID_CELLS = 64          # spatial index cells per side of the bounding box
+SLOTS_PER_WINDOW = 12    # the sliding window moves in steps of window / 12
+MAX_ALERTS = 500         # only the most recent alerts are kept in memory
+OUTSIDE = -1             # zone code for positions outside every geofence
+
+LEVEL_NAMES = {1: "warning", 2: "critical"}
+METRES_PER_DEGREE_LAT = 110_540
+METRES_PER_DEGREE_LON = 111_320
+
+
+# === GEOFENCE CONFIG ===
+def load_geofences(config_path: str = DEFAULT_GEOFENCE_CONFIG) -> dict:
+    """
+    Reads the geofence config. Every zone needs a name, a center and a polygon with at least 3 corners.
+    """
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Geofence config not found: {config_path}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error parsing the geofence config: {e}")
+
+    zones = config.get("zones", [])
+    if not zones:
+        raise ValueError(f"No zones listed in {config_path}")
+    for zone in zones:
+        if "name" not in zone or "center" not in zone or len(zone.get("polygon", [])) < 3:
+            raise ValueError(f"Every zone needs a 'name', a 'center' and a 'polygon' with 3+ corners: {zone.get('name')}")
+    return config
+
+
+def polygon_area_m2(polygon: np.ndarray) -> float:
+    # shoelace formula on a local flat projection (fine for areas a few km across)
+    lat, lon = polygon[:, 0], polygon[:, 1]
+    y = lat * METRES_PER_DEGREE_LAT
+    x = lon * METRES_PER_DEGREE_LON * math.cos(math.radians(lat.mean()))
+    return abs(np.dot(x, np.roll(y, 1)) - np.dot(y, np.roll(x, 1))) / 2
+
+
+def points_in_polygon(lat: np.ndarray, lon: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Ray casting, vectorised over the points (one pass per polygon edge).
+    """
+    inside = np.zeros(len(lat), dtype=bool)
+    corners_lat, corners_lon = polygon[:, 0], polygon[:, 1]
+    prev_lat, prev_lon = np.roll(corners_lat, 1), np.roll(corners_lon, 1)
+    for lat1, lon1, lat2, lon2 in zip(corners_lat, corners_lon, prev_lat, prev_lon):
+        crosses = (lat1 > lat) != (lat2 > lat)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            edge_lon = lon1 + (lat - lat1) * (lon2 - lon1) / (lat2 - lat1)
+        inside ^= crosses & (lon < edge_lon)
+    return inside
+
+
+# === SPATIAL INDEX ===
+class GeofenceIndex:
+    """
+    A uniform grid over the geofences' bounding box. Each cell lists the zones whose bounding box
+    touches it, so a position is only tested against the few polygons near it. Cells that lie
+    completely inside one zone (and touch no other) assign their positions without any test.
+    """
+
+    def __init__(self, zones: list, grid_cells: int = GRID_CELLS):
+        self.names = [zone["name"] for zone in zones]
+        self.polygons = [np.asarray(zone["polygon"], dtype=float) for zone in zones]
+        corners = np.vstack(self.polygons)
+        self.lat0, self.lon0 = corners.min(axis=0)
+        lat1, lon1 = corners.max(axis=0)
+        self.n = grid_cells
+        self.cell_lat = max((lat1 - self.lat0) / grid_cells, 1e-9)
+        self.cell_lon = max((lon1 - self.lon0) / grid_cells, 1e-9)
+
+        # candidates[cell, k] = zone number (in config order) or -1; full[cell] = zone that covers the whole cell
+        per_cell = [[] for _ in range(grid_cells * grid_cells)]
+        for z, polygon in enumerate(self.polygons):
+            (r0, c0), (r1, c1) = self._cell_of(*polygon.min(axis=0)), self._cell_of(*polygon.max(axis=0))
+            for r in range(r0, r1 + 1):
+                for c in range(c0, c1 + 1):
+                    per_cell[r * grid_cells + c].append(z)
+        width = max(1, max(len(c) for c in per_cell))
+        self.candidates = np.full((len(per_cell), width), -1, dtype=np.int64)
+        for cell, zone_list in enumerate(per_cell):
+            self.candidates[cell, :len(zone_list)] = zone_list
+
+        # a cell with a single candidate zone is fully inside it when its 4 corners are
+        # (only trusted for convex polygons, where that is always true)
+        self.full = np.full(len(per_cell), -1, dtype=np.int64)
+        single = np.flatnonzero((self.candidates[:, 0] >= 0) & (self.candidates[:, 1:] < 0).all(axis=1))
+        owner = self.candidates[single, 0]
+        rows, cols = np.divmod(single, grid_cells)
+        full = np.array([is_convex(p) for p in self.polygons], dtype=bool)[owner]
+        for dr, dc in ((0, 0), (0, 1), (1, 0), (1, 1)):
+            corner_lat = self.lat0 + (rows + dr) * self.cell_lat
+            corner_lon = self.lon0 + (cols + dc) * self.cell_lon
+            for z in np.unique(owner):
+                mine = owner == z
+                full[mine] &= points_in_polygon(corner_lat[mine], corner_lon[mine], self.polygons[z])
+        self.full[single[full]] = owner[full]
+
+    def _cell_of(self, lat, lon) -> tuple:
+        r = int(min(max((lat - self.lat0) // self.cell_lat, 0), self.n - 1))
+        c = int(min(max((lon - self.lon0) // self.cell_lon, 0), self.n - 1))
+        return r, c
+
+    def locate(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """
+        Zone number (config order) for every position, OUTSIDE when it is in no zone.
+        """
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        zone = np.full(len(lat), OUTSIDE, dtype=np.int64)
+
+        r = np.floor((lat - self.lat0) / self.cell_lat)
+        c = np.floor((lon - self.lon0) / self.cell_lon)
+        in_grid = (r >= 0) & (r < self.n) & (c >= 0) & (c < self.n)
+        cell = np.where(in_grid, r * self.n + c, 0).astype(np.int64)
+
+        full = np.where(in_grid, self.full[cell], -1)
+        zone[full >= 0] = full[full >= 0]
+
+        todo = np.flatnonzero(in_grid & (full < 0))
+        for k in range(self.candidates.shape[1]):
+            if not len(todo):
+                break
+            candidate = self.candidates[cell[todo], k]
+            for z in np.unique(candidate[candidate >= 0]):
+                rows = todo[candidate == z]
+                hit = rows[points_in_polygon(lat[rows], lon[rows], self.polygons[z])]
+                zone[hit] = z
+            # candidates are in config order, so the first zone that matches wins
+            todo = todo[zone[todo] == OUTSIDE]
+        return zone
+
+
+def is_convex(polygon: np.ndarray) -> bool:
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    cross = edges[:, 0] * np.roll(edges[:, 1], -1) - edges[:, 1] * np.roll(edges[:, 0], -1)
+    return bool((cross >= 0).all() or (cross <= 0).all())
+
+
+# === STREAMING MONITOR ===
+class GeofenceMonitor:
+    """
+    Counts positions per zone over a sliding window (a ring of SLOTS_PER_WINDOW time slots) and
+    raises occupancy alerts against each zone's capacity, plus density alerts when most recent
+    crowd-density reports in a zone say "High". Positions are added in batches with ingest();
+    each batch is located with the spatial index in one vectorised pass.
+
+    An alert is raised when a zone's level goes up (normal -> warning -> critical); it can be
+    raised again once the zone has dropped back below the warning level.
+    Alerts go to the in-memory list, to alert_queue (a queue.Queue) and to log_path (JSON lines).
+    """
+
+    def __init__(self, config: dict, max_alerts: int = MAX_ALERTS, alert_queue: queue.Queue = None,
+                 log_path: str = None):
+        zones = config["zones"]
+        self.index = GeofenceIndex(zones)
+        self.names = self.index.names
+        self.capacity = np.array([float(zone.get("capacity", np.inf)) for zone in zones])
+        self.area_m2 = np.array([polygon_area_m2(p) for p in self.index.polygons])
+        self.warning_fraction = float(config.get("warning_fraction", 0.75))
+        self.high_density_share = float(config.get("high_density_share", 0.6))
+        self.min_density_reports = int(config.get("min_density_reports", 3))
+
+        self.window_minutes = float(config.get("window_minutes", 60))
+        self.slot_ns = int(self.window_minutes * 60 * 1e9 / SLOTS_PER_WINDOW)
+        n = len(zones)
+        # ring[zone, slot] = positions; high[zone, slot] = "High" density reports; reports = any density report
+        self.ring = np.zeros((n, SLOTS_PER_WINDOW), dtype=np.int64)
+        self.high = np.zeros((n, SLOTS_PER_WINDOW), dtype=np.int64)
+        self.reports = np.zeros((n, SLOTS_PER_WINDOW), dtype=np.int64)
+        self.current_slot = None
+        self.occupancy_level = np.zeros(n, dtype=np.int64)
+        self.density_level = np.zeros(n, dtype=np.int64)
+
+        self.positions_seen = 0
+        self.outside = 0
+        self.late = 0
+        self.alerts = deque(maxlen=max_alerts)
+        self.alert_queue = alert_queue
+        self.log_path = log_path
+
+    # --- ingest ---
+    def ingest(self, lat, lon, timestamps, crowd_density=None) -> list:
+        """
+        Adds a batch of positions. timestamps are datetime64 values or int nanoseconds;
+        crowd_density (optional) holds "Low"/"Medium"/"High" per position. Returns the new alerts.
+        """
+        ts = np.asarray(timestamps)
+        if ts.dtype.kind == "M":
+            ts = ts.astype("datetime64[ns]").astype(np.int64)
+        ts = ts.astype(np.int64)
+        if not len(ts):
+            return []
+
+        zone = self.index.locate(lat, lon)
+        high = np.zeros(len(ts), dtype=bool)
+        reported = np.zeros(len(ts), dtype=bool)
+        if crowd_density is not None:
+            density = np.asarray(crowd_density, dtype=object)
+            high = density == "High"
+            reported = pd.notna(density)
+
+        self.positions_seen += len(ts)
+        self.outside += int((zone == OUTSIDE).sum())
+        inside = zone != OUTSIDE
+        zone, ts, high, reported = zone[inside], ts[inside], high[inside], reported[inside]
+        slots = ts // self.slot_ns
+
+        raised = []
+        # the window is checked at the end of every slot the batch covers, in time order
+        order = np.argsort(slots, kind="stable")
+        zone, slots, high, reported = zone[order], slots[order], high[order], reported[order]
+        bounds = np.flatnonzero(np.r_[True, slots[1:] != slots[:-1], True])
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            slot = int(slots[start])
+            if not self._advance(slot):
+                self.late += end - start
+                continue
+            col = slot % SLOTS_PER_WINDOW
+            n = len(self.names)
+            self.ring[:, col] += np.bincount(zone[start:end], minlength=n)
+            self.high[:, col] += np.bincount(zone[start:end], weights=high[start:end], minlength=n).astype(np.int64)
+            self.reports[:, col] += np.bincount(zone[start:end], weights=reported[start:end], minlength=n).astype(np.int64)
+            if slot == self.current_slot:
+                raised.extend(self._evaluate(slot))
+        self._emit(raised)
+        return raised
+
+    def can_continue(self, timestamps) -> bool:
+        """
+        True when every timestamp falls in a later slot than the window has reached, so ingesting
+        them on top gives the same state (and alerts) as replaying all the positions from scratch.
+        """
+        first = pd.Series(timestamps).min()
+        if self.current_slot is None or pd.isna(first):
+            return True
+        return pd.Timestamp(first).value // self.slot_ns > self.current_slot
+
+    def _advance(self, slot: int) -> bool:
+        """
+        Moves the window forward to `slot`, clearing the slots that fell out. False for data
+        older than the window.
+        """
+        if self.current_slot is None:
+            self.current_slot = slot
+            return True
+        if slot <= self.current_slot:
+            return slot > self.current_slot - SLOTS_PER_WINDOW
+        for s in range(self.current_slot + 1, min(slot, self.current_slot + SLOTS_PER_WINDOW) + 1):
+            col = s % SLOTS_PER_WINDOW
+            self.ring[:, col] = 0
+            self.high[:, col] = 0
+            self.reports[:, col] = 0
+        self.current_slot = slot
+        return True
+
+    # --- alerts ---
+    def _evaluate(self, slot: int) -> list:
+        occupancy = self.ring.sum(axis=1)
+        level = np.where(occupancy >= self.capacity, 2, np.where(occupancy >= self.warning_fraction * self.capacity, 1, 0))
+
+        reports = self.reports.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(reports > 0, self.high.sum(axis=1) / reports, 0.0)
+        dense = (reports >= self.min_density_reports) & (share >= self.high_density_share)
+        density_level = np.where(dense, 2, 0)
+
+        raised = []
+        time = pd.Timestamp((slot + 1) * self.slot_ns)
+        for z in np.flatnonzero(level > self.occupancy_level):
+            raised.append(self._alert(z, time, "Occupancy", int(level[z]), occupancy[z], self.capacity[z]))
+        for z in np.flatnonzero(density_level > self.density_level):
+            raised.append(self._alert(z, time, "High density", int(density_level[z]), share[z], self.high_density_share))
+        # levels can only rise one alert at a time; dropping back re-arms the alert
+        self.occupancy_level = level
+        self.density_level = density_level
+        return raised
+
+    def _alert(self, z: int, time, kind: str, level: int, value: float, threshold: float) -> dict:
+        return {
+            "Time": time,
+            "Zone": self.names[z],
+            "Alert": f"{kind} {LEVEL_NAMES[level]}",
+            "Level": LEVEL_NAMES[level],
+            "Value": float(value),
+            "Threshold": float(threshold),
+        }
+
+    def _emit(self, raised: list) -> None:
+        if not raised:
+            return
+        self.alerts.extend(raised)
+        if self.alert_queue is not None:
+            for alert in raised:
+                try:
+                    self.alert_queue.put_nowait(alert)
+                except queue.Full:
+                    break
+        if self.log_path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                for alert in raised:
+                    f.write(json.dumps({**alert, "Time": alert["Time"].isoformat()}) + "\n")
+
+    # --- state ---
+    def alert_table(self) -> pd.DataFrame:
+        columns = ["Time", "Zone", "Alert", "Level", "Value", "Threshold"]
+        return pd.DataFrame(list(self.alerts), columns=columns)
+
+    def status(self) -> pd.DataFrame:
+        """
+        Current occupancy of every zone over the window.
+        """
+        occupancy = self.ring.sum(axis=1)
+        reports = self.reports.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(reports > 0, self.high.sum(axis=1) / reports, np.nan)
+        return pd.DataFrame({
+            "Zone": self.names,
+            "Occupancy": occupancy,
+            "Capacity": self.capacity,
+            "Capacity_%": 100 * occupancy / self.capacity,
+            "High_Density_Share": share,
+            "Area_m2": self.area_m2.round(),
+            "Level": [LEVEL_NAMES.get(int(l), "normal") for l in np.maximum(self.occupancy_level, self.density_level)],
+        })
+
+
+# === REPLAY A FRAME ===
+# Replays a cleaned frame through the monitor in time order, one window slot per batch.
+def monitor_geofences(df: pd.DataFrame, config: dict = None, monitor: GeofenceMonitor = None,
+                      lat_col: str = "Location_Lat", lon_col: str = "Location_Long") -> GeofenceMonitor:
+    required_columns = {"Timestamp", lat_col, lon_col}
+    if not required_columns.issubset(df.columns):
+        raise KeyError(f"Missing one or more required columns: {required_columns}")
+    if monitor is None:
+        monitor = GeofenceMonitor(config or load_geofences())
+
+    events = df.dropna(subset=["Timestamp", lat_col, lon_col]).sort_values("Timestamp", kind="stable")
+    density = events["Crowd_Density"].to_numpy(dtype=object) if "Crowd_Density" in events.columns else None
+    monitor.ingest(
+        events[lat_col].to_numpy(dtype=float),
+        events[lon_col].to_numpy(dtype=float),
+        events["Timestamp"].to_numpy(),
+        density,
+    )
+    return monitor
+
+
+# === ZONE CONSISTENCY CHECK ===
+# The simulated positions are drawn inside the zone polygons, so locating them must give back the Zone
+# column every other panel uses. This lists the rows where it does not (an empty table means all agree).
+def zone_mismatches(df: pd.DataFrame, config: dict = None, lat_col: str = "Sim_Lat", lon_col: str = "Sim_Lon") -> pd.DataFrame:
+    required_columns = {"Zone", lat_col, lon_col}
+    if not required_columns.issubset(df.columns):
+        raise KeyError(f"Missing one or more required columns: {required_columns}")
+    index = GeofenceIndex((config or load_geofences())["zones"])
+    codes = index.locate(df[lat_col].to_numpy(dtype=float), df[lon_col].to_numpy(dtype=float))
+    located = np.where(codes >= 0, np.asarray(index.names, dtype=object)[codes], "Outside")
+    wrong = df["Zone"].to_numpy(dtype=object) != located
+    if not wrong.any():
+        return pd.DataFrame(columns=["Zone", "Geofence", "Rows"])
+    return (
+        pd.DataFrame({"Zone": df["Zone"].to_numpy(dtype=object)[wrong], "Geofence": located[wrong]})
+        .value_counts()
+        .rename("Rows")
+        .reset_index()
+    )
+
+
+# === CLI ===
+# Example: python src/geofence.py bench --positions 1000000 --batch 5000
+#          python src/geofence.py replay data/hajj_umrah_crowd_management_dataset.csv --log logs/geofence_alerts.jsonl
+#          python src/geofence.py check data/hajj_umrah_crowd_management_dataset.csv
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Geofence alerts over a stream of positions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bench = sub.add_parser("bench", help="feed random positions around the zones and report the throughput")
+    bench.add_argument("--positions", type=int, default=1_000_000)
+    bench.add_argument("--batch", type=int, default=5000)
+    bench.add_argument("--rate", type=float, default=5000, help="simulated positions per second of stream time")
+    replay = sub.add_parser("replay", help="replay a CSV through the monitor and print the alerts")
+    replay.add_argument("csv_path")
+    replay.add_argument("--log", default=None, help="also append the alerts to this JSON lines file")
+    check = sub.add_parser("check", help="check that the simulated positions fall in their own zone's geofence")
+    check.add_argument("csv_path")
+    parser.add_argument("--config", default=DEFAULT_GEOFENCE_CONFIG)
+    args = parser.parse_args()
+
+    config = load_geofences(args.config)
+    if args.command == "bench":
+        rng = np.random.default_rng(0)
+        centers = np.array([zone["center"] for zone in config["zones"]])
+        picks = rng.integers(0, len(centers), args.positions)
+        lat = centers[picks, 0] + rng.uniform(-0.003, 0.003, args.positions)
+        lon = centers[picks, 1] + rng.uniform(-0.003, 0.003, args.positions)
+        ts = pd.Timestamp("2024-06-14").value + (np.arange(args.positions) / args.rate * 1e9).astype(np.int64)
+        density = rng.choice(np.array(["Low", "Medium", "High"], dtype=object), args.positions)
+
+        monitor = GeofenceMonitor(config)
+        start = time.perf_counter()
+        for i in range(0, args.positions, args.batch):
+            monitor.ingest(lat[i:i + args.batch], lon[i:i + args.batch], ts[i:i + args.batch], density[i:i + args.batch])
+        seconds = time.perf_counter() - start
+        print(f"{args.positions:,} positions in {seconds:.2f}s ({args.positions / seconds:,.0f} positions/s), "
+              f"{monitor.outside:,} outside every zone, {len(monitor.alerts)} alerts kept")
+    elif args.command == "check":
+        from data_aggregations import load_and_clean_data
+
+        df = load_and_clean_data(args.csv_path)
+        mismatches = zone_mismatches(df, config)
+        if mismatches.empty:
+            print(f"All {len(df):,} simulated positions are inside their own zone's geofence")
+        else:
+            print(mismatches.to_string(index=False))
+            sys.exit(1)
+    else:
+        from data_aggregations import load_and_clean_data
+
+        monitor = GeofenceMonitor(config, log_path=args.log)
+        monitor_geofences(load_and_clean_data(args.csv_path), monitor=monitor)
+        print(monitor.alert_table().tail(20).to_string(index=False))
+        print(f"\n{len(monitor.alerts)} alerts (most recent {MAX_ALERTS} kept)")
+    sys.exit(0)
@@ -0,0 +1,187 @@
+import os
+import threading
+import time
+
+from datasets import DEFAULT_REGISTRY, DEFAULT_CACHE_DIR, load_registry, build_dataset_cache
+from utils import dataset_version
+
+
+# === HOT RELOAD SETTINGS ===
+# The watcher checks the registered data files every few seconds (file size + modification time,
+# the same thing the dataset version is built from). When watchdog is installed, file system
+# events wake it up straight away instead of waiting for the next check.
+DEFAULT_POLL_SECONDS = 2.0
+WATCHER_THREAD_NAME = "hajjsense-dataset-watcher"
+
+
+class DatasetWatcher:
+    """
+    Watches the files of every dataset in the registry and publishes a new version id for a
+    dataset once its new data is ready. on_change(name, version, previous_version) does the loading
+    (by default it builds the dataset cache, where only new or changed export files are cleaned);
+    until it returns, version(name) keeps returning the old id, so readers never see a half-built dataset.
+    """
+
+    def __init__(self, registry_path: str = DEFAULT_REGISTRY, cache_dir: str = DEFAULT_CACHE_DIR,
+                 poll_seconds: float = DEFAULT_POLL_SECONDS, on_change=None):
+        self.registry_path = registry_path
+        self.cache_dir = cache_dir
+        self.poll_seconds = poll_seconds
+        self.on_change = on_change or self.build_cache
+        self.errors = {}              # dataset name -> message from the last failed reload
+        self.mode = "polling"
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+        self._pending = {}            # name -> (changed version, when it was first seen)
+
+        self._versions = {name: self.disk_version(name) for name in self._dataset_paths()}
+        self._seen = dict(self._versions)
+
+    # --- versions ---
+    def _dataset_paths(self) -> dict:
+        try:
+            datasets = load_registry(self.registry_path)["datasets"]
+        except (FileNotFoundError, ValueError):
+            # the registry is being edited; try again on the next check
+            return {}
+        return {name: entry["path"] for name, entry in datasets.items()}
+
+    def disk_version(self, name: str, path: str = None) -> str:
+        path = path or self._dataset_paths().get(name)
+        if path is None:
+            return None
+        try:
+            return dataset_version(path)
+        except FileNotFoundError:
+            return None
+
+    def version(self, name: str) -> str:
+        """
+        The version id of the data that is ready to use (None when the dataset has no data files).
+        """
+        with self._lock:
+            return self._versions.get(name)
+
+    def build_cache(self, name: str, version: str, previous_version: str = None) -> None:
+        build_dataset_cache(name, self.registry_path, self.cache_dir)
+
+    # --- checking ---
+    def check(self) -> list:
+        """
+        One pass over the datasets. A changed dataset is only loaded once its files have looked the
+        same for a full poll interval, so an export that is still being written is not read half way.
+        Returns the names of the datasets whose new version was published.
+        """
+        published = []
+        for name, path in self._dataset_paths().items():
+            if path is None:
+                continue
+            version = self.disk_version(name, path)
+            if version is None or version == self._seen.get(name):
+                self._pending.pop(name, None)
+                continue
+            pending_version, first_seen = self._pending.get(name, (None, None))
+            if pending_version != version:
+                self._pending[name] = (version, time.monotonic())
+                continue
+            if time.monotonic() - first_seen < self.poll_seconds:
+                continue
+
+            del self._pending[name]
+            self._seen[name] = version
+            try:
+                self.on_change(name, version, self.version(name))
+            except Exception as e:
+                # a broken export should not take the dashboard down; the old data stays in use
+                self.errors[name] = f"{type(e).__name__}: {e}"
+                continue
+            with self._lock:
+                self._versions[name] = version
+            self.errors.pop(name, None)
+            published.append(name)
+        return published
+
+    # --- background thread ---
+    def start(self) -> "DatasetWatcher":
+        if self._thread is not None:
+            return self
+        self._start_observer()
+        self._thread = threading.Thread(target=self._run, name=WATCHER_THREAD_NAME, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.poll_seconds)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self.check()
+
+    def _watched_folders(self) -> set:
+        folders = set()
+        for path in self._dataset_paths().values():
+            if path:
+                folder = path if os.path.isdir(path) else os.path.dirname(os.path.abspath(path))
+                if os.path.isdir(folder):
+                    folders.add(os.path.abspath(folder))
+        return folders
+
+    def _start_observer(self) -> None:
+        # watchdog is optional; without it the watcher just polls
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return
+
+        wake = self._wake
+
+        class WakeOnChange(FileSystemEventHandler):
+            def on_any_event(self, event):
+                wake.set()
+
+        observer = Observer()
+        for folder in self._watched_folders():
+            observer.schedule(WakeOnChange(), folder, recursive=False)
+        observer.daemon = True
+        observer.start()
+        self._observer = observer
+        self.mode = "watchdog"
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild the dataset caches whenever the data files change.")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--poll", type=float, default=DEFAULT_POLL_SECONDS, help="seconds between checks")
+    args = parser.parse_args()
+
+    def report(name: str, version: str, previous_version: str = None) -> None:
+        start = time.perf_counter()
+        build_dataset_cache(name, args.registry, args.cache_dir)
+        print(f"{time.strftime('%H:%M:%S')} {name}: version {version} ready in {time.perf_counter() - start:.2f}s")
+
+    watcher = DatasetWatcher(args.registry, args.cache_dir, args.poll, on_change=report).start()
+    print(f"Watching {len(watcher._versions)} dataset(s) ({watcher.mode}); Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+            for name, message in list(watcher.errors.items()):
+                print(f"{name}: reload failed ({message})")
+                watcher.errors.pop(name)
+    except KeyboardInterrupt:
+        watcher.stop()
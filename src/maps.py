@@ -0,0 +1,194 @@
+import pandas as pd
+
+from geofence import load_geofences
+from payloads import COORDINATE_DECIMALS
+
+
+# NOTE: folium is imported inside the functions below so the map libraries only load
+# when the map panel is actually drawn, not when the dashboard starts.
+
+
+# === MAP SETTINGS ===
+MAP_CENTER = [21.4225, 39.8262]
+
+CROWD_MARKER_COLORS = {"Low": "green", "Medium": "orange", "High": "red"}
+ACTIVITY_MARKER_COLORS = {
+    "Tawaf": "blue", "Prayer": "purple", "Resting": "gray",
+    "Sa’i": "cadetblue", "Transport": "lightgreen", "Other": "black"
+}
+
+# Zone markers and outlines come from the geofence config (config/geofences.json);
+# zones without a label (like "Other") get no marker
+GEOFENCE_COLOR = "#457B9D"
+
+# Risk score (0-100) levels for coloring the zone markers
+RISK_MARKER_LEVELS = [(60, "red"), (45, "orange"), (0, "green")]
+
+HEATMAP_GRADIENT = {
+    0.2: 'blue',
+    0.4: 'lime',
+    0.6: 'yellow',
+    0.8: 'orange',
+    1.0: 'red'
+}
+
+
+def marker_color(row, color_mode: str) -> str:
+    try:
+        if color_mode == "Crowd Density":
+            return CROWD_MARKER_COLORS.get(row["Crowd_Density"], "gray")
+        else:
+            return ACTIVITY_MARKER_COLORS.get(row["Activity_Type"], "gray")
+    except KeyError:
+        return "gray"
+
+
+def risk_marker_color(score: float) -> str:
+    for threshold, color in RISK_MARKER_LEVELS:
+        if score >= threshold:
+            return color
+    return "green"
+
+
+# === INTERACTIVE INCIDENT MAP ===
+def build_incident_map(map_df: pd.DataFrame, color_mode: str = "Crowd Density", zone_risk: dict = None,
+                       anomalies: pd.DataFrame = None):
+    """
+    Builds the folium map with zone markers, an incident point layer and a heatmap layer.
+    zone_risk maps zone names to risk scores; when given, zone markers are colored by risk.
+    anomalies is the detector's alert table; when given, an "Anomaly Alerts" layer is added.
+    """
+    import folium
+    from folium.plugins import HeatMap
+
+    m = folium.Map(location=MAP_CENTER, zoom_start=13)
+    incident_layer = folium.FeatureGroup(name="Incidents")
+    heatmap_layer = folium.FeatureGroup(name="Heatmap")
+
+    geofences = load_geofences()["zones"]
+    geofence_layer = folium.FeatureGroup(name="Geofences")
+
+    # Add zone markers to the map (blue unless we have a risk score for the zone)
+    for geofence in geofences:
+        folium.Polygon(
+            locations=geofence["polygon"],
+            color=GEOFENCE_COLOR,
+            weight=2,
+            fill=True,
+            fill_opacity=0.08,
+            tooltip=f"{geofence['name']} geofence (capacity {geofence.get('capacity', 'n/a')})"
+        ).add_to(geofence_layer)
+        if not geofence.get("label"):
+            continue
+        zone, name = geofence["name"], geofence["label"]
+        lat, lon = geofence.get("marker", geofence["center"])
+        color = "blue"
+        label = name
+        if zone_risk and zone in zone_risk:
+            color = risk_marker_color(zone_risk[zone])
+            label = f"{name} | Risk {zone_risk[zone]:.0f}/100"
+
+        folium.Marker(
+            location=[lat, lon],
+            popup=label,
+            tooltip=label,
+            icon=folium.Icon(color=color, icon="star")
+        ).add_to(incident_layer)
+
+    # Incident markers: one GeoJSON layer instead of one CircleMarker per incident, so the
+    # popup/tooltip HTML is built in the browser from each point's properties instead of being
+    # written out once per marker
+    incident_layer.add_child(incident_points_layer(map_df, color_mode))
+
+    # Heatmap layer (coordinates rounded to about 1 m)
+    heat_data = map_df[["Location_Lat", "Location_Long"]].dropna().round(COORDINATE_DECIMALS).values.tolist()
+    HeatMap(
+        heat_data,
+        radius=25,
+        blur=20,
+        min_opacity=0.3,
+        gradient=HEATMAP_GRADIENT
+    ).add_to(heatmap_layer)
+
+    # Add layers
+    geofence_layer.add_to(m)
+    incident_layer.add_to(m)
+    heatmap_layer.add_to(m)
+    if anomalies is not None and not anomalies.empty:
+        anomaly_layer_for(anomalies).add_to(m)
+    folium.LayerControl(collapsed=False).add_to(m)
+
+    return m
+
+
+# === INCIDENT POINTS ===
+INCIDENT_POPUP_FIELDS = {
+    "Incident_Type": "Incident", "Activity_Type": "Activity", "Crowd_Density": "Crowd",
+    "Stress_Level": "Stress", "Fatigue_Level": "Fatigue",
+}
+
+
+def incident_points_geojson(map_df: pd.DataFrame, color_mode: str = "Crowd Density") -> dict:
+    """
+    The incidents as a GeoJSON FeatureCollection with quantized coordinates; each point carries
+    its popup fields and marker color as properties.
+    """
+    points = map_df.dropna(subset=["Location_Lat", "Location_Long"])
+    fields = {col: points[col].astype(object).where(points[col].notna(), "N/A").astype(str).tolist()
+              if col in points.columns else ["N/A"] * len(points)
+              for col in INCIDENT_POPUP_FIELDS}
+    lats = points["Location_Lat"].round(COORDINATE_DECIMALS).tolist()
+    lons = points["Location_Long"].round(COORDINATE_DECIMALS).tolist()
+    colors = [marker_color(row, color_mode) for row in points.to_dict("records")]
+
+    features = []
+    for i in range(len(points)):
+        properties = {col: values[i] for col, values in fields.items()}
+        properties["color"] = colors[i]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lons[i], lats[i]]},
+            "properties": properties,
+        })
+    return {"type": "FeatureCollection", "features": features}
+
+
+def incident_points_layer(map_df: pd.DataFrame, color_mode: str = "Crowd Density"):
+    import folium
+
+    fields = list(INCIDENT_POPUP_FIELDS)
+    return folium.GeoJson(
+        incident_points_geojson(map_df, color_mode),
+        name="Incident points",
+        marker=folium.CircleMarker(radius=10, fill=True, fill_opacity=0.6),
+        style_function=lambda feature: {"color": feature["properties"]["color"]},
+        popup=folium.GeoJsonPopup(fields=fields, aliases=[f"{a}:" for a in INCIDENT_POPUP_FIELDS.values()]),
+        tooltip=folium.GeoJsonTooltip(fields=fields[:2], aliases=["Incident:", "Activity:"]),
+    )
+
+
+# === ANOMALY ALERT LAYER ===
+# One warning marker per zone that has alerts, placed next to the zone star.
+def anomaly_layer_for(anomalies: pd.DataFrame):
+    import folium
+
+    layer = folium.FeatureGroup(name="Anomaly Alerts")
+    zone_locations = {zone["name"]: zone.get("marker", zone["center"]) for zone in load_geofences()["zones"] if zone.get("label")}
+
+    for zone, zone_alerts in anomalies.groupby("Zone"):
+        if zone not in zone_locations:
+            continue
+        lat, lon = zone_locations[zone]
+        latest = zone_alerts.sort_values("Window_Start").tail(5)
+        lines = "<br>".join(
+            f"{row.Window_Start:%b %d %I%p}: {row.Alert} ({row.Value:.2f} vs usual {row.Expected:.2f})"
+            for row in latest.itertuples()
+        )
+        folium.Marker(
+            location=[lat + 0.0012, lon + 0.0012],
+            popup=folium.Popup(f"<b>{zone}: {len(zone_alerts)} alert(s)</b><br>{lines}", max_width=350),
+            tooltip=f"{zone}: {len(zone_alerts)} anomaly alert(s)",
+            icon=folium.Icon(color="darkred", icon="exclamation-sign")
+        ).add_to(layer)
+
+    return layer
@@ -0,0 +1,370 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+from data_aggregations import load_and_clean_data, prepare_frame, add_derived_columns
+from datasets import part_row_offset
+from utils import dataset_version, data_files
+from validation import validate_frame, write_validation_outputs
+
+
+# === MEMORY BUDGET ===
+# Set HAJJSENSE_MEMORY_BUDGET_MB (e.g. 1500 on a 2 GB kiosk) to cap the data layer.
+# Below the budget nothing changes; above it the cleaned rows stay on disk in an Arrow file
+# and are processed one chunk at a time.
+MEMORY_BUDGET_ENV = "HAJJSENSE_MEMORY_BUDGET_MB"
+DEFAULT_STORE_DIR = ".cache/out_of_core"
+SAMPLE_ROWS = 2000
+# a chunk briefly exists as raw text, parsed frame, cleaned frame and Arrow batch at the same time
+WORKING_SET_FACTOR = 4
+MIN_CHUNK_ROWS = 5000
+MB = 1024 ** 2
+
+
+def memory_budget_mb(budget_mb: float = None) -> float:
+    if budget_mb is not None:
+        return float(budget_mb)
+    value = os.environ.get(MEMORY_BUDGET_ENV)
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{MEMORY_BUDGET_ENV} must be a number of megabytes, got {value!r}")
+
+
+def current_rss_mb() -> float:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / MB
+    except ImportError:
+        pass
+    try:
+        # Linux without psutil: the second field of statm is the resident size in pages
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# === SIZE ESTIMATE ===
+def estimate_row_bytes(csv_path: str) -> tuple:
+    """
+    Cleans a small sample to estimate (estimated rows in the file, bytes per cleaned row in memory).
+    csv_path can also be a folder of exports; the sample then comes from its first file.
+    """
+    files = data_files(csv_path)
+    if not files:
+        raise FileNotFoundError(f"No CSV files found in {csv_path}")
+    try:
+        sample = pd.read_csv(files[0], nrows=SAMPLE_ROWS)
+    except pd.errors.EmptyDataError:
+        raise ValueError("The CSV file is empty.")
+    if sample.empty:
+        return 0, 0
+
+    sample_text_bytes = len(sample.to_csv(index=False).encode("utf-8"))
+    cleaned = add_derived_columns(prepare_frame(sample).dropna(subset=["Timestamp"]))
+    row_bytes = cleaned.memory_usage(deep=True).sum() / max(len(cleaned), 1)
+    total_bytes = sum(os.path.getsize(path) for path in files)
+    estimated_rows = int(total_bytes / (sample_text_bytes / len(sample)))
+    return estimated_rows, float(row_bytes)
+
+
+def rows_within_budget(budget_mb: float, row_bytes: float, share: float = 1.0) -> int:
+    """
+    How many cleaned rows fit in `share` of the budget that is still free in this process.
+    """
+    free_mb = budget_mb - current_rss_mb()
+    if free_mb <= 0:
+        raise MemoryError(
+            f"The process already uses {current_rss_mb():.0f} MB, above the {budget_mb:.0f} MB memory budget"
+        )
+    return max(MIN_CHUNK_ROWS, int(free_mb * share * MB / (row_bytes * WORKING_SET_FACTOR)))
+
+
+def exceeds_budget(csv_path: str, budget_mb: float = None, estimate: tuple = None) -> bool:
+    """
+    estimate is the (rows, row bytes) from estimate_row_bytes, when the caller needs it too.
+    """
+    budget_mb = memory_budget_mb(budget_mb)
+    if budget_mb is None:
+        return False
+    estimated_rows, row_bytes = estimate or estimate_row_bytes(csv_path)
+    needed_mb = estimated_rows * row_bytes * WORKING_SET_FACTOR / MB
+    return current_rss_mb() + needed_mb > budget_mb
+
+
+# === ON-DISK CHUNKED DATASET ===
+class ChunkedDataset:
+    """
+    The cleaned rows in an uncompressed Arrow IPC file, one record batch per chunk.
+    Chunks are read one at a time with plain file reads rather than a memory map: mapped pages
+    count towards the process RSS until the kernel drops them, plain reads go through the page cache.
+    """
+
+    def __init__(self, path: str):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for the out-of-core mode: pip install pyarrow")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Chunked data file not found: {path}")
+
+        self.path = path
+        self._pa = pa
+        with pa.OSFile(path) as source:
+            reader = pa.ipc.open_file(source)
+            self.schema = reader.schema
+            self.num_chunks = reader.num_record_batches
+        try:
+            with open(f"{path}.json") as f:
+                metadata = json.load(f)
+        except FileNotFoundError:
+            metadata = {}
+        self.num_rows = metadata.get("rows", 0)
+        self.row_bytes = metadata.get("row_bytes", 0.0)
+        self.attrs = {"validation_report": metadata.get("validation_report")}
+        self.columns = pd.Index(self.schema.names)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def iter_chunks(self, columns: list = None):
+        """
+        Yields one pandas frame per chunk, with only the requested columns.
+        """
+        pa = self._pa
+        with pa.OSFile(self.path) as source:
+            reader = pa.ipc.open_file(source)
+            for i in range(reader.num_record_batches):
+                batch = reader.get_batch(i)
+                if columns is not None:
+                    batch = batch.select(columns)
+                frame = batch.to_pandas()
+                del batch
+                yield frame
+
+    def load_latest_days(self, max_rows: int, columns: list = None) -> pd.DataFrame:
+        """
+        Loads the most recent whole days whose rows fit in max_rows (at least one day).
+        Only the Date column is scanned to pick the days.
+        """
+        day_counts = pd.Series(dtype="int64")
+        for chunk in self.iter_chunks(columns=["Date"]):
+            day_counts = day_counts.add(chunk["Date"].value_counts(), fill_value=0)
+        day_counts = day_counts.sort_index(ascending=False)
+        if day_counts.empty:
+            return pd.DataFrame(columns=columns or list(self.columns))
+
+        keep = day_counts.index[(day_counts.cumsum() <= max_rows).to_numpy()]
+        if keep.empty:
+            keep = day_counts.index[:1]
+
+        frames = [chunk[chunk["Date"].isin(keep)] for chunk in self.iter_chunks(columns=columns)]
+        return pd.concat(frames, ignore_index=True).sort_values("Timestamp", kind="stable").reset_index(drop=True)
+
+
+# === BUILD THE CHUNKED STORE ===
+def write_chunked_store(csv_path: str, store_path: str, chunk_rows: int, validate: bool = True,
+                        quarantine_dir: str = None) -> str:
+    """
+    Reads the CSV chunk by chunk, cleans each chunk and appends it to an Arrow IPC file.
+    csv_path can be a folder of exports; its files are read one after the other, each with the
+    row offset it gets in the dataset cache (datasets.part_row_offset), so the zones match a full load.
+    Validation runs per chunk; the quarantined rows and report are written once at the end.
+    """
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for the out-of-core mode: pip install pyarrow")
+
+    os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+    tmp_path = f"{store_path}.{os.getpid()}.tmp"
+    writer, schema = None, None
+    rows, row_bytes = 0, 0.0
+    quarantined, reports = [], []
+
+    try:
+        for chunk, row_offset in read_chunks(csv_path, chunk_rows):
+            chunk = prepare_frame(chunk)
+            if validate:
+                chunk, quarantine_df, report = validate_frame(chunk)
+                reports.append(report)
+                if len(quarantine_df):
+                    quarantined.append(quarantine_df)
+            else:
+                chunk = chunk.dropna(subset=["Timestamp"])
+            # the chunk keeps the CSV row numbers as its index, so the simulated zones match a full load
+            chunk = add_derived_columns(chunk, row_ids=chunk.index.to_numpy() + row_offset)
+            row_bytes = max(row_bytes, chunk.memory_usage(deep=True).sum() / max(len(chunk), 1))
+
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                writer = pa.ipc.new_file(tmp_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            rows += len(chunk)
+            del chunk
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {csv_path}")
+    except pd.errors.EmptyDataError:
+        raise ValueError("The CSV file is empty.")
+    except pd.errors.ParserError:
+        raise ValueError("Error parsing the CSV file.")
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        raise ValueError("The CSV file has no rows.")
+
+    report = None
+    if validate:
+        report = merge_validation_reports(reports)
+        quarantine_df = pd.concat(quarantined, ignore_index=True) if quarantined else pd.DataFrame()
+        report = write_validation_outputs(csv_path, quarantine_df, report, quarantine_dir)
+
+    # the row count and report go into a small JSON file next to the data
+    metadata = {"rows": rows, "row_bytes": row_bytes, "validation_report": report}
+    with open(f"{store_path}.json", "w") as f:
+        json.dump(metadata, f, indent=2, default=str)
+    os.replace(tmp_path, store_path)
+    return store_path
+
+
+def read_chunks(csv_path: str, chunk_rows: int):
+    """
+    Yields (raw chunk, row offset of its file) for a CSV or every CSV in a folder.
+    """
+    files = data_files(csv_path)
+    if not files:
+        raise FileNotFoundError(f"No CSV files found in {csv_path}")
+    for path in files:
+        row_offset = part_row_offset(path, csv_path)
+        try:
+            for chunk in pd.read_csv(path, chunksize=chunk_rows):
+                yield chunk, row_offset
+        except pd.errors.EmptyDataError:
+            if len(files) == 1:
+                raise
+            # an export that is still empty adds no rows
+
+
+def merge_validation_reports(reports: list) -> dict:
+    merged = {"total_rows": 0, "valid_rows": 0, "quarantined_rows": 0, "failed_checks": {}, "checks_run": 0,
+              "seconds": 0.0}
+    for report in reports:
+        for key in ("total_rows", "valid_rows", "quarantined_rows"):
+            merged[key] += report[key]
+        for name, count in report["failed_checks"].items():
+            merged["failed_checks"][name] = merged["failed_checks"].get(name, 0) + count
+        merged["checks_run"] = max(merged["checks_run"], report["checks_run"])
+        merged["seconds"] = round(merged["seconds"] + report["seconds"], 4)
+    return merged
+
+
+def store_stem(csv_path: str) -> str:
+    # the file name without .csv, or the folder name for a folder of exports
+    return os.path.splitext(os.path.basename(os.path.normpath(csv_path)))[0]
+
+
+def chunked_store_path(csv_path: str, store_dir: str = DEFAULT_STORE_DIR) -> str:
+    return os.path.join(store_dir, f"{store_stem(csv_path)}_{dataset_version(csv_path)}.arrow")
+
+
+# === LOAD WITHIN THE BUDGET ===
+def load_data_within_budget(csv_path: str, budget_mb: float = None, store_dir: str = DEFAULT_STORE_DIR):
+    """
+    Returns a normal DataFrame when the cleaned data fits in the budget,
+    otherwise a ChunkedDataset backed by an Arrow file on disk.
+    """
+    budget_mb = memory_budget_mb(budget_mb)
+    if budget_mb is None:
+        return load_in_memory(csv_path)
+    # the sample is cleaned once, for the budget check and for the chunk size
+    estimate = estimate_row_bytes(csv_path)
+    if not exceeds_budget(csv_path, budget_mb, estimate):
+        return load_in_memory(csv_path)
+    return load_chunked_store(csv_path, budget_mb, store_dir, row_bytes=estimate[1])
+
+
+def load_in_memory(csv_path: str) -> pd.DataFrame:
+    if not os.path.isdir(csv_path):
+        return load_and_clean_data(csv_path)
+    parts = [load_and_clean_data(path, row_offset=part_row_offset(path, csv_path)) for path in data_files(csv_path)]
+    if not parts:
+        raise FileNotFoundError(f"No CSV files found in {csv_path}")
+    return pd.concat(parts, ignore_index=True)
+
+
+def load_chunked_store(csv_path: str, budget_mb: float = None, store_dir: str = DEFAULT_STORE_DIR,
+                       row_bytes: float = None) -> ChunkedDataset:
+    """
+    The ChunkedDataset for the current version of the CSV, built on first use.
+    For callers that already know the CSV is over the budget (exceeds_budget is not run again);
+    row_bytes is the estimate they already have.
+    """
+    budget_mb = memory_budget_mb(budget_mb)
+    if budget_mb is None:
+        raise ValueError(f"A memory budget is needed to size the chunks: set {MEMORY_BUDGET_ENV}")
+
+    store_path = chunked_store_path(csv_path, store_dir)
+    if not os.path.exists(store_path):
+        if row_bytes is None:
+            _, row_bytes = estimate_row_bytes(csv_path)
+        # half the free budget for the chunk being cleaned, the rest is headroom for the aggregates
+        write_chunked_store(csv_path, store_path, rows_within_budget(budget_mb, row_bytes, share=0.5))
+        remove_stale_stores(csv_path, keep=store_path)
+    return ChunkedDataset(store_path)
+
+
+# === CLEAN UP OLD VERSIONS ===
+# Every change to the CSV writes a new store next to the old ones; only the current one is kept.
+def remove_stale_stores(csv_path: str, keep: str) -> None:
+    prefix = f"{store_stem(csv_path)}_"
+    folder = os.path.dirname(keep)
+
+    for name in os.listdir(folder):
+        full_path = os.path.join(folder, name)
+        # <stem>_<version>.arrow and its .json, where the version has no "_" (so "data_2025_*" is not "data_*")
+        version = name[len(prefix):].split(".", 1)[0]
+        is_store = name.endswith((".arrow", ".arrow.json")) and name.startswith(prefix) and "_" not in version
+        if is_store and full_path not in (keep, f"{keep}.json"):
+            try:
+                os.remove(full_path)
+            except OSError:
+                pass
+
+
+# === CLI ===
+# Example: HAJJSENSE_MEMORY_BUDGET_MB=500 python src/out_of_core.py data/hajj_umrah_crowd_management_dataset.csv
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    from data_aggregations import aggregate_metrics
+
+    parser = argparse.ArgumentParser(description="Build the chunked store and aggregates within a memory budget.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--budget-mb", type=float, default=None, help=f"default: ${MEMORY_BUDGET_ENV}")
+    parser.add_argument("--store-dir", default=DEFAULT_STORE_DIR)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    data = load_data_within_budget(args.csv_path, args.budget_mb, args.store_dir)
+    mode = f"out-of-core ({data.num_chunks} chunks in {data.path})" if isinstance(data, ChunkedDataset) else "in memory"
+    print(f"Loaded {len(data):,} rows {mode} in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    aggregates = aggregate_metrics(data)
+    print(f"Aggregated {len(aggregates)} tables in {time.perf_counter() - start:.1f}s")
+
+    try:
+        import resource
+        print(f"Peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    except ImportError:
+        print(f"Current RSS: {current_rss_mb():.0f} MB")
+    sys.exit(0)
@@ -0,0 +1,678 @@
+import pandas as pd
+
+
+# NOTE: plotly is imported inside each figure function instead of at the top of this file.
+# plotly.express is one of the slowest imports in the dashboard, so it only loads the first
+# time a chart is actually drawn. After that Python reuses the already imported module.
+
+
+# === SHARED CHART SETTINGS ===
+HOUR_TICK_TEXT = [
+    "12AM", "1AM", "2AM", "3AM", "4AM", "5AM", "6AM", "7AM", "8AM", "9AM", "10AM", "11AM",
+    "12PM", "1PM", "2PM", "3PM", "4PM", "5PM", "6PM", "7PM", "8PM", "9PM", "10PM", "11PM"
+]
+HOUR_LABELS = {i: f"{i%12 or 12}{'AM' if i < 12 else 'PM'}" for i in range(24)}
+
+CROWD_LEVEL_ORDER = ["Low", "Medium", "High"]
+CROWD_COLOR_MAP = {"Low": "green", "Medium": "orange", "High": "red"}
+CUSTOM_INCIDENT_ORDER = ["Security Breach", "Theft", "Unruly Behavior", "Medical Emergency", "Lost Pilgrim"]
+INCIDENT_COLOR_MAP = {
+    "Security Breach": "red",
+    "Theft": "orange",
+    "Unruly Behavior": "purple",
+    "Medical Emergency": "green",
+    "Lost Pilgrim": "blue"
+}
+EXPERIENCE_COLOR_MAP = {"First-Time": "blue", "Experienced": "green"}
+HEALTH_COLOR_MAP = {
+    "Fainting": "#E63946",      # Muted Red
+    "Heatstroke": "#F4A261",    # Soft Orange
+    "Injured": "#A44CC9",       # Calm Purple
+    "Dehydration": "#457B9D"    # Muted Blue
+}
+
+
+def hourly_xaxis() -> dict:
+    # allows for to see a range of hours
+    return dict(
+        tickmode="linear",
+        tick0=0,
+        dtick=1,
+        tickvals=list(range(0, 24)),
+        ticktext=HOUR_TICK_TEXT
+    )
+
+
+# === FATIGUE & STRESS TRENDS ===
+def fatigue_stress_data(df_day: pd.DataFrame) -> pd.DataFrame:
+    return df_day.groupby("Hour")[["Fatigue_Score", "Stress_Score"]].mean().reset_index()
+
+
+def fatigue_stress_figure(fatigue_stress_by_hour: pd.DataFrame, day: str):
+    import plotly.express as px
+
+    # Melt the DataFrame for Plotly
+    melted = fatigue_stress_by_hour.melt(id_vars="Hour", var_name="Metric", value_name="Avg Score")
+
+    fig = px.line(
+        melted,
+        x="Hour",
+        y="Avg Score",
+        color="Metric",
+        markers=True,
+        title=f"Average Fatigue and Stress Scores by Hour ({day})",
+        color_discrete_map={
+            "Fatigue_Score": "orange",
+            "Stress_Score": "red"
+        }
+    )
+    fig.update_layout(xaxis=hourly_xaxis())
+    return fig
+
+
+# === INCIDENT FREQUENCY BY DENSITY ===
+def incident_density_data(df_day: pd.DataFrame, view_mode: str, show_pct: bool) -> pd.DataFrame:
+    """
+    Counts incidents by type and crowd level (and by hour for the detailed view).
+    Adds a Percent column when show_pct is on.
+    """
+    if view_mode == "Summary View":
+        incidents = df_day.groupby(["Incident_Type", "Crowd_Density"]).size().reset_index(name="Count")
+    else:
+        incidents = df_day.groupby(["Hour", "Incident_Type", "Crowd_Density"]).size().reset_index(name="Count")
+
+    # Sort crowd levels and incident types logically
+    incidents["Crowd_Density"] = pd.Categorical(incidents["Crowd_Density"], categories=CROWD_LEVEL_ORDER, ordered=True)
+    incidents["Incident_Type"] = pd.Categorical(incidents["Incident_Type"], categories=CUSTOM_INCIDENT_ORDER, ordered=True)
+
+    # Convert to percentage if toggled
+    if show_pct:
+        if view_mode == "Summary View":
+            total_by_type = incidents.groupby("Incident_Type", observed=False)["Count"].transform("sum")
+        else:
+            total_by_type = incidents.groupby(["Hour", "Incident_Type"], observed=False)["Count"].transform("sum")
+        incidents["Percent"] = (incidents["Count"] / total_by_type) * 100
+
+    return incidents
+
+
+def incident_density_figure(incidents: pd.DataFrame, view_mode: str, day: str):
+    import plotly.express as px
+
+    y_col = "Percent" if "Percent" in incidents.columns else "Count"
+    y_title = "Percent of Incidents" if y_col == "Percent" else "Number of Incidents"
+
+    # tooltip columns depend on the view
+    hover_data_cols = ["Incident_Type", "Crowd_Density", y_col]
+    if view_mode == "Detailed View":
+        hover_data_cols.append("Hour")
+
+    fig = px.bar(
+        incidents,
+        x="Incident_Type",
+        y=y_col,
+        color="Crowd_Density",
+        animation_frame="Hour" if view_mode == "Detailed View" else None,
+        barmode="group",
+        title=f"Incident Frequency by Crowd Density ({day}) - {view_mode}",
+        color_discrete_map=CROWD_COLOR_MAP,
+        category_orders={
+            "Incident_Type": CUSTOM_INCIDENT_ORDER,
+            "Crowd_Density": CROWD_LEVEL_ORDER
+        },
+        hover_data=hover_data_cols
+    )
+    fig.update_layout(xaxis_title="Incident Type", yaxis_title=y_title)
+    return fig
+
+
+# === ANIMATED MOVEMENT SPEED HEATMAP ===
+HEATMAP_CELL_DECIMALS = 4
+
+
+def movement_heatmap_data(df_day: pd.DataFrame, use_sim: bool = True) -> pd.DataFrame:
+    lat_col = "Sim_Lat" if use_sim else "Real_Lat"
+    lon_col = "Sim_Lon" if use_sim else "Real_Lon"
+
+    if lat_col not in df_day.columns or lon_col not in df_day.columns:
+        raise KeyError(f"{lat_col} or {lon_col}")
+    if "Hour" not in df_day.columns:
+        raise KeyError("Hour")
+
+    df_day = df_day.copy()
+    df_day["Latitude"] = df_day[lat_col]
+    df_day["Longitude"] = df_day[lon_col]
+
+    # Create AM/PM time labels for sorting/animation
+    df_day = df_day.dropna(subset=["Hour", "Latitude", "Longitude", "Movement_Speed"])
+    df_day["Hour"] = df_day["Hour"].astype(int)
+
+    # Points in the same ~10 m cell and hour are merged into one. The density layer adds up the
+    # weights (z) of nearby points anyway, so summing the speeds draws the same picture with
+    # one point per cell instead of one per row.
+    df_day["Latitude"] = df_day["Latitude"].round(HEATMAP_CELL_DECIMALS)
+    df_day["Longitude"] = df_day["Longitude"].round(HEATMAP_CELL_DECIMALS)
+    df_day = (
+        df_day.groupby(["Hour", "Latitude", "Longitude"], sort=True)["Movement_Speed"]
+        .sum()
+        .reset_index()
+    )
+    df_day["Time_Label"] = df_day["Hour"].map(HOUR_LABELS)
+    return df_day
+
+
+def movement_heatmap_figure(df_day: pd.DataFrame):
+    import plotly.express as px
+
+    fig = px.density_mapbox(
+        df_day,
+        lat="Latitude",
+        lon="Longitude",
+        z="Movement_Speed",   # Color intensity by speed
+        radius=25,            # Bigger = more smoothing
+        animation_frame="Time_Label",  # Animate across hours
+        center={"lat": 21.4225, "lon": 39.8262},
+        zoom=13,
+        height=600,
+        mapbox_style="carto-positron",
+        color_continuous_scale="Turbo",
+        range_color=[0, 2],  # Adjust depending on speed range
+        title="Crowd Movement Speed Density by Hour"
+    )
+    fig.update_layout(
+        coloraxis_colorbar=dict(title="Speed (m/s)"),
+        margin=dict(l=0, r=0, t=40, b=0)
+    )
+    return fig
+
+
+# === NATIONALITY DIVERSITY ===
+def nationality_data(summary: pd.DataFrame, top_n: int = 10) -> pd.DataFrame:
+    """
+    summary is the demographic breakdown by Nationality (see demographics.py).
+    """
+    nationality_counts = (
+        summary[["Nationality", "Count"]]
+        .sort_values("Count", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+    # If too many, group smaller ones into "Other" to make it easier to read
+    if len(nationality_counts) > top_n:
+        top_nationalities = nationality_counts[:top_n]
+        other_count = nationality_counts[top_n:]["Count"].sum()
+        return pd.concat(
+            [top_nationalities, pd.DataFrame([{"Nationality": "Other", "Count": other_count}])]
+        )
+    return nationality_counts
+
+
+def nationality_figure(top_nationalities: pd.DataFrame, chart_type: str = "Pie Chart"):
+    import plotly.express as px
+
+    if chart_type == "Pie Chart":
+        return px.pie(
+            top_nationalities,
+            names="Nationality",
+            values="Count",
+            title="Nationality Distribution",
+            color_discrete_sequence=px.colors.qualitative.Safe
+        )
+
+    fig = px.bar(
+        top_nationalities,
+        x="Nationality",
+        y="Count",
+        title="Nationality Distribution",
+        text="Count",
+        color="Nationality",
+        color_discrete_sequence=px.colors.qualitative.Safe
+    )
+    fig.update_layout(
+        xaxis_title="Nationality",
+        yaxis_title="Number of Participants"
+    )
+    return fig
+
+
+# === TRANSPORT WAITING TIME ===
+def transport_wait_data(df_transport: pd.DataFrame) -> pd.DataFrame:
+    df_transport = df_transport.dropna(subset=["Transport_Mode", "Waiting_Time_for_Transport", "Zone"])
+
+    # Exclude "Walking" transport mode because it is not part of waiting
+    df_transport = df_transport[df_transport["Transport_Mode"] != "Walking"]
+
+    return df_transport.groupby(
+        ["Zone", "Transport_Mode"]
+    )["Waiting_Time_for_Transport"].mean().reset_index()
+
+
+def transport_wait_figure(transport_wait: pd.DataFrame, day: str):
+    import plotly.express as px
+
+    fig = px.bar(
+        transport_wait,
+        x="Zone",
+        y="Waiting_Time_for_Transport",
+        color="Transport_Mode",
+        barmode="group",
+        text_auto=".2s",
+        title=f"Average Waiting Time by Zone and Transport Mode ({day})",
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig.update_layout(
+        xaxis_title="Zone",
+        yaxis_title="Average Waiting Time (minutes)",
+        legend_title="Transport Mode",
+        height=600,
+        plot_bgcolor="#0e1117",  # match your dark theme
+        paper_bgcolor="#0e1117",
+        font_color="white"
+    )
+    return fig
+
+
+# === SATISFACTION VS PERCEIVED SAFETY ===
+def safety_satisfaction_data(summary: pd.DataFrame, min_threshold: int = 5) -> pd.DataFrame:
+    """
+    summary is the demographic breakdown by Nationality, which already has the average
+    ratings and the participant count. Only nationalities with at least min_threshold participants are kept.
+    """
+    safety_summary = summary.rename(columns={
+        "Avg_Satisfaction_Rating": "Satisfaction_Rating",
+        "Avg_Perceived_Safety_Rating": "Perceived_Safety_Rating",
+    })
+    safety_summary = safety_summary.dropna(subset=["Satisfaction_Rating", "Perceived_Safety_Rating"])
+    safety_summary = safety_summary[["Nationality", "Satisfaction_Rating", "Perceived_Safety_Rating", "Count"]]
+
+    return safety_summary[safety_summary["Count"] >= min_threshold]
+
+
+def safety_satisfaction_figure(safety_summary: pd.DataFrame):
+    import plotly.express as px
+
+    fig = px.scatter(
+        safety_summary,
+        x="Satisfaction_Rating",
+        y="Perceived_Safety_Rating",
+        size="Count",
+        color="Satisfaction_Rating",
+        hover_name="Nationality",
+        color_continuous_scale="Viridis",
+        title="Satisfaction vs Perceived Safety by Nationality",
+        size_max=30
+    )
+    fig.update_layout(
+        xaxis_title="Average Satisfaction Rating",
+        yaxis_title="Average Perceived Safety Rating",
+        height=600,
+        coloraxis_colorbar=dict(title="Satisfaction Score")
+    )
+    return fig
+
+
+# === INCIDENT FREQUENCY OVER TIME ===
+def incident_timeline_data(df_day: pd.DataFrame) -> pd.DataFrame:
+    # Hour is already derived once in load_and_clean_data, so no need to parse Timestamp again
+    incidents_time = df_day.dropna(subset=["Hour"]).groupby(["Hour", "Incident_Type"]).size().reset_index(name="Count")
+    incidents_time["Hour"] = incidents_time["Hour"].astype(int)
+
+    # Optional custom sort for incident types
+    incidents_time["Incident_Type"] = pd.Categorical(
+        incidents_time["Incident_Type"],
+        categories=CUSTOM_INCIDENT_ORDER,
+        ordered=True
+    )
+    return incidents_time
+
+
+def incident_timeline_figure(incidents_time: pd.DataFrame, day: str):
+    import plotly.express as px
+
+    fig = px.line(
+        incidents_time,
+        x="Hour",
+        y="Count",
+        color="Incident_Type",
+        markers=True,
+        title=f"Incident Frequency Throughout the Day ({day})",
+        color_discrete_map=INCIDENT_COLOR_MAP,
+        labels={"Count": "Number of Incidents", "Hour": "Hour of Day"}
+    )
+    fig.update_layout(
+        xaxis=hourly_xaxis(),
+        yaxis_title="Number of Incidents",
+        height=600
+    )
+    return fig
+
+
+# === STRESS / MOVEMENT SPEED BY EXPERIENCE ===
+def experience_data(summary: pd.DataFrame, value_col: str) -> pd.DataFrame:
+    """
+    summary is the demographic breakdown by Pilgrim_Experience; picks the average of value_col.
+    """
+    avg_col = f"Avg_{value_col}"
+    if avg_col not in summary.columns:
+        raise KeyError(value_col)
+    experience = summary[["Pilgrim_Experience", avg_col]].dropna()
+    return experience.rename(columns={"Pilgrim_Experience": "Experience", avg_col: value_col})
+
+
+def experience_figure(summary: pd.DataFrame, value_col: str, title: str, y_title: str):
+    import plotly.express as px
+
+    fig = px.bar(
+        summary,
+        x="Experience",
+        y=value_col,
+        color="Experience",
+        text_auto=".2f",
+        title=title,
+        color_discrete_map=EXPERIENCE_COLOR_MAP
+    )
+    fig.update_layout(
+        xaxis_title="Pilgrim Type",
+        yaxis_title=y_title,
+        height=500,
+        showlegend=False
+    )
+    return fig
+
+
+# === HEALTH CONDITION FREQUENCY ===
+def health_condition_data(df: pd.DataFrame) -> pd.DataFrame:
+    # Remove "Normal" rows because they are not incidents
+    df_health = df.dropna(subset=["Health_Condition"])
+    df_health = df_health[df_health["Health_Condition"] != "Normal"]
+
+    health_counts = df_health["Health_Condition"].value_counts().reset_index()
+    health_counts.columns = ["Health Condition", "Count"]
+    return health_counts
+
+
+def health_condition_figure(health_counts: pd.DataFrame):
+    import plotly.express as px
+
+    fig = px.bar(
+        health_counts,
+        x="Health Condition",
+        y="Count",
+        color="Health Condition",
+        text_auto=True,
+        color_discrete_map=HEALTH_COLOR_MAP,
+        title="Health Condition Incident Counts"
+    )
+    fig.update_layout(
+        xaxis_title="Health Condition",
+        yaxis_title="Number of Cases",
+        height=500,
+        showlegend=False,
+        plot_bgcolor="#0e1117",   # Dark background
+        paper_bgcolor="#0e1117",
+        font_color="white",
+        title_font_size=24
+    )
+    fig.update_traces(
+        textfont_size=14,
+        textposition="outside"
+    )
+    return fig
+
+
+# === CROWD FORECAST ===
+def forecast_figure(forecast: pd.DataFrame, value_col: str, title: str, y_title: str):
+    import plotly.express as px
+
+    forecast = forecast.copy()
+    forecast["Ahead"] = "+" + forecast["Horizon_Hours"].astype(str) + "h"
+
+    fig = px.bar(
+        forecast,
+        x="Zone",
+        y=value_col,
+        color="Ahead",
+        barmode="group",
+        text_auto=".2f",
+        title=title,
+        color_discrete_sequence=px.colors.sequential.Blues[3::2]
+    )
+    fig.update_layout(
+        xaxis_title="Zone",
+        yaxis_title=y_title,
+        legend_title="Hours Ahead",
+        height=500
+    )
+    return fig
+
+
+# === SEASON COMPARISON ===
+def season_comparison_figure(hourly: pd.DataFrame, metric: str):
+    import plotly.express as px
+
+    fig = px.line(
+        hourly,
+        x="Hour",
+        y=metric,
+        color="Dataset",
+        markers=True,
+        title=f"{metric.replace('_', ' ')} by Hour of Day",
+    )
+    fig.update_layout(xaxis=hourly_xaxis(), height=500)
+    return fig
+
+
+# === TIME WINDOW ROLLUPS ===
+def time_rollup_figure(series: pd.DataFrame, value_col: str, split_col: str = None, title: str = ""):
+    import plotly.express as px
+
+    fig = px.line(
+        series,
+        x="Window_Start",
+        y=value_col,
+        color=split_col,
+        markers=True,
+        title=title,
+    )
+    fig.update_layout(
+        xaxis_title="Window Start",
+        yaxis_title=value_col.replace("Avg_", "Average ").replace("_", " "),
+        height=500
+    )
+    return fig
+
+
+# === TRANSPORT QUEUES ===
+QUEUE_METRIC_LABELS = {
+    "Arrival_Rate_per_min": "Arrivals per Minute",
+    "Est_Queue_Length": "Estimated People in Queue",
+    "Est_Security_Queue": "Estimated People at Security",
+    "P90_Transport_Wait": "90th Percentile Transport Wait (min)",
+    "P90_Queue_Time": "90th Percentile Queue Time (min)",
+    "P90_Security_Wait": "90th Percentile Security Wait (min)",
+}
+
+
+def queue_figure(stats: pd.DataFrame, value_col: str, title: str):
+    import plotly.express as px
+
+    fig = px.line(
+        stats,
+        x="Window_Start",
+        y=value_col,
+        color="Transport_Mode",
+        markers=True,
+        title=title,
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig.update_layout(
+        xaxis_title="Window Start",
+        yaxis_title=QUEUE_METRIC_LABELS.get(value_col, value_col),
+        legend_title="Transport Mode",
+        height=500
+    )
+    return fig
+
+
+# === ZONE FLOWS ===
+def zone_flow_sankey_figure(edges: pd.DataFrame, zones: list, title: str):
+    import plotly.graph_objects as go
+
+    node_index = {zone: i for i, zone in enumerate(zones)}
+    fig = go.Figure(go.Sankey(
+        arrangement="snap",
+        node=dict(label=list(zones), pad=20, thickness=18),
+        link=dict(
+            source=edges["From"].map(node_index).tolist(),
+            target=edges["To"].map(node_index).tolist(),
+            value=edges["People"].round(2).tolist(),
+            hovertemplate="%{source.label} → %{target.label}: %{value:.1f} people<extra></extra>",
+        ),
+    ))
+    fig.update_layout(title=title, height=500)
+    return fig
+
+
+def zone_flow_animation_figure(timeline: pd.DataFrame, occupancy: pd.DataFrame, positions: dict, title: str):
+    """
+    Zones as circles sized by how many people are in them, and lines between zones that get
+    thicker with the number of people moving, one animation frame per time bucket.
+    """
+    import plotly.graph_objects as go
+
+    zones = [z for z in occupancy.columns if z in positions]
+    lat = [positions[z][0] for z in zones]
+    lon = [positions[z][1] for z in zones]
+    # a zone never loses and gains people in the same step, so each pair of zones needs one line
+    pairs = [(a, b) for i, a in enumerate(zones) for b in zones[i + 1:]]
+    max_people = max(timeline["People"].max() if not timeline.empty else 0, 1)
+    max_count = max(occupancy.to_numpy().max() if occupancy.size else 0, 1)
+
+    def frame_traces(bucket):
+        moves = timeline[timeline["Bucket_Start"] == bucket].set_index(["From", "To"])["People"]
+        traces = []
+        for a, b in pairs:
+            forward, backward = moves.get((a, b), 0.0), moves.get((b, a), 0.0)
+            people = forward or backward
+            label = f"{a} → {b}" if forward else f"{b} → {a}"
+            traces.append(go.Scatter(
+                x=[positions[a][1], positions[b][1]],
+                y=[positions[a][0], positions[b][0]],
+                mode="lines",
+                line=dict(width=1 + 14 * people / max_people if people else 0, color="rgba(230, 57, 70, 0.6)"),
+                hovertext=f"{label}: {people:.1f} people" if people else "",
+                hoverinfo="text",
+                showlegend=False,
+            ))
+        counts = occupancy.loc[bucket, zones] if bucket in occupancy.index else pd.Series(0, index=zones)
+        traces.append(go.Scatter(
+            x=lon, y=lat,
+            mode="markers+text",
+            text=zones,
+            textposition="top center",
+            marker=dict(size=(12 + 40 * counts / max_count).tolist(), color="#457B9D"),
+            hovertext=[f"{z}: {c:.0f} people" for z, c in zip(zones, counts)],
+            hoverinfo="text",
+            showlegend=False,
+        ))
+        return traces
+
+    buckets = list(occupancy.index)
+    labels = [b.strftime("%H:%M") for b in buckets]
+    frames = [go.Frame(data=frame_traces(b), name=label) for b, label in zip(buckets, labels)]
+
+    fig = go.Figure(data=frame_traces(buckets[0]) if buckets else [], frames=frames)
+    fig.update_layout(
+        title=title,
+        height=550,
+        xaxis=dict(title="Longitude", showgrid=False),
+        yaxis=dict(title="Latitude", showgrid=False, scaleanchor="x"),
+        updatemenus=[dict(
+            type="buttons",
+            showactive=False,
+            x=0, y=-0.12, xanchor="left",
+            buttons=[
+                dict(label="▶ Play", method="animate",
+                     args=[None, dict(frame=dict(duration=700, redraw=True), fromcurrent=True)]),
+                dict(label="❚❚ Pause", method="animate",
+                     args=[[None], dict(frame=dict(duration=0, redraw=False), mode="immediate")]),
+            ],
+        )],
+        sliders=[dict(
+            x=0.15, y=-0.08, len=0.85,
+            currentvalue=dict(prefix="Bucket: "),
+            steps=[dict(label=label, method="animate",
+                        args=[[label], dict(frame=dict(duration=0, redraw=True), mode="immediate")])
+                   for label in labels],
+        )],
+    )
+    return fig
+
+
+# === DRIVER ANALYSIS ===
+DRIVER_TARGET_LABELS = {
+    "Emergency_Rate": "Emergency Rate",
+    "Stress_Score": "Stress Score (1-3)",
+}
+
+
+def driver_target_label(target: str) -> str:
+    if target.startswith("Incident="):
+        return f"{target.split('=', 1)[1]} Rate"
+    return DRIVER_TARGET_LABELS.get(target, target)
+
+
+def driver_importance_figure(importance: pd.DataFrame, title: str):
+    import plotly.express as px
+
+    fig = px.bar(
+        importance.sort_values("Importance_%"),
+        x="Importance_%",
+        y="Driver",
+        orientation="h",
+        title=title,
+        color_discrete_sequence=["#457B9D"]
+    )
+    fig.update_layout(xaxis_title="Share of Importance (%)", yaxis_title="", height=400)
+    return fig
+
+
+def driver_rates_figure(rates: pd.DataFrame, target: str, title: str):
+    import plotly.express as px
+
+    fig = px.bar(
+        rates,
+        x="Level",
+        y="Average",
+        color="Driver",
+        facet_col="Driver",
+        facet_col_wrap=3,
+        title=title,
+        hover_data=["Rows", "Lift"],
+        color_discrete_sequence=px.colors.qualitative.Pastel
+    )
+    fig.update_xaxes(matches=None, title="")
+    fig.for_each_annotation(lambda a: a.update(text=a.text.split("=")[-1].replace("_", " ")))
+    fig.update_layout(yaxis_title=driver_target_label(target), showlegend=False, height=650)
+    return fig
+
+
+def correlation_figure(corr: pd.DataFrame, title: str):
+    import plotly.express as px
+
+    def label(name):
+        return driver_target_label(name).replace("_", " ") if isinstance(name, str) else name
+
+    fig = px.imshow(
+        corr.to_numpy(),
+        x=[label(c) for c in corr.columns],
+        y=[label(i) for i in corr.index],
+        color_continuous_scale="RdBu_r",
+        zmin=-1,
+        zmax=1,
+        text_auto=".2f",
+        aspect="auto",
+        title=title
+    )
+    fig.update_layout(height=450)
+    return fig
@@ -0,0 +1,121 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+
+
+# === PAYLOAD SETTINGS ===
+# Plotly sends numpy arrays to the browser as base64 typed arrays ({"dtype": "f8", "bdata": ...}),
+# so the smaller the dtype, the smaller the figure JSON. Coordinates are rounded to about 1 m.
+COORDINATE_DECIMALS = 5
+# attributes that hold plotted numbers (hover text built from customdata is left alone, so
+# the tooltips keep showing the exact values)
+AXIS_ATTRIBUTES = ("x", "y", "z", "lat", "lon", "values")
+COORDINATE_ATTRIBUTES = ("lat", "lon")
+MARKER_ATTRIBUTES = ("size", "color")
+
+
+def smallest_int_dtype(values: np.ndarray):
+    low, high = (int(values.min()), int(values.max())) if values.size else (0, 0)
+    for dtype in (np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    return None
+
+
+def compact_array(values, decimals: int = None):
+    """
+    The smallest typed array that shows the same numbers: whole numbers become the smallest int
+    type and other floats become float32 (rounded to `decimals` first when given).
+    Returns None for anything that is not a plain numeric array (text, dates, mixed lists).
+    """
+    if values is None or isinstance(values, (str, dict)):
+        return None
+    try:
+        array = np.asarray(values)
+    except (TypeError, ValueError):
+        return None
+    if array.dtype.kind in "iub":
+        dtype = smallest_int_dtype(array) if array.dtype.kind != "b" else np.uint8
+        return array.astype(dtype) if dtype is not None else None
+    if array.dtype.kind != "f" or array.ndim != 1 or array.size < 2:
+        return None
+    if decimals is not None:
+        array = np.round(array, decimals)
+    finite = np.isfinite(array)
+    if finite.all() and np.array_equal(array, np.round(array)):
+        dtype = smallest_int_dtype(array)
+        if dtype is not None:
+            return array.astype(dtype)
+    return array.astype(np.float32)
+
+
+def compact_trace(trace, coordinate_decimals: int = COORDINATE_DECIMALS) -> None:
+    for attribute in AXIS_ATTRIBUTES:
+        if attribute not in trace:
+            continue
+        decimals = coordinate_decimals if attribute in COORDINATE_ATTRIBUTES else None
+        compact = compact_array(trace[attribute], decimals)
+        if compact is not None:
+            trace[attribute] = compact
+    marker = trace["marker"] if "marker" in trace else None
+    if marker is not None:
+        for attribute in MARKER_ATTRIBUTES:
+            if attribute in marker:
+                compact = compact_array(marker[attribute])
+                if compact is not None:
+                    marker[attribute] = compact
+
+
+def compact_figure(fig, coordinate_decimals: int = COORDINATE_DECIMALS):
+    """
+    Shrinks the arrays in every trace and animation frame in place and returns the figure.
+    """
+    for trace in fig.data:
+        compact_trace(trace, coordinate_decimals)
+    for frame in fig.frames or []:
+        for trace in frame.data:
+            compact_trace(trace, coordinate_decimals)
+    return fig
+
+
+# === PAYLOAD SIZES ===
+def payload_bytes(text: str) -> tuple:
+    """
+    (plain bytes, gzip bytes) of a JSON or HTML payload.
+    """
+    raw = text.encode("utf-8")
+    return len(raw), len(gzip.compress(raw, compresslevel=6))
+
+
+def figure_payload_bytes(fig) -> tuple:
+    return payload_bytes(fig.to_json())
+
+
+def map_payload_bytes(m) -> tuple:
+    return payload_bytes(m.get_root().render())
+
+
+class PayloadReport:
+    """
+    Payload sizes per panel for the current script run, before and after compacting.
+    """
+
+    def __init__(self):
+        self.rows = []
+
+    def record(self, panel: str, kind: str, before: int, after: int, gzipped: int) -> None:
+        self.rows.append({
+            "Panel": panel,
+            "Kind": kind,
+            "Original_KB": before / 1024,
+            "Compact_KB": after / 1024,
+            "Gzip_KB": gzipped / 1024,
+        })
+
+    def table(self) -> pd.DataFrame:
+        table = pd.DataFrame(self.rows, columns=["Panel", "Kind", "Original_KB", "Compact_KB", "Gzip_KB"])
+        if not table.empty:
+            table["Saved_%"] = 100 * (1 - table["Gzip_KB"] / table["Original_KB"])
+        return table
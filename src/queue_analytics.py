@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+
+
+# === QUEUE SETTINGS ===
+WINDOW_MINUTES = 15
+KEY_COLUMNS = ["Window_Start", "Zone", "Transport_Mode"]
+
+# waits that are tracked per window (all in minutes)
+WAIT_METRICS = {
+    "Transport_Wait": "Waiting_Time_for_Transport",
+    "Queue_Time": "Queue_Time_minutes",
+    "Security_Wait": "Security_Checkpoint_Wait_Time",
+}
+
+# Percentiles come from fixed-width histograms, so they can be added up across zones and windows
+# (and updated with new batches) without keeping the raw waits. They are exact to the bin width.
+HIST_BIN_MINUTES = 2
+HIST_MAX_MINUTES = 180      # anything longer lands in the last (overflow) bin
+HIST_BINS = HIST_MAX_MINUTES // HIST_BIN_MINUTES + 1
+ROLLING_WINDOWS = 4         # 4 x 15 min = rolling hour
+
+
+def histogram_percentile(hist: np.ndarray, q: float) -> np.ndarray:
+    """
+    Percentile q (0-1) of every histogram row, reported as the upper edge of the bin it falls in.
+    """
+    hist = np.atleast_2d(hist)
+    cumulative = np.cumsum(hist, axis=1)
+    total = cumulative[:, -1]
+    target = np.ceil(q * total)
+    # first bin where the running count reaches the target
+    bins = (cumulative < target[:, None]).sum(axis=1)
+    values = np.minimum((bins + 1) * HIST_BIN_MINUTES, HIST_MAX_MINUTES).astype(float)
+    values[total == 0] = np.nan
+    return values
+
+
+# === INCREMENTAL QUEUE STATE ===
+class QueueStatsState:
+    """
+    Per 15-minute window, zone and transport mode: arrivals, wait sums/counts and wait histograms.
+    update() adds a new batch on top, so the stats always match processing all rows at once.
+    """
+
+    def __init__(self, window_minutes: int = WINDOW_MINUTES):
+        self.window_minutes = window_minutes
+        self.index = pd.MultiIndex.from_arrays([pd.DatetimeIndex([]), [], []], names=KEY_COLUMNS)
+        self.arrivals = np.zeros(0, dtype=np.int64)
+        self.sums = {name: np.zeros(0) for name in WAIT_METRICS}
+        self.counts = {name: np.zeros(0, dtype=np.int64) for name in WAIT_METRICS}
+        self.hists = {name: np.zeros((0, HIST_BINS), dtype=np.int32) for name in WAIT_METRICS}
+
+    def _aggregate_batch(self, df: pd.DataFrame) -> tuple:
+        keys = pd.DataFrame({
+            "Window_Start": df["Timestamp"].dt.floor(f"{self.window_minutes}min"),
+            "Zone": df["Zone"].to_numpy(),
+            "Transport_Mode": df["Transport_Mode"].to_numpy(),
+        })
+        grouped = keys.groupby(KEY_COLUMNS, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        index = grouped.size().index
+        n = len(index)
+
+        arrivals = np.bincount(codes, minlength=n)
+        sums, counts, hists = {}, {}, {}
+        for name, column in WAIT_METRICS.items():
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            sums[name] = np.bincount(codes[valid], weights=values[valid], minlength=n)
+            counts[name] = np.bincount(codes[valid], minlength=n)
+            # one flat bin per (key, histogram bin), so the whole histogram is one bincount
+            bins = np.clip(values[valid] // HIST_BIN_MINUTES, 0, HIST_BINS - 1).astype(np.int64)
+            hists[name] = np.bincount(codes[valid] * HIST_BINS + bins, minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+        return index, arrivals, sums, counts, hists
+
+    def update(self, df: pd.DataFrame) -> "QueueStatsState":
+        required_columns = {"Timestamp", "Zone", "Transport_Mode"} | set(WAIT_METRICS.values())
+        missing = required_columns - set(df.columns)
+        if missing:
+            raise KeyError(f"Missing expected column(s) for queue analytics: {sorted(missing)}")
+
+        df = df.dropna(subset=["Timestamp", "Zone", "Transport_Mode"])
+        if df.empty:
+            return self
+
+        index, arrivals, sums, counts, hists = self._aggregate_batch(df)
+
+        # merge the batch into the running state; only the aggregated keys are touched, never old rows
+        merged = self.index.union(index) if len(self.index) else index
+        old_pos = merged.get_indexer(self.index)
+        new_pos = merged.get_indexer(index)
+
+        def combine(old, new, dtype):
+            out = np.zeros((len(merged),) + old.shape[1:], dtype=dtype)
+            out[old_pos] += old
+            out[new_pos] += new.astype(dtype)
+            return out
+
+        self.arrivals = combine(self.arrivals, arrivals, np.int64)
+        for name in WAIT_METRICS:
+            self.sums[name] = combine(self.sums[name], sums[name], float)
+            self.counts[name] = combine(self.counts[name], counts[name], np.int64)
+            self.hists[name] = combine(self.hists[name], hists[name], np.int32)
+        self.index = merged
+        return self
+
+    # === QUERIES ===
+    def _select(self, zones=None, modes=None, start=None, end=None) -> np.ndarray:
+        mask = np.ones(len(self.index), dtype=bool)
+        if zones:
+            mask &= self.index.get_level_values("Zone").isin(zones)
+        if modes:
+            mask &= self.index.get_level_values("Transport_Mode").isin(modes)
+        windows = self.index.get_level_values("Window_Start")
+        if start is not None:
+            mask &= windows >= pd.Timestamp(start)
+        if end is not None:
+            mask &= windows < pd.Timestamp(end)
+        return np.flatnonzero(mask)
+
+    def _grouped(self, rows: np.ndarray, by: list) -> tuple:
+        """
+        Sums the selected keys into groups of `by` (a subset of KEY_COLUMNS).
+        """
+        keys = self.index[rows].to_frame(index=False)[by]
+        grouped = keys.groupby(by, sort=True)
+        codes = grouped.ngroup().to_numpy()
+        group_index = grouped.size().index
+        n = len(group_index)
+
+        # histograms use one flat bincount over (group, bin) pairs, much faster than np.add.at
+        hist_bins = (codes[:, None] * HIST_BINS + np.arange(HIST_BINS)).ravel()
+
+        def add(values):
+            if values.ndim == 1:
+                return np.bincount(codes, weights=values[rows], minlength=n)
+            return np.bincount(hist_bins, weights=values[rows].ravel(), minlength=n * HIST_BINS).reshape(n, HIST_BINS)
+
+        totals = {"Arrivals": add(self.arrivals), "Windows": np.bincount(codes, minlength=n)}
+        for name in WAIT_METRICS:
+            totals[f"{name}_Sum"] = add(self.sums[name])
+            totals[f"{name}_Count"] = add(self.counts[name])
+            totals[f"{name}_Hist"] = add(self.hists[name])
+        return group_index, totals
+
+    def _stats_frame(self, group_index, totals: dict, minutes: float) -> pd.DataFrame:
+        stats = group_index.to_frame(index=False)
+        stats["Arrivals"] = totals["Arrivals"].astype(np.int64)
+        stats["Arrival_Rate_per_min"] = totals["Arrivals"] / minutes
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for name in WAIT_METRICS:
+                stats[f"Avg_{name}"] = totals[f"{name}_Sum"] / totals[f"{name}_Count"]
+                stats[f"P50_{name}"] = histogram_percentile(totals[f"{name}_Hist"], 0.5)
+                stats[f"P90_{name}"] = histogram_percentile(totals[f"{name}_Hist"], 0.9)
+        # Little's law: people waiting = arrival rate x time spent waiting
+        stats["Est_Queue_Length"] = stats["Arrival_Rate_per_min"] * stats["Avg_Queue_Time"]
+        stats["Est_Security_Queue"] = stats["Arrival_Rate_per_min"] * stats["Avg_Security_Wait"]
+        return stats
+
+    def window_stats(self, zones=None, modes=None, start=None, end=None, by: list = None) -> pd.DataFrame:
+        """
+        One row per window (and per `by` group, default zone and mode) with arrival rates,
+        average and percentile waits, and Little's law queue length estimates.
+        """
+        by = ["Window_Start"] + list(by if by is not None else ["Zone", "Transport_Mode"])
+        rows = self._select(zones, modes, start, end)
+        if not len(rows):
+            return pd.DataFrame(columns=by)
+        group_index, totals = self._grouped(rows, by)
+        return self._stats_frame(group_index, totals, self.window_minutes)
+
+    def rolling_stats(self, windows: int = ROLLING_WINDOWS, zones=None, modes=None, start=None, end=None,
+                      by: list = None) -> pd.DataFrame:
+        """
+        Same columns as window_stats, but each row covers the last `windows` windows.
+        Empty windows count as zero arrivals, so rates are always per the same span of time.
+        """
+        by = list(by if by is not None else ["Transport_Mode"])
+        rows = self._select(zones, modes, start, end)
+        if not len(rows):
+            return pd.DataFrame(columns=["Window_Start"] + by)
+        group_index, totals = self._grouped(rows, ["Window_Start"] + by)
+
+        grid = pd.date_range(
+            group_index.get_level_values("Window_Start").min(),
+            group_index.get_level_values("Window_Start").max(),
+            freq=f"{self.window_minutes}min"
+        )
+        if by:
+            groups = group_index.droplevel("Window_Start").unique()
+            full_index = pd.MultiIndex.from_tuples(
+                [(w, *(g if isinstance(g, tuple) else (g,))) for g in groups for w in grid],
+                names=["Window_Start"] + by
+            )
+        else:
+            groups = [()]
+            full_index = pd.Index(grid, name="Window_Start")
+        positions = full_index.get_indexer(group_index)
+
+        rolled = {}
+        for name, values in totals.items():
+            filled = np.zeros((len(full_index),) + values.shape[1:])
+            filled[positions] = values
+            # rolling sum along time inside each group: difference of running totals
+            filled = filled.reshape((len(groups), len(grid)) + values.shape[1:])
+            running = np.cumsum(filled, axis=1)
+            shifted = np.zeros_like(running)
+            shifted[:, windows:] = running[:, :-windows] if windows < len(grid) else 0
+            rolled[name] = (running - shifted).reshape((len(full_index),) + values.shape[1:])
+
+        stats = self._stats_frame(full_index, rolled, self.window_minutes * windows)
+        return stats[stats["Arrivals"] > 0].reset_index(drop=True)
+
+    def mode_summary(self, zones=None, modes=None, start=None, end=None) -> pd.DataFrame:
+        """
+        One row per zone and mode over the selected period. Rates are averaged over the windows
+        that had traffic.
+        """
+        rows = self._select(zones, modes, start, end)
+        if not len(rows):
+            return pd.DataFrame(columns=["Zone", "Transport_Mode"])
+        group_index, totals = self._grouped(rows, ["Zone", "Transport_Mode"])
+        stats = self._stats_frame(group_index, totals, self.window_minutes)
+        stats["Active_Windows"] = totals["Windows"]
+        stats["Arrival_Rate_per_min"] = stats["Arrivals"] / (stats["Active_Windows"] * self.window_minutes)
+        stats["Est_Queue_Length"] = stats["Arrival_Rate_per_min"] * stats["Avg_Queue_Time"]
+        stats["Est_Security_Queue"] = stats["Arrival_Rate_per_min"] * stats["Avg_Security_Wait"]
+        return stats
+
+
+# === COMPUTE QUEUE STATS ===
+# This function processes a whole frame in one go (the dashboard uses it on load).
+# A chunked dataset (out_of_core.py) is added one chunk at a time, reading only the queue columns.
+def compute_queue_stats(df: pd.DataFrame, window_minutes: int = WINDOW_MINUTES) -> QueueStatsState:
+    if hasattr(df, "iter_chunks"):
+        state = QueueStatsState(window_minutes)
+        for chunk in df.iter_chunks(columns=["Timestamp", "Zone", "Transport_Mode", *WAIT_METRICS.values()]):
+            state.update(chunk)
+        return state
+    return QueueStatsState(window_minutes).update(df)
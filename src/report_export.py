@@ -0,0 +1,335 @@
+import argparse
+import hashlib
+import html
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from data_aggregations import load_and_clean_data
+from datasets import DEFAULT_REGISTRY, get_dataset_entry, load_dataset
+from demographics import demographic_summary
+from maps import build_incident_map
+from panels import (
+    fatigue_stress_data, fatigue_stress_figure,
+    incident_density_data, incident_density_figure,
+    movement_heatmap_data, movement_heatmap_figure,
+    nationality_data, nationality_figure,
+    transport_wait_data, transport_wait_figure,
+    safety_satisfaction_data, safety_satisfaction_figure,
+    incident_timeline_data, incident_timeline_figure,
+    experience_data, experience_figure,
+    health_condition_data, health_condition_figure
+)
+from utils import dataset_version
+
+
+# === REPORT PANELS ===
+# The same charts as the dashboard, built with the default options of each panel.
+# Each entry is (file name, title, function that builds the figure from one day of data).
+REPORT_PANELS = [
+    ("fatigue_stress", "Stress vs Fatigue",
+     lambda d, label: fatigue_stress_figure(fatigue_stress_data(d), label)),
+    ("incident_density", "Incident Frequency by Crowd Density",
+     lambda d, label: incident_density_figure(incident_density_data(d, "Summary View", False), "Summary View", label)),
+    ("movement_heatmap", "Animated Movement Speed Heatmap by Hour",
+     lambda d, label: movement_heatmap_figure(movement_heatmap_data(d, use_sim=True))),
+    ("nationality", "Nationality Diversity",
+     lambda d, label: nationality_figure(nationality_data(demographic_summary(d, ["Nationality"])), "Bar Chart")),
+    ("transport_wait", "Transport Waiting Time by Zone",
+     lambda d, label: transport_wait_figure(transport_wait_data(d), label)),
+    ("safety_satisfaction", "Satisfaction vs Perceived Safety",
+     lambda d, label: safety_satisfaction_figure(
+         safety_satisfaction_data(demographic_summary(d, ["Nationality"]), min_threshold=5))),
+    ("incident_timeline", "Incident Frequency Over Time",
+     lambda d, label: incident_timeline_figure(incident_timeline_data(d), label)),
+    ("stress_experience", "Stress Level by Pilgrim Experience",
+     lambda d, label: experience_figure(experience_data(demographic_summary(d, ["Pilgrim_Experience"]), "Stress_Score"),
+                                        "Stress_Score",
+                                        title="Average Stress Level: First-Time vs Experienced Pilgrims",
+                                        y_title="Average Stress Score")),
+    ("speed_experience", "Movement Speed by Pilgrim Experience",
+     lambda d, label: experience_figure(experience_data(demographic_summary(d, ["Pilgrim_Experience"]), "Movement_Speed"),
+                                        "Movement_Speed",
+                                        title="Average Movement Speed: First-Time vs Experienced Pilgrims",
+                                        y_title="Average Speed (m/s)")),
+    ("health_conditions", "Health Condition Frequency",
+     lambda d, label: health_condition_figure(health_condition_data(d))),
+]
+DEFAULT_CACHE_DIR = ".cache/reports"
+
+# Bump this when a change to the figures is not visible in the modules below (e.g. a plotly upgrade
+# that changes the JSON); edits to those modules already give the cache a new key on their own.
+FIGURE_CACHE_VERSION = 1
+FIGURE_CODE_MODULES = ["panels", "demographics", "data_aggregations", "validation", "simulation", "report_export"]
+
+
+# === FIGURE CACHE ===
+# Figures are cached as Plotly JSON per dataset version, code version, day and panel. The JSON already holds
+# the aggregated numbers, so a cached panel skips both the aggregation and the figure building.
+# Figures are returned as plain dicts: rebuilding a validated Figure object from JSON is slower
+# than building it from scratch, and plotly.io can render dicts directly with validate=False.
+def cached_figure(cache_dir: str, day: str, panel: str, build) -> tuple:
+    path = os.path.join(cache_dir, day, f"{panel}.json")
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f), True
+
+    fig_json = build().to_json()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(fig_json)
+    os.replace(tmp_path, path)
+    return json.loads(fig_json), False
+
+
+def figure_code_version() -> str:
+    """
+    Short hash of the code that builds the figures, so changing a panel or an aggregation
+    never serves figures cached by the old code.
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha1(f"v{FIGURE_CACHE_VERSION}".encode("utf-8"))
+    for module in FIGURE_CODE_MODULES:
+        with open(os.path.join(src_dir, f"{module}.py"), "rb") as f:
+            digest.update(f.read())
+    try:
+        import plotly
+        digest.update(plotly.__version__.encode("utf-8"))
+    except ImportError:
+        pass
+    return digest.hexdigest()[:12]
+
+
+# === REPORT SOURCE ===
+# A report is built from a CSV file or from a dataset name in the registry (data/datasets.json),
+# which also covers folders of exports.
+def resolve_source(source: str, registry_path: str = DEFAULT_REGISTRY) -> tuple:
+    """
+    Returns ("csv", path) or ("dataset", name).
+    """
+    if os.path.isfile(source):
+        return "csv", source
+    try:
+        get_dataset_entry(source, registry_path)
+    except KeyError:
+        raise ValueError(f"'{source}' is neither a CSV file nor a dataset in {registry_path}")
+    return "dataset", source
+
+
+def load_source(kind: str, source: str, registry_path: str = DEFAULT_REGISTRY) -> pd.DataFrame:
+    if kind == "dataset":
+        return load_dataset(source, registry_path)
+    return load_and_clean_data(source)
+
+
+def source_version(kind: str, source: str, registry_path: str = DEFAULT_REGISTRY) -> str:
+    path = get_dataset_entry(source, registry_path)["path"] if kind == "dataset" else source
+    return dataset_version(path)
+
+
+# === WORKER PROCESS ===
+# Every worker loads the cleaned data once and splits it by calendar day. For a CSV the parent
+# publishes the cleaned rows as an Arrow file (frame_path) and the workers attach to it instead of
+# cleaning the CSV again; registry datasets come from their versioned cache (already built by the parent).
+_WORKER = {}
+
+
+def init_worker(kind: str, source: str, cache_dir: str, registry_path: str = DEFAULT_REGISTRY,
+                frame_path: str = None) -> None:
+    if frame_path is not None:
+        from shared_data import attach_shared_frame
+        df = attach_shared_frame(frame_path)
+    elif kind == "dataset":
+        df = load_dataset(source, registry_path)
+    else:
+        df = load_and_clean_data(source)
+
+    _WORKER["df"] = df
+    _WORKER["days"] = df.groupby(df["Timestamp"].dt.strftime("%Y-%m-%d")).indices
+    _WORKER["cache_dir"] = cache_dir
+
+
+def render_day(day: str, out_dir: str, formats: list, embed_js: bool) -> dict:
+    import plotly.io as pio
+
+    start = time.perf_counter()
+    df = _WORKER["df"]
+    rows = _WORKER["days"].get(day)
+    result = {"day": day, "panels": 0, "cached": 0, "skipped": [], "seconds": 0.0}
+    if rows is None:
+        result["skipped"].append("no data for this day")
+        return result
+
+    day_df = df.iloc[rows]
+    label = f"{day}, {pd.Timestamp(day).day_name()}"
+    bundle_dir = os.path.join(out_dir, day)
+    os.makedirs(bundle_dir, exist_ok=True)
+
+    sections = []
+    include_js = True if embed_js else "cdn"
+    for panel, title, build in REPORT_PANELS:
+        try:
+            fig, from_cache = cached_figure(_WORKER["cache_dir"], day, panel, lambda: build(day_df, label))
+        except Exception as e:
+            result["skipped"].append(f"{panel}: {e}")
+            continue
+
+        result["panels"] += 1
+        result["cached"] += int(from_cache)
+
+        if "html" in formats:
+            # plotly.js is only included once per report
+            sections.append((title, pio.to_html(fig, full_html=False, include_plotlyjs=include_js, validate=False)))
+            include_js = False
+        for image_format in ("png", "pdf"):
+            if image_format in formats:
+                try:
+                    pio.write_image(fig, os.path.join(bundle_dir, f"{panel}.{image_format}"),
+                                    width=1100, height=600, validate=False)
+                except (ValueError, RuntimeError, ImportError) as e:
+                    # static export needs kaleido: pip install kaleido
+                    message = str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__
+                    result["skipped"].append(f"{panel}.{image_format}: {message}")
+
+    # the folium map is its own HTML page, linked from the report
+    try:
+        build_incident_map(day_df).save(os.path.join(bundle_dir, "map.html"))
+        result["panels"] += 1
+        sections.insert(0, ("Interactive Map of Zones + Incidents",
+                            '<iframe src="map.html" width="100%" height="600" style="border:none"></iframe>'))
+    except Exception as e:
+        result["skipped"].append(f"map: {e}")
+
+    if "html" in formats:
+        write_report_html(os.path.join(bundle_dir, "report.html"), label, sections)
+
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def write_report_html(path: str, label: str, sections: list) -> None:
+    body = "\n".join(f"<h2>{html.escape(title)}</h2>\n{content}" for title, content in sections)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>HajjSense Daily Briefing - {html.escape(label)}</title>
+<style>body {{ font-family: sans-serif; max-width: 1200px; margin: auto; }}</style>
+</head>
+<body>
+<h1>🕋 HajjSense Daily Briefing: {html.escape(label)}</h1>
+<p><i>Data anonymized and partially simulated for demonstration purposes.</i></p>
+{body}
+</body>
+</html>
+""")
+
+
+def publish_report_frame(df: pd.DataFrame, csv_path: str) -> tuple:
+    """
+    Writes the cleaned rows once as an Arrow file for the workers to attach to; returns
+    (path, is_private_copy), or (None, False) without pyarrow (the workers then clean the CSV).
+    With HAJJSENSE_SHARED_DATA=1 it is the dashboard's shared copy and stays in place for other
+    processes; otherwise it is a private temp file that export_reports removes when it is done.
+    """
+    from shared_data import publish_shared_frame, shared_data_path, shared_data_dir
+
+    try:
+        if os.environ.get("HAJJSENSE_SHARED_DATA") == "1":
+            path = shared_data_path(csv_path)
+            if not os.path.exists(path):
+                publish_shared_frame(df, path)
+            return path, False
+
+        fd, path = tempfile.mkstemp(prefix="hajjsense_report_", suffix=".arrow", dir=shared_data_dir())
+        os.close(fd)
+        try:
+            publish_shared_frame(df, path)
+        except BaseException:
+            os.remove(path)
+            raise
+        return path, True
+    except ImportError:
+        return None, False
+
+
+# === EXPORT REPORTS ===
+def export_reports(source: str, out_dir: str, start: str = None, end: str = None, formats: list = None,
+                   jobs: int = None, cache_dir: str = DEFAULT_CACHE_DIR, embed_js: bool = False,
+                   registry_path: str = DEFAULT_REGISTRY) -> list:
+    """
+    Renders one report bundle per day between start and end (inclusive) in a process pool.
+    source is a CSV path or a dataset name from the registry. Returns one summary dict per day.
+    """
+    formats = formats or ["html"]
+    kind, source = resolve_source(source, registry_path)
+    df = load_source(kind, source, registry_path)
+    available_days = sorted(df["Timestamp"].dt.strftime("%Y-%m-%d").unique())
+    days = [d for d in available_days if (start is None or d >= start) and (end is None or d <= end)]
+    if not days:
+        raise ValueError(f"No data between {start} and {end}")
+
+    # cache entries are tied to the exact data and to the code that drew them, so an updated CSV
+    # or a changed panel never reuses old figures
+    version_cache_dir = os.path.join(cache_dir, f"{source_version(kind, source, registry_path)}_{figure_code_version()}")
+
+    # publish the cleaned CSV once up front, so the workers only attach to it
+    frame_path, private_copy = publish_report_frame(df, source) if kind == "csv" else (None, False)
+    del df
+
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker,
+                                 initargs=(kind, source, version_cache_dir, registry_path, frame_path)) as pool:
+            jobs_list = [pool.submit(render_day, day, out_dir, formats, embed_js) for day in days]
+            return [job.result() for job in jobs_list]
+    finally:
+        if private_copy:
+            os.remove(frame_path)
+
+
+# === CLI ===
+# Example: python src/report_export.py data/hajj_umrah_crowd_management_dataset.csv --start 2024-06-01 --end 2024-06-07
+#          python src/report_export.py hajj_umrah_2024 --formats html
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Render the dashboard panels as daily report bundles.")
+    parser.add_argument("source", help="a CSV file or a dataset name from the registry")
+    parser.add_argument("--registry", default=DEFAULT_REGISTRY)
+    parser.add_argument("--out", default="reports", help="output folder (one sub-folder per day)")
+    parser.add_argument("--start", help="first day, YYYY-MM-DD (default: first day in the data)")
+    parser.add_argument("--end", help="last day, YYYY-MM-DD (default: last day in the data)")
+    parser.add_argument("--formats", default="html", help="comma separated: html,png,pdf (png/pdf need kaleido)")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--embed-js", action="store_true", help="embed plotly.js so reports work offline")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        results = export_reports(
+            args.source, args.out,
+            start=args.start, end=args.end,
+            formats=[f.strip() for f in args.formats.split(",") if f.strip()],
+            jobs=args.jobs, cache_dir=args.cache_dir, embed_js=args.embed_js, registry_path=args.registry
+        )
+    except (ValueError, FileNotFoundError) as e:
+        print(f"Error: {e}")
+        return 1
+
+    for res in results:
+        line = f"{res['day']}: {res['panels']} panels ({res['cached']} from cache) in {res['seconds']:.2f}s"
+        if res["skipped"]:
+            line += f" | skipped: {'; '.join(res['skipped'])}"
+        print(line)
+    print(f"\nWrote {len(results)} report(s) to {args.out} in {time.perf_counter() - start:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
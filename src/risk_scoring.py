@@ -0,0 +1,172 @@
+import numpy as np
+import pandas as pd
+
+
+# === RISK RULES ===
+# Each rule turns a zone/hour average into a 0-1 risk component, then the components
+# are combined with these weights into a 0-100 score.
+# The thresholds are rough guides for crowd safety and should be tuned with real data.
+RISK_WEIGHTS = {
+    "Density_Risk": 0.25,     # how crowded the zone is (Low/Medium/High)
+    "Proximity_Risk": 0.20,   # how close people stand to each other
+    "Slowdown_Risk": 0.15,    # slow movement is an early sign of congestion
+    "Stress_Risk": 0.15,      # reported stress level
+    "Heat_Risk": 0.10,        # heat exhaustion risk
+    "Incident_Risk": 0.15,    # share of the readings that reported an incident
+}
+
+DENSITY_LEVELS = {"Low": 1, "Medium": 2, "High": 3}
+SAFE_DISTANCE_M = 2.5       # at or above this distance there is no proximity risk
+NORMAL_SPEED_MS = 1.5       # normal walking speed, slower than this adds risk
+HEAT_START_C = 30.0         # heat risk starts here...
+HEAT_MAX_C = 45.0           # ...and is at its maximum here
+INCIDENT_RATE_MAX = 0.5     # incidents in half of the readings (or more) is the maximum incident risk
+
+# These are the running sums kept per zone and hour, so new data can simply be added on top.
+MEASURES = {
+    "Density": "Crowd_Density",
+    "Distance": "Distance_Between_People_m",
+    "Speed": "Movement_Speed",
+    "Stress": "Stress_Score",
+    "Temperature": "Temperature",
+}
+INCIDENT_COLUMN = "Incident_Type"
+HOURS = 24
+
+
+# === INCREMENTAL RISK STATE ===
+class RiskScoreState:
+    """
+    Keeps per-zone, per-hour sums and counts of the risk measures.
+    Call update() with every new batch of rows; scores are always computed from the sums,
+    so the result is the same as scoring all the rows at once.
+    """
+
+    def __init__(self):
+        self.zones = []
+        self.rows = np.zeros((0, HOURS))
+        self.incidents = np.zeros((0, HOURS))
+        self.sums = {name: np.zeros((0, HOURS)) for name in MEASURES}
+        self.counts = {name: np.zeros((0, HOURS)) for name in MEASURES}
+
+    def _add_zones(self, new_zones) -> None:
+        added = [z for z in new_zones if z not in self.zones]
+        if not added:
+            return
+        self.zones.extend(added)
+        pad = ((0, len(added)), (0, 0))
+        self.rows = np.pad(self.rows, pad)
+        self.incidents = np.pad(self.incidents, pad)
+        for name in MEASURES:
+            self.sums[name] = np.pad(self.sums[name], pad)
+            self.counts[name] = np.pad(self.counts[name], pad)
+
+    def update(self, df: pd.DataFrame) -> "RiskScoreState":
+        required_columns = {"Zone", "Hour", INCIDENT_COLUMN} | set(MEASURES.values())
+        missing = required_columns - set(df.columns)
+        if missing:
+            raise KeyError(f"Missing expected column(s) for risk scoring: {sorted(missing)}")
+
+        df = df.dropna(subset=["Zone", "Hour"])
+        if df.empty:
+            return self
+
+        # factorize once and translate the few unique zone names, much faster than mapping every row
+        row_codes, zone_names = pd.factorize(df["Zone"])
+        self._add_zones(zone_names)
+        zone_codes = np.array([self.zones.index(z) for z in zone_names], dtype=np.int64)[row_codes]
+
+        # One flat bin per zone/hour pair, so every sum below is a single np.bincount pass
+        keys = zone_codes * HOURS + df["Hour"].to_numpy(dtype=np.int64)
+        size = len(self.zones) * HOURS
+        shape = (len(self.zones), HOURS)
+
+        # rows without an incident type are plain readings, only the others count as incidents
+        self.rows += np.bincount(keys, minlength=size).reshape(shape)
+        has_incident = df[INCIDENT_COLUMN].notna().to_numpy()
+        self.incidents += np.bincount(keys[has_incident], minlength=size).reshape(shape)
+
+        for name, column in MEASURES.items():
+            if name == "Density":
+                level_codes, level_names = pd.factorize(df[column])
+                levels = np.array([DENSITY_LEVELS.get(level, np.nan) for level in level_names] + [np.nan])
+                values = levels[level_codes]  # code -1 (missing) picks the trailing NaN
+            else:
+                values = df[column].to_numpy(dtype=float)
+            valid = ~np.isnan(values)
+            self.sums[name] += np.bincount(keys[valid], weights=values[valid], minlength=size).reshape(shape)
+            self.counts[name] += np.bincount(keys[valid], minlength=size).reshape(shape)
+
+        return self
+
+    # === SCORING ===
+    def _score(self, rows: np.ndarray, incidents: np.ndarray, sums: dict, counts: dict) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = {name: sums[name] / counts[name] for name in MEASURES}
+            # a rate per reading, so a zone does not score higher just because it has more sensors/visitors
+            incident_rate = incidents / rows
+
+            components = {
+                "Density_Risk": (means["Density"] - 1) / 2,
+                "Proximity_Risk": (SAFE_DISTANCE_M - means["Distance"]) / SAFE_DISTANCE_M,
+                "Slowdown_Risk": (NORMAL_SPEED_MS - means["Speed"]) / NORMAL_SPEED_MS,
+                "Stress_Risk": (means["Stress"] - 1) / 2,
+                "Heat_Risk": (means["Temperature"] - HEAT_START_C) / (HEAT_MAX_C - HEAT_START_C),
+                "Incident_Risk": incident_rate / INCIDENT_RATE_MAX,
+            }
+
+        components = {name: np.nan_to_num(np.clip(values, 0, 1)) for name, values in components.items()}
+        score = sum(RISK_WEIGHTS[name] * components[name] for name in RISK_WEIGHTS) * 100
+
+        return {"Incidents": incidents, "Incident_Rate": np.nan_to_num(incident_rate), **components, "Risk_Score": score}
+
+    def _table(self, rows: np.ndarray, scored: dict, **keys) -> pd.DataFrame:
+        # zones/hours without any readings are left out; ones with readings but no incidents stay in
+        table = pd.DataFrame({**keys, **{name: values.ravel() for name, values in scored.items()}})
+        return table[rows.ravel() > 0]
+
+    def zone_hour_scores(self) -> pd.DataFrame:
+        """
+        Returns one row per zone and hour, ranked from riskiest to safest.
+        """
+        scored = self._score(self.rows, self.incidents, self.sums, self.counts)
+        table = self._table(self.rows, scored, Zone=np.repeat(self.zones, HOURS),
+                            Hour=np.tile(np.arange(HOURS), len(self.zones)))
+        return table.sort_values("Risk_Score", ascending=False).reset_index(drop=True)
+
+    def zone_ranking(self, hour: int = None) -> pd.DataFrame:
+        """
+        Returns one row per zone, ranked from riskiest to safest.
+        With hour=None the whole day is scored, otherwise only that hour.
+        """
+        if hour is None:
+            pick = lambda arr: arr.sum(axis=1)
+        else:
+            pick = lambda arr: arr[:, hour]
+
+        scored = self._score(
+            pick(self.rows),
+            pick(self.incidents),
+            {name: pick(values) for name, values in self.sums.items()},
+            {name: pick(values) for name, values in self.counts.items()},
+        )
+        table = self._table(pick(self.rows), scored, Zone=self.zones)
+        table = table.sort_values("Risk_Score", ascending=False).reset_index(drop=True)
+        table.insert(0, "Rank", np.arange(1, len(table) + 1))
+        return table
+
+    def top_zone(self, hour: int = None) -> str:
+        ranking = self.zone_ranking(hour)
+        return ranking["Zone"].iloc[0] if not ranking.empty else None
+
+
+# === COMPUTE RISK SCORES ===
+# This function scores a whole frame in one go (the dashboard uses it on load).
+# A chunked dataset (out_of_core.py) is added one chunk at a time, reading only the risk columns.
+def compute_risk_scores(df: pd.DataFrame) -> RiskScoreState:
+    if hasattr(df, "iter_chunks"):
+        state = RiskScoreState()
+        for chunk in df.iter_chunks(columns=["Zone", "Hour", INCIDENT_COLUMN, *MEASURES.values()]):
+            state.update(chunk)
+        return state
+    return RiskScoreState().update(df)
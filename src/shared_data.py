@@ -0,0 +1,228 @@
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from data_aggregations import load_and_clean_data
+from utils import dataset_version
+
+
+# === SHARED DATA LOCATION ===
+# /dev/shm is RAM-backed on Linux, so a file there is shared memory that every worker can map.
+# On other systems we fall back to the temp folder, which still gets shared through the page cache.
+def shared_data_dir() -> str:
+    custom_dir = os.environ.get("HAJJSENSE_SHARED_DIR")
+    if custom_dir:
+        os.makedirs(custom_dir, exist_ok=True)
+        return custom_dir
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def shared_data_path(csv_path: str) -> str:
+    """
+    Returns the Arrow file path for a CSV.
+    The dataset version is part of the name so workers never attach to stale data.
+    """
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(shared_data_dir(), f"hajjsense_{stem}_{dataset_version(csv_path)}.arrow")
+
+
+# === PUBLISH CLEANED DATA ===
+# This function writes the cleaned frame once as an uncompressed Arrow IPC (Feather v2) file.
+def publish_shared_frame(df: pd.DataFrame, path: str) -> str:
+    try:
+        import pyarrow as pa
+        from pyarrow import feather
+    except ImportError:
+        raise ImportError("pyarrow is required for shared data mode: pip install pyarrow")
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # write to a temp file first and rename so workers never see a half-written file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return path
+
+
+# === ATTACH TO SHARED DATA ===
+# This function memory-maps the Arrow file instead of parsing the CSV again.
+# Numeric and timestamp columns point straight at the shared pages; only text columns get copied.
+def attach_shared_frame(path: str) -> pd.DataFrame:
+    try:
+        from pyarrow import feather
+    except ImportError:
+        raise ImportError("pyarrow is required for shared data mode: pip install pyarrow")
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Shared data file not found: {path}")
+
+    return table.to_pandas(split_blocks=True)
+
+
+# === PUBLISH LOCK ===
+# Only one worker publishes at a time. The lock file holds "<pid> <host> <time>" and the publisher
+# touches it every few seconds, so a lock whose owner was killed (OOM, restart) can be spotted and broken:
+# either its pid is gone on this host, or it has not been touched for longer than the wait timeout.
+LOCK_HEARTBEAT_SECONDS = 5.0
+
+
+def acquire_publish_lock(lock_path: str):
+    """
+    Returns an open file descriptor when we got the lock, None when another worker holds it.
+    """
+    try:
+        lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return None
+    os.write(lock_fd, f"{os.getpid()} {socket.gethostname()} {time.time():.0f}".encode("utf-8"))
+    return lock_fd
+
+
+def lock_is_stale(lock_path: str, stale_after: float) -> bool:
+    try:
+        with open(lock_path, encoding="utf-8") as f:
+            owner = f.read().split()
+        age = time.time() - os.stat(lock_path).st_mtime
+    except OSError:
+        return False  # already gone, the caller just tries again
+    if age > stale_after:
+        return True
+    if len(owner) >= 2 and owner[1] == socket.gethostname():
+        try:
+            os.kill(int(owner[0]), 0)
+        except ProcessLookupError:
+            return True
+        except (ValueError, OSError):
+            pass  # PermissionError means the process is alive, it just belongs to another user
+    return False
+
+
+def break_stale_lock(lock_path: str, stale_after: float) -> None:
+    # rename first so only one waiting worker breaks it; if the file we grabbed turns out to be a
+    # fresh lock (another worker broke the old one and re-locked in between), put it back
+    grabbed = f"{lock_path}.{os.getpid()}.stale"
+    try:
+        os.rename(lock_path, grabbed)
+    except OSError:
+        return
+    try:
+        if not lock_is_stale(grabbed, stale_after):
+            try:
+                os.link(grabbed, lock_path)
+            except OSError:
+                pass
+    finally:
+        os.remove(grabbed)
+
+
+class LockHeartbeat:
+    """
+    Touches the lock file in a background thread while the publisher is busy cleaning the CSV.
+    """
+
+    def __init__(self, lock_path: str, interval: float):
+        self.lock_path = lock_path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="hajjsense-lock-heartbeat", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                os.utime(self.lock_path)
+            except OSError:
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# === LOAD WITH SHARING ===
+# The first worker on the host cleans the CSV and publishes it, every other worker just attaches.
+def load_shared_data(csv_path: str, wait_timeout: float = 60.0) -> pd.DataFrame:
+    path = shared_data_path(csv_path)
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + wait_timeout
+
+    while True:
+        if os.path.exists(path):
+            return attach_shared_frame(path)
+
+        lock_fd = acquire_publish_lock(lock_path)
+        if lock_fd is not None:
+            break
+
+        # another worker is already publishing, so wait for it instead of loading a second copy
+        if lock_is_stale(lock_path, wait_timeout):
+            # its publisher died and left the lock behind: take over and publish ourselves
+            break_stale_lock(lock_path, wait_timeout)
+            continue
+        if time.monotonic() >= deadline:
+            # the publisher is alive but slow, so load privately rather than hang the dashboard
+            return load_and_clean_data(csv_path)
+        time.sleep(0.1)
+
+    try:
+        # it may have been published while we were getting the lock
+        if not os.path.exists(path):
+            with LockHeartbeat(lock_path, min(LOCK_HEARTBEAT_SECONDS, wait_timeout / 4)):
+                df = load_and_clean_data(csv_path)
+                publish_shared_frame(df, path)
+            remove_stale_shared_frames(csv_path, keep=path)
+    finally:
+        os.close(lock_fd)
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    return attach_shared_frame(path)
+
+
+# === CLEAN UP OLD VERSIONS ===
+# Workers that still map an old file keep working (Linux keeps the pages until they detach).
+def remove_stale_shared_frames(csv_path: str, keep: str) -> None:
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    prefix = f"hajjsense_{stem}_"
+    folder = os.path.dirname(keep)
+
+    for name in os.listdir(folder):
+        full_path = os.path.join(folder, name)
+        if name.startswith(prefix) and name.endswith(".arrow") and full_path != keep:
+            try:
+                os.remove(full_path)
+            except OSError:
+                pass
+
+
+# === CLI ===
+# Run this once before starting the dashboard workers to pre-publish the data:
+#   python src/shared_data.py data/hajj_umrah_crowd_management_dataset.csv
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python src/shared_data.py <csv_path>")
+        sys.exit(1)
+
+    csv_path = sys.argv[1]
+    path = publish_shared_frame(load_and_clean_data(csv_path), shared_data_path(csv_path))
+    remove_stale_shared_frames(csv_path, keep=path)
+    print(f"Published cleaned data to {path}")
@@ -0,0 +1,142 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from geofence import load_geofences, GeofenceIndex
+
+
+# === SIMULATION SETTINGS ===
+# Zone weights and the seed live in config/simulation.json; zone polygons come from geofences.json.
+DEFAULT_SIMULATION_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config", "simulation.json")
+DEFAULT_PARTITION_ROWS = 65536
+DEFAULT_PLACEMENT_ATTEMPTS = 8
+
+
+def load_simulation_config(config_path: str = DEFAULT_SIMULATION_CONFIG) -> dict:
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Simulation config not found: {config_path}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Error parsing the simulation config: {e}")
+
+    weights = config.get("zone_weights", {})
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("The simulation config needs positive 'zone_weights'")
+    if int(config.get("partition_rows", DEFAULT_PARTITION_ROWS)) <= 0:
+        raise ValueError("'partition_rows' must be a positive number of rows")
+    if int(config.get("placement_attempts", DEFAULT_PLACEMENT_ATTEMPTS)) <= 0:
+        raise ValueError("'placement_attempts' must be at least 1")
+    return config
+
+
+# === RANDOM STREAMS ===
+# Row r of the source file always uses partition r // partition_rows, and every partition has its
+# own stream. SeedSequence(seed, spawn_key=(k,)) is exactly the k-th child of
+# SeedSequence(seed).spawn(), built directly so a worker does not need to spawn all earlier children.
+def partition_draws(seed: int, partition: int, partition_rows: int, columns: int = 3) -> np.ndarray:
+    """
+    The uniform draws for one partition: column 0 picks the zone, then one lat/lon pair per placement attempt.
+    """
+    stream = np.random.Generator(np.random.PCG64(np.random.SeedSequence(seed, spawn_key=(int(partition),))))
+    return stream.random((partition_rows, columns))
+
+
+def _draws_for_partition(args: tuple) -> tuple:
+    # runs inside a worker process, one call per partition
+    seed, partition, partition_rows, columns, offsets = args
+    return partition, partition_draws(seed, partition, partition_rows, columns)[offsets]
+
+
+def draws_for_rows(row_ids: np.ndarray, seed: int, partition_rows: int, workers: int = 1, columns: int = 3) -> np.ndarray:
+    """
+    (rows x columns) uniform draws for the given source row numbers. Only depends on the row numbers,
+    not on how the rows were chunked or how many workers run.
+    """
+    row_ids = np.asarray(row_ids, dtype=np.int64)
+    draws = np.empty((len(row_ids), columns))
+    if not len(row_ids):
+        return draws
+
+    partitions = row_ids // partition_rows
+    order = np.argsort(partitions, kind="stable")
+    bounds = np.flatnonzero(np.r_[True, partitions[order][1:] != partitions[order][:-1], True])
+    jobs, positions = [], {}
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        rows = order[start:end]
+        partition = int(partitions[rows[0]])
+        positions[partition] = rows
+        jobs.append((seed, partition, partition_rows, columns, row_ids[rows] % partition_rows))
+
+    if workers and workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_draws_for_partition, jobs))
+    else:
+        results = [_draws_for_partition(job) for job in jobs]
+    for partition, values in results:
+        draws[positions[partition]] = values
+    return draws
+
+
+# === SIMULATED ZONES ===
+# Positions are drawn uniformly in the zone polygon's bounding box and kept only where the geofence
+# index puts them in that same zone, so the geofence monitor and every Zone-based panel agree.
+# A row whose attempts all miss (rare, only for polygons that fill little of their box) gets the zone center.
+def simulate_zones(row_ids: np.ndarray, config: dict = None, geofences: dict = None, workers: int = None) -> pd.DataFrame:
+    """
+    Zone, Sim_Lat and Sim_Lon for the given source row numbers (e.g. df.index of the raw CSV).
+    """
+    config = config or load_simulation_config()
+    geofences = geofences or load_geofences()
+    weights = config["zone_weights"]
+    index = GeofenceIndex(geofences["zones"])
+    missing = [zone for zone in weights if zone not in index.names]
+    if missing:
+        raise KeyError(f"Zones without a polygon in the geofence config: {missing}")
+
+    zones = list(weights)
+    probabilities = np.array([weights[z] for z in zones], dtype=float)
+    cumulative = np.cumsum(probabilities / probabilities.sum())
+    cumulative[-1] = 1.0
+
+    fence_codes = np.array([index.names.index(z) for z in zones])
+    fences = {zone["name"]: zone for zone in geofences["zones"]}
+    low = np.array([np.min(fences[z]["polygon"], axis=0) for z in zones])
+    high = np.array([np.max(fences[z]["polygon"], axis=0) for z in zones])
+    centers = np.array([fences[z]["center"] for z in zones], dtype=float)
+    off_center = index.locate(centers[:, 0], centers[:, 1]) != fence_codes
+    if off_center.any():
+        raise ValueError(f"Zone centers outside their own geofence: {[z for z, bad in zip(zones, off_center) if bad]}")
+
+    attempts = int(config.get("placement_attempts", DEFAULT_PLACEMENT_ATTEMPTS))
+    draws = draws_for_rows(
+        row_ids,
+        int(config.get("seed", 42)),
+        int(config.get("partition_rows", DEFAULT_PARTITION_ROWS)),
+        workers if workers is not None else int(config.get("workers") or 1),
+        columns=1 + 2 * attempts,
+    )
+    codes = np.searchsorted(cumulative, draws[:, 0], side="right")
+    codes = np.minimum(codes, len(zones) - 1)
+
+    lat, lon = centers[codes, 0].copy(), centers[codes, 1].copy()
+    todo = np.arange(len(codes))
+    for attempt in range(attempts):
+        if not len(todo):
+            break
+        c = codes[todo]
+        try_lat = low[c, 0] + draws[todo, 1 + 2 * attempt] * (high[c, 0] - low[c, 0])
+        try_lon = low[c, 1] + draws[todo, 2 + 2 * attempt] * (high[c, 1] - low[c, 1])
+        hit = index.locate(try_lat, try_lon) == fence_codes[c]
+        lat[todo[hit]], lon[todo[hit]] = try_lat[hit], try_lon[hit]
+        todo = todo[~hit]
+
+    return pd.DataFrame({
+        "Zone": np.asarray(zones, dtype=object)[codes],
+        "Sim_Lat": lat,
+        "Sim_Lon": lon,
+    })
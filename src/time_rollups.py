@@ -0,0 +1,169 @@
+import numpy as np
+import pandas as pd
+
+
+# === ROLLUP SETTINGS ===
+# The finest level is built from the raw rows; every other granularity is summed up from
+# a finer stored level, so asking for 30 or 120 minute windows never touches the raw data.
+BASE_MINUTES = 5
+STORED_MINUTES = (5, 15, 60)
+KEY_COLUMNS = ["Zone", "Incident_Type"]
+
+# Mean metrics are stored as sums and counts, so coarser windows get exact (weighted) means
+ROLLUP_METRICS = [
+    "Movement_Speed",
+    "Stress_Score",
+    "Fatigue_Score",
+    "Waiting_Time_for_Transport",
+    "Queue_Time_minutes",
+    "Security_Checkpoint_Wait_Time",
+]
+
+
+def sum_columns(metrics: list) -> list:
+    return [f"{m}_Sum" for m in metrics] + [f"{m}_Count" for m in metrics]
+
+
+# === MULTI-GRANULARITY ROLLUPS ===
+class TimeRollups:
+    """
+    Pre-aggregated counts and metric sums per time window, zone and incident type.
+    levels[minutes] holds one row per (Window_Start, Zone, Incident_Type) with data in it.
+    """
+
+    def __init__(self, base: pd.DataFrame, metrics: list, base_minutes: int = BASE_MINUTES):
+        self.metrics = metrics
+        self.base_minutes = base_minutes
+        self.levels = {base_minutes: base}
+
+    # --- levels ---
+    def _derive(self, minutes: int, source: pd.DataFrame) -> pd.DataFrame:
+        window = source["Window_Start"].dt.floor(f"{minutes}min")
+        value_columns = ["Events"] + sum_columns(self.metrics)
+        derived = (
+            source.groupby([window] + [source[k] for k in KEY_COLUMNS], sort=True)[value_columns]
+            .sum()
+            .reset_index()
+        )
+        return derived
+
+    def level(self, minutes: int) -> pd.DataFrame:
+        """
+        Returns the rollup for any window size that is a multiple of the base size.
+        """
+        if minutes in self.levels:
+            return self.levels[minutes]
+        if minutes <= 0 or minutes % self.base_minutes:
+            raise ValueError(f"Window size must be a multiple of {self.base_minutes} minutes, got {minutes}")
+
+        # start from the coarsest stored level that divides the requested size evenly
+        # (windows are aligned the same way at every level, so they nest exactly)
+        source = self.levels[max(m for m in self.levels if minutes % m == 0)]
+        self.levels[minutes] = self._derive(minutes, source)
+        return self.levels[minutes]
+
+    # --- queries ---
+    def _filtered(self, minutes: int, zones=None, incident_types=None, start=None, end=None) -> pd.DataFrame:
+        data = self.level(minutes)
+        mask = np.ones(len(data), dtype=bool)
+        if zones:
+            mask &= data["Zone"].isin(zones).to_numpy()
+        if incident_types:
+            mask &= data["Incident_Type"].isin(incident_types).to_numpy()
+        if start is not None:
+            mask &= (data["Window_Start"] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (data["Window_Start"] < pd.Timestamp(end)).to_numpy()
+        return data[mask]
+
+    def _with_means(self, summed: pd.DataFrame) -> pd.DataFrame:
+        for m in self.metrics:
+            counts = summed[f"{m}_Count"].replace(0, np.nan)
+            summed[f"Avg_{m}"] = summed[f"{m}_Sum"] / counts
+        return summed.drop(columns=sum_columns(self.metrics))
+
+    def series(self, minutes: int, zones=None, incident_types=None, start=None, end=None, by: list = None) -> pd.DataFrame:
+        """
+        Events and Avg_<metric> per window (end is exclusive).
+        by can hold "Zone" and/or "Incident_Type" to keep them as separate lines.
+        """
+        by = list(by or [])
+        data = self._filtered(minutes, zones, incident_types, start, end)
+        value_columns = ["Events"] + sum_columns(self.metrics)
+        summed = data.groupby(["Window_Start"] + by, sort=True)[value_columns].sum().reset_index()
+        return self._with_means(summed)
+
+    def rolling(self, minutes: int, window_minutes: int, zones=None, incident_types=None, start=None, end=None,
+                by: list = None) -> pd.DataFrame:
+        """
+        Rolling totals over the last window_minutes, stepping every `minutes`.
+        Empty windows are filled in first, so the rolling window always covers the same span of time.
+        """
+        if window_minutes % minutes:
+            raise ValueError("The rolling window must be a multiple of the window size")
+        by = list(by or [])
+        data = self._filtered(minutes, zones, incident_types, start, end)
+        value_columns = ["Events"] + sum_columns(self.metrics)
+        if data.empty:
+            return self._with_means(pd.DataFrame(columns=["Window_Start"] + by + value_columns))
+
+        steps = window_minutes // minutes
+        grid = pd.date_range(data["Window_Start"].min(), data["Window_Start"].max(), freq=f"{minutes}min")
+        frames = []
+        for key, group in (data.groupby(by, sort=True) if by else [((), data)]):
+            summed = group.groupby("Window_Start")[value_columns].sum().reindex(grid, fill_value=0)
+            rolled = summed.rolling(steps, min_periods=1).sum()
+            rolled.index.name = "Window_Start"
+            rolled = rolled.reset_index()
+            for col, value in zip(by, key if isinstance(key, tuple) else (key,)):
+                rolled[col] = value
+            frames.append(rolled)
+        result = pd.concat(frames, ignore_index=True)
+        return self._with_means(result[["Window_Start"] + by + value_columns])
+
+    def hour_of_day(self, zones=None, incident_types=None, start=None, end=None, by: list = None) -> pd.DataFrame:
+        """
+        Totals per hour of day (0-23), from the hourly level.
+        """
+        by = list(by or [])
+        data = self._filtered(60, zones, incident_types, start, end)
+        value_columns = ["Events"] + sum_columns(self.metrics)
+        summed = (
+            data.groupby([data["Window_Start"].dt.hour.rename("Hour")] + [data[c] for c in by], sort=True)[value_columns]
+            .sum()
+            .reset_index()
+        )
+        return self._with_means(summed)
+
+
+def build_time_rollups(df: pd.DataFrame, base_minutes: int = BASE_MINUTES, metrics: list = None) -> TimeRollups:
+    """
+    Scans the raw rows once into base_minutes windows, then derives the other stored levels.
+    """
+    metrics = [m for m in (metrics or ROLLUP_METRICS) if m in df.columns]
+    missing = {"Timestamp", *KEY_COLUMNS} - set(df.columns)
+    if missing:
+        raise KeyError(f"Missing expected column(s) for time rollups: {sorted(missing)}")
+
+    data = df.dropna(subset=["Timestamp"])
+    values = {"Window_Start": data["Timestamp"].dt.floor(f"{base_minutes}min")}
+    for k in KEY_COLUMNS:
+        values[k] = data[k].fillna("None")
+    values["Events"] = np.ones(len(data), dtype=np.int64)
+    for m in metrics:
+        column = pd.to_numeric(data[m], errors="coerce")
+        values[f"{m}_Sum"] = column.fillna(0).to_numpy(dtype=float)
+        values[f"{m}_Count"] = column.notna().to_numpy(dtype=np.int64)
+
+    frame = pd.DataFrame(values)
+    base = (
+        frame.groupby(["Window_Start"] + KEY_COLUMNS, sort=True)[["Events"] + sum_columns(metrics)]
+        .sum()
+        .reset_index()
+    )
+
+    rollups = TimeRollups(base, metrics, base_minutes)
+    for minutes in STORED_MINUTES:
+        if minutes != base_minutes:
+            rollups.level(minutes)
+    return rollups
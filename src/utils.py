@@ -0,0 +1,51 @@
+import hashlib
+import os
+
+
+# === DATASET VERSION ===
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+DERIVED_DATA_CONFIGS = [os.path.join(CONFIG_DIR, "simulation.json"), os.path.join(CONFIG_DIR, "geofences.json")]
+# Part of every dataset version, so caches written by older code are not served after an upgrade.
+# Bump it whenever the cleaning steps, the derived columns or the stored aggregates change.
+CACHE_FORMAT = 1
+
+
+# A dataset is either one CSV file or a folder of CSV exports (every *.csv directly inside it).
+def data_files(path: str) -> list:
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.lower().endswith(".csv") and os.path.isfile(os.path.join(path, name))
+        )
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"File not found: {path}")
+    return [path]
+
+
+def file_signature(path: str) -> str:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"File not found: {path}")
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# This function gives every data file a short version string so caches know when the file changed.
+def dataset_version(path: str) -> str:
+    """
+    Returns a short version id for a data file or a folder of exports.
+    The id changes whenever a file's size or modification time changes (or a file is added or removed),
+    and when CACHE_FORMAT is bumped.
+    """
+    if os.path.isdir(path):
+        key = "|".join(file_signature(file_path) for file_path in data_files(path)) or os.path.abspath(path)
+    else:
+        key = file_signature(path)
+
+    # the cleaned data also depends on the simulation and zone configs, so editing them counts as a new version
+    for config_path in DERIVED_DATA_CONFIGS:
+        if os.path.exists(config_path):
+            config_stat = os.stat(config_path)
+            key += f":{config_stat.st_size}:{config_stat.st_mtime_ns}"
+    key += f":format{CACHE_FORMAT}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
@@ -0,0 +1,142 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# === VALIDATION RULES ===
+# Rough bounding box around Makkah and the holy sites (Mina, Muzdalifah, Arafat).
+MAKKAH_BOUNDS = {
+    "Location_Lat": (21.20, 21.60),
+    "Location_Long": (39.70, 40.10),
+}
+RATING_COLUMNS = ["Satisfaction_Rating", "Perceived_Safety_Rating"]
+RATING_RANGE = (1, 5)
+NON_NEGATIVE_COLUMNS = [
+    "Waiting_Time_for_Transport",
+    "Queue_Time_minutes",
+    "Security_Checkpoint_Wait_Time",
+    "Time_Spent_at_Location_minutes",
+    "Movement_Speed",
+    "Distance_Between_People_m",
+]
+KNOWN_CATEGORIES = {
+    "Crowd_Density": ["Low", "Medium", "High"],
+    "Fatigue_Level": ["Low", "Medium", "High"],
+    "Stress_Level": ["Low", "Medium", "High"],
+    "AR_Navigation_Success": ["Yes", "No"],
+    "Emergency_Event": ["Yes", "No"],
+    "Pilgrim_Experience": ["First-Time", "Experienced"],
+    "Transport_Mode": ["Walking", "Bus", "Car", "Train"],
+    "Activity_Type": ["Tawaf", "Sa’i", "Prayer", "Resting", "Walking"],
+    "Incident_Type": ["Theft", "Security Breach", "Unruly Behavior", "Lost Item", "Medical Emergency"],
+}
+# a reading without an incident has no Incident_Type, so an empty value is fine here (anything else must be known)
+OPTIONAL_CATEGORY_COLUMNS = ["Incident_Type"]
+
+
+# === RUN THE CHECKS ===
+def run_checks(df: pd.DataFrame) -> dict:
+    """
+    Returns {check name: boolean mask of failing rows}. Every check is one vectorized pass.
+    Checks for columns that are not in the file are skipped (the cleaning step reports those).
+    """
+    checks = {}
+
+    if "Timestamp" in df.columns:
+        checks["unparseable_timestamp"] = df["Timestamp"].isna().to_numpy()
+
+    for column, (low, high) in MAKKAH_BOUNDS.items():
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+            # NaN fails both comparisons, so missing coordinates are caught too
+            checks[f"{column}_out_of_bounds"] = ~((values >= low) & (values <= high))
+
+    low, high = RATING_RANGE
+    for column in RATING_COLUMNS:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+            checks[f"{column}_not_1_to_5"] = ~((values >= low) & (values <= high))
+
+    for column in NON_NEGATIVE_COLUMNS:
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=float)
+            checks[f"{column}_negative_or_missing"] = ~(values >= 0)
+
+    for column, categories in KNOWN_CATEGORIES.items():
+        if column in df.columns:
+            known = df[column].isin(categories)
+            if column in OPTIONAL_CATEGORY_COLUMNS:
+                known |= df[column].isna()
+            checks[f"{column}_unknown_value"] = ~known.to_numpy()
+
+    return checks
+
+
+# === VALIDATE A FRAME ===
+def validate_frame(df: pd.DataFrame) -> tuple:
+    """
+    Splits df into (valid rows, quarantined rows, report).
+    Quarantined rows get a Validation_Errors column listing every check they failed.
+    """
+    start = time.perf_counter()
+    checks = run_checks(df)
+
+    bad = np.zeros(len(df), dtype=bool)
+    for mask in checks.values():
+        bad |= mask
+
+    # take() copies the rows once and hands back an independent frame; skip it when nothing failed
+    valid_df = df.take(np.flatnonzero(~bad)) if bad.any() else df
+    quarantine_df = df.take(np.flatnonzero(bad))
+
+    # the error text is only built for the (few) bad rows
+    if len(quarantine_df):
+        errors = pd.Series("", index=quarantine_df.index)
+        for name, mask in checks.items():
+            failed = mask[bad]
+            if failed.any():
+                errors[failed] += name + ";"
+        quarantine_df["Validation_Errors"] = errors.str.rstrip(";")
+
+    report = {
+        "total_rows": int(len(df)),
+        "valid_rows": int(len(valid_df)),
+        "quarantined_rows": int(bad.sum()),
+        "failed_checks": {name: int(mask.sum()) for name, mask in checks.items() if mask.any()},
+        "checks_run": len(checks),
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+    return valid_df, quarantine_df, report
+
+
+# === WRITE QUARANTINE FILE + REPORT ===
+def write_validation_outputs(csv_path: str, quarantine_df: pd.DataFrame, report: dict, quarantine_dir: str = None) -> dict:
+    """
+    Writes <stem>_quarantine.csv (only when rows were quarantined) and <stem>_validation_report.json.
+    By default they go to a quarantine/ folder next to the CSV.
+    """
+    if quarantine_dir is None:
+        quarantine_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), "quarantine")
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+
+    try:
+        os.makedirs(quarantine_dir, exist_ok=True)
+        quarantine_path = os.path.join(quarantine_dir, f"{stem}_quarantine.csv")
+        if len(quarantine_df):
+            quarantine_df.to_csv(quarantine_path, index=False)
+            report["quarantine_file"] = quarantine_path
+        elif os.path.exists(quarantine_path):
+            os.remove(quarantine_path)  # an old quarantine file would be misleading
+
+        report["source_file"] = csv_path
+        report["validated_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+        with open(os.path.join(quarantine_dir, f"{stem}_validation_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        # a read-only data folder should not stop the dashboard from loading
+        report["write_error"] = str(e)
+
+    return report
@@ -0,0 +1,211 @@
+import numpy as np
+import pandas as pd
+
+
+# === FLOW SETTINGS ===
+# The data has no pilgrim IDs, so individual tracks are not available. Flows are estimated from
+# how zone occupancy changes between consecutive time buckets: the people a zone loses are
+# shared out over the zones that gained people, in proportion to each zone's gain.
+BASE_MINUTES = 15
+BUCKET_OPTIONS = (15, 30, 60, 120, 180)
+# the usual order of the rituals, used to lay out the zones in the charts
+ZONE_ORDER = ["Tawaf", "Sa’i", "Mina", "Arafat", "Muzdalifah", "Other"]
+MAX_CACHED_DAYS = 128
+
+
+def _sparse():
+    try:
+        from scipy import sparse
+    except ImportError:
+        raise ImportError("scipy is required for the zone flow analysis: pip install scipy")
+    return sparse
+
+
+# === FLOWS FOR ONE DAY ===
+class DayFlows:
+    """
+    Estimated flows for one day: transitions[t] is the zone x zone matrix (flattened) for the
+    move from bucket t to bucket t + 1, stored as one sparse row per transition.
+    """
+
+    def __init__(self, zones: list, bucket_starts: pd.DatetimeIndex, occupancy: np.ndarray, transitions):
+        self.zones = zones
+        self.bucket_starts = bucket_starts
+        self.occupancy = occupancy
+        self.transitions = transitions
+
+    def _rows(self, start=None, end=None) -> np.ndarray:
+        # a transition belongs to the bucket it ends in
+        ends = self.bucket_starts[1:]
+        mask = np.ones(len(ends), dtype=bool)
+        if start is not None:
+            mask &= ends >= pd.Timestamp(start)
+        if end is not None:
+            mask &= ends < pd.Timestamp(end)
+        return np.flatnonzero(mask)
+
+    def matrix(self, start=None, end=None) -> pd.DataFrame:
+        """
+        Total estimated people moving from each zone (rows) to each zone (columns).
+        """
+        n = len(self.zones)
+        rows = self._rows(start, end)
+        totals = np.asarray(self.transitions[rows].sum(axis=0)).reshape(n, n) if len(rows) else np.zeros((n, n))
+        return pd.DataFrame(totals, index=pd.Index(self.zones, name="From"), columns=pd.Index(self.zones, name="To"))
+
+    def edges(self, start=None, end=None, min_people: float = 0.0) -> pd.DataFrame:
+        """
+        Long format of matrix(): one row per From -> To pair with People > min_people.
+        """
+        edges = self.matrix(start, end).stack().rename("People").reset_index()
+        return edges[edges["People"] > min_people].sort_values("People", ascending=False).reset_index(drop=True)
+
+    def timeline(self) -> pd.DataFrame:
+        """
+        One row per transition and From -> To pair that has any flow (for the animated chart).
+        """
+        coo = self.transitions.tocoo()
+        n = len(self.zones)
+        timeline = pd.DataFrame({
+            "Bucket_Start": self.bucket_starts[1:][coo.row],
+            "From": np.asarray(self.zones, dtype=object)[coo.col // n],
+            "To": np.asarray(self.zones, dtype=object)[coo.col % n],
+            "People": coo.data,
+        })
+        return timeline.sort_values(["Bucket_Start", "From", "To"]).reset_index(drop=True)
+
+    def occupancy_frame(self) -> pd.DataFrame:
+        return pd.DataFrame(self.occupancy, index=pd.Index(self.bucket_starts, name="Bucket_Start"), columns=self.zones)
+
+
+# === ZONE FLOW ENGINE ===
+class ZoneFlows:
+    """
+    Zone occupancy per BASE_MINUTES bucket, split by activity, as one sparse
+    (bucket x activity*zone) count matrix over the whole dataset.
+    Coarser buckets are summed from it with a sparse aggregation matrix, and each day's
+    flows are computed on first use and cached by (day, bucket size, activities).
+    """
+
+    def __init__(self, df: pd.DataFrame, base_minutes: int = BASE_MINUTES):
+        missing = {"Timestamp", "Zone", "Activity_Type"} - set(df.columns)
+        if missing:
+            raise KeyError(f"Missing expected column(s) for zone flows: {sorted(missing)}")
+        sparse = _sparse()
+
+        data = df.dropna(subset=["Timestamp", "Zone"])
+        known = [z for z in ZONE_ORDER if z in set(data["Zone"].unique())]
+        self.zones = known + sorted(set(data["Zone"].unique()) - set(known))
+        zone_codes = pd.Categorical(data["Zone"], categories=self.zones).codes
+        activity_codes, activities = pd.factorize(data["Activity_Type"].fillna("Unknown"), sort=True)
+        self.activities = list(activities)
+        self.base_minutes = base_minutes
+
+        # zone centres for the flow-lines chart (the simulated coordinates when they are there)
+        lat_col, lon_col = ("Sim_Lat", "Sim_Lon") if "Sim_Lat" in data.columns else ("Location_Lat", "Location_Long")
+        if lat_col in data.columns and lon_col in data.columns:
+            centres = data.groupby("Zone")[[lat_col, lon_col]].mean()
+            self.positions = {z: (centres.at[z, lat_col], centres.at[z, lon_col]) for z in self.zones}
+        else:
+            self.positions = {}
+
+        # buckets are counted from midnight of the first day, so every bucket size lines up with the days
+        buckets = data["Timestamp"].dt.floor(f"{base_minutes}min")
+        self.origin = buckets.min().normalize() if len(buckets) else pd.Timestamp(0)
+        bucket_codes = ((buckets - self.origin) // pd.Timedelta(minutes=base_minutes)).to_numpy(dtype=np.int64)
+        n_buckets = int(bucket_codes.max()) + 1 if len(bucket_codes) else 0
+
+        n_zones = len(self.zones)
+        columns = activity_codes.astype(np.int64) * n_zones + zone_codes
+        # duplicate (bucket, column) pairs are summed when converting to CSR, so this is the count
+        self.occupancy = sparse.coo_matrix(
+            (np.ones(len(data), dtype=np.float64), (bucket_codes, columns)),
+            shape=(n_buckets, len(self.activities) * n_zones)
+        ).tocsr()
+        self._levels = {base_minutes: self.occupancy}
+        self._days = {}
+
+    # --- occupancy ---
+    def level(self, minutes: int):
+        """
+        Sparse occupancy for any bucket size that is a multiple of the base size.
+        """
+        if minutes in self._levels:
+            return self._levels[minutes]
+        if minutes <= 0 or minutes % self.base_minutes:
+            raise ValueError(f"Bucket size must be a multiple of {self.base_minutes} minutes, got {minutes}")
+        sparse = _sparse()
+
+        step = minutes // self.base_minutes
+        n_fine = self.occupancy.shape[0]
+        n_coarse = -(-n_fine // step)
+        # (coarse x fine) matrix of ones: coarse bucket i sums fine buckets i*step .. i*step + step - 1
+        aggregate = sparse.csr_matrix(
+            (np.ones(n_fine), (np.arange(n_fine) // step, np.arange(n_fine))), shape=(n_coarse, n_fine)
+        )
+        self._levels[minutes] = (aggregate @ self.occupancy).tocsr()
+        return self._levels[minutes]
+
+    def _zone_columns(self, activities) -> np.ndarray:
+        n_zones = len(self.zones)
+        if not activities:
+            codes = range(len(self.activities))
+        else:
+            codes = [self.activities.index(a) for a in activities if a in self.activities]
+        return np.array([c * n_zones + z for c in codes for z in range(n_zones)], dtype=np.int64)
+
+    # --- flows ---
+    def day(self, day, minutes: int = 60, activities: list = None) -> DayFlows:
+        """
+        Flows between consecutive buckets of one calendar day (cached).
+        activities limits the counts to those Activity_Type values (None = all).
+        """
+        day = pd.Timestamp(day).normalize()
+        key = (day, minutes, tuple(sorted(activities or [])))
+        if key in self._days:
+            return self._days[key]
+        sparse = _sparse()
+
+        occupancy = self.level(minutes)
+        bucket = pd.Timedelta(minutes=minutes)
+        first = int(np.ceil((day - self.origin) / bucket))
+        last = int(np.ceil((day + pd.Timedelta(days=1) - self.origin) / bucket))
+        positions = np.arange(first, last)
+        starts = pd.DatetimeIndex(self.origin + positions * bucket)
+
+        # rows outside the stored range (days before or after the data) are simply empty
+        inside = (positions >= 0) & (positions < occupancy.shape[0])
+        n_zones = len(self.zones)
+        counts = np.zeros((len(positions), n_zones))
+        columns = self._zone_columns(activities)
+        if inside.any() and len(columns):
+            selected = occupancy[positions[inside]][:, columns].toarray()
+            counts[inside] = selected.reshape(len(selected), -1, n_zones).sum(axis=1)
+
+        flows = estimate_flows(counts)
+        result = DayFlows(self.zones, starts, counts, sparse.csr_matrix(flows.reshape(len(flows), -1)))
+        if len(self._days) >= MAX_CACHED_DAYS:
+            self._days.pop(next(iter(self._days)))
+        self._days[key] = result
+        return result
+
+
+def estimate_flows(counts: np.ndarray) -> np.ndarray:
+    """
+    counts is (buckets x zones). Returns (buckets - 1, zones, zones) estimated movers for each
+    step: zones that lost people send them to zones that gained people, in proportion to the gains.
+    Only min(total lost, total gained) people are matched; the rest entered or left the area.
+    """
+    if len(counts) < 2:
+        return np.zeros((0, counts.shape[1], counts.shape[1]))
+    change = np.diff(counts, axis=0)
+    lost = np.clip(-change, 0, None)
+    gained = np.clip(change, 0, None)
+    scale = np.maximum(lost.sum(axis=1), gained.sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        flows = lost[:, :, None] * gained[:, None, :] / scale[:, None, None]
+    return np.nan_to_num(flows)
+
+
+def build_zone_flows(df: pd.DataFrame) -> ZoneFlows:
+    return ZoneFlows(df)
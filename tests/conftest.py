@@ -0,0 +1,5 @@
+import os
+import sys
+
+# the modules live in src/ as plain files (the dashboard adds the same folder to the path)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "src")))
@@ -0,0 +1,38 @@
+import pandas as pd
+
+from anomaly_detection import StreamingAnomalyDetector, detect_anomalies
+from maps import build_incident_map
+
+
+def quiet_frame() -> pd.DataFrame:
+    # steady readings never raise an alert
+    timestamps = pd.date_range("2024-01-01", periods=48, freq="h")
+    return pd.DataFrame({
+        "Zone": "Mina",
+        "Timestamp": timestamps,
+        "Movement_Speed": 1.0,
+        "Stress_Score": 2.0,
+    })
+
+
+def test_empty_alert_table_is_typed():
+    alerts = StreamingAnomalyDetector().alert_table()
+
+    assert alerts.empty
+    assert pd.api.types.is_datetime64_any_dtype(alerts["Window_Start"])
+    assert pd.api.types.is_float_dtype(alerts["Value"])
+    # what the map panel does with the table
+    assert alerts[alerts["Window_Start"].dt.day_name() == "Monday"].empty
+
+
+def test_map_builds_without_alerts():
+    alerts = detect_anomalies(quiet_frame()).alert_table()
+    assert alerts.empty
+
+    map_df = pd.DataFrame({
+        "Location_Lat": [21.4225], "Location_Long": [39.8262], "Incident_Type": ["Theft"],
+        "Activity_Type": ["Tawaf"], "Crowd_Density": ["High"],
+    })
+    day_alerts = alerts[alerts["Window_Start"].dt.day_name() == "Monday"]
+    m = build_incident_map(map_df, anomalies=day_alerts)
+    assert "Anomaly Alerts" not in m.get_root().render()